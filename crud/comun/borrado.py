@@ -0,0 +1,27 @@
+from django.db import connections, router
+
+
+def borrar_filas(modelo, ids=None, using=None):
+    """DELETE directo de las filas de `modelo` con esos ids (todas si `ids` es None).
+
+    No carga los objetos, no manda señales ni aplica on_delete: quien lo llama se ocupa de las
+    filas que apuntan a estas y de estadísticas y versiones. Los ids van en tandas que respetan
+    el límite de parámetros de la base. Devuelve la cantidad de filas borradas.
+    """
+    conexion = connections[using or router.db_for_write(modelo)]
+    tabla = conexion.ops.quote_name(modelo._meta.db_table)
+    with conexion.cursor() as cursor:
+        if ids is None:
+            cursor.execute(f'DELETE FROM {tabla}')
+            return cursor.rowcount
+        ids = list(ids)
+        if not ids:
+            return 0
+        columna = conexion.ops.quote_name(modelo._meta.pk.column)
+        tamano = conexion.ops.bulk_batch_size([modelo._meta.pk], ids) or len(ids)
+        borradas = 0
+        for inicio in range(0, len(ids), tamano):
+            tanda = ids[inicio:inicio + tamano]
+            cursor.execute(f"DELETE FROM {tabla} WHERE {columna} IN ({', '.join(['%s'] * len(tanda))})", tanda)
+            borradas += cursor.rowcount
+        return borradas
@@ -0,0 +1,84 @@
+import threading
+from array import array
+from collections import OrderedDict
+
+_caches = {}
+
+
+class CacheBusqueda:
+    """Cache LRU en memoria de búsquedas: consulta normalizada -> ids que coinciden.
+
+    Cada entrada vale para una versión de las tablas consultadas (ver comun.versiones); cuando
+    llega una versión nueva se descarta todo. Los ids se guardan en un array de enteros de
+    64 bits y el total de ids guardados está acotado por `max_ids`.
+    """
+
+    def __init__(self, nombre, max_entradas=512, max_ids=200_000):
+        self.nombre = nombre
+        self.max_entradas = max_entradas
+        self.max_ids = max_ids
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self._version = None
+        self._ids_guardados = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        _caches[nombre] = self
+
+    def obtener(self, clave, version):
+        with self._lock:
+            if version != self._version:
+                self._vaciar(version)
+            ids = self._entradas.get(clave)
+            if ids is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return ids
+
+    def guardar(self, clave, version, ids):
+        """Guarda los ids y devuelve el array guardado, para usar ese mismo objeto sin releerlos."""
+        ids = array('q', ids)
+        # Una búsqueda que trae casi toda la tabla desalojaría todo lo demás: no se guarda
+        if len(ids) > self.max_ids // 4:
+            return ids
+        with self._lock:
+            if version != self._version:
+                self._vaciar(version)
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._ids_guardados -= len(anterior)
+            self._entradas[clave] = ids
+            self._ids_guardados += len(ids)
+            while len(self._entradas) > self.max_entradas or self._ids_guardados > self.max_ids:
+                _, desalojados = self._entradas.popitem(last=False)
+                self._ids_guardados -= len(desalojados)
+                self.desalojos += 1
+        return ids
+
+    def _vaciar(self, version):
+        self._entradas.clear()
+        self._ids_guardados = 0
+        self._version = version
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'nombre': self.nombre,
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas,
+                'ids_guardados': self._ids_guardados,
+                'max_ids': self.max_ids,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else None,
+                'desalojos': self.desalojos,
+            }
+
+
+def estadisticas():
+    """Estadísticas de todas las caches de búsqueda de este proceso."""
+    return [cache.estadisticas() for cache in _caches.values()]
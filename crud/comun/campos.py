@@ -0,0 +1,50 @@
+from django.db import models
+from django.db.models.functions import Lower
+from crud.texto import normalizar, normalizar_email
+
+
+class CampoNormalizado(models.CharField):
+    """Copia normalizada (sin mayúsculas, acentos ni espacios repetidos) del campo `origen`.
+
+    Se calcula en pre_save, así que también queda completa en bulk_create sin que el que
+    crea las instancias tenga que acordarse de llenarla.
+    """
+
+    def __init__(self, *args, origen=None, **kwargs):
+        self.origen = origen
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['origen'] = self.origen
+        kwargs.pop('editable', None)
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        valor = normalizar(getattr(model_instance, self.origen))
+        setattr(model_instance, self.attname, valor)
+        return valor
+
+
+class EmailNormalizado(models.EmailField):
+    """Email que se guarda y se compara normalizado (crud.texto.normalizar_email).
+
+    Se normaliza al validar (así validate_unique y los formularios ven el valor final), al
+    guardar y en los valores de los filtros. Registra el lookup `__lower`, que en SQL es
+    LOWER(email): es el que usa un índice funcional sobre Lower('email').
+    """
+
+    def to_python(self, value):
+        return normalizar_email(super().to_python(value))
+
+    def get_prep_value(self, value):
+        return normalizar_email(super().get_prep_value(value))
+
+    def pre_save(self, model_instance, add):
+        valor = normalizar_email(getattr(model_instance, self.attname))
+        setattr(model_instance, self.attname, valor)
+        return valor
+
+
+EmailNormalizado.register_lookup(Lower)
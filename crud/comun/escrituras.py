@@ -0,0 +1,88 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from django.db import close_old_connections, connection, transaction
+
+
+class AgrupadorEscrituras:
+    """Hilo único que ejecuta escrituras chicas agrupadas en transacciones cortas.
+
+    Los hilos de los requests encolan una función y esperan su resultado. El agrupador junta lo
+    que llegue durante `espera` segundos (hasta `max_lote` escrituras) y lo corre en una sola
+    transacción, con un savepoint por escritura: si una falla, solo esa recibe la excepción.
+    Con una sola conexión escribiendo, los hilos del proceso no compiten por el lock de SQLite
+    y se paga un commit por lote en lugar de uno por request.
+    """
+
+    def __init__(self, max_lote=50, espera=0.005):
+        self.max_lote = max_lote
+        self.espera = espera
+        self._cola = queue.SimpleQueue()
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.lotes = 0
+        self.escrituras = 0
+
+    def ejecutar(self, funcion, *args, **kwargs):
+        """Corre `funcion(*args, **kwargs)` en el hilo agrupador y devuelve su resultado."""
+        return self.enviar(funcion, *args, **kwargs).result()
+
+    def enviar(self, funcion, *args, **kwargs):
+        self._asegurar_hilo()
+        futuro = Future()
+        self._cola.put((futuro, funcion, args, kwargs))
+        return futuro
+
+    def _asegurar_hilo(self):
+        if self._hilo is not None:
+            return
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name='agrupador-escrituras', daemon=True)
+                self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            lote = [self._cola.get()]
+            limite = time.monotonic() + self.espera
+            while len(lote) < self.max_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            self._procesar(lote)
+
+    def _procesar(self, lote):
+        close_old_connections()
+        resultados = []
+        try:
+            with transaction.atomic():
+                for futuro, funcion, args, kwargs in lote:
+                    if not futuro.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with transaction.atomic():
+                            resultados.append((futuro, funcion(*args, **kwargs), None))
+                    except Exception as error:
+                        resultados.append((futuro, None, error))
+        except Exception as error:
+            # Falló el BEGIN o el commit: ninguna escritura del lote quedó guardada
+            for futuro, _, _, _ in lote:
+                if not futuro.done():
+                    futuro.set_exception(error)
+            connection.close()
+            return
+        self.lotes += 1
+        self.escrituras += len(resultados)
+        for futuro, resultado, error in resultados:
+            if error is not None:
+                futuro.set_exception(error)
+            else:
+                futuro.set_result(resultado)
+
+
+agrupador = AgrupadorEscrituras()
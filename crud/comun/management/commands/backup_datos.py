@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from comun import respaldo
+
+
+class Command(BaseCommand):
+    help = ('Respalda oficinas y personas como NDJSON comprimido con gzip, leyendo la base por tandas. '
+            'Con --from-json convierte un volcado de dumpdata (p. ej. backup.json) al mismo formato.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            '-o',
+            help='Archivo de salida (por defecto: respaldo-AAAAMMDD-HHMMSS.ndjson.gz). Sin .gz no se comprime.'
+        )
+        parser.add_argument(
+            '--from-json',
+            help='Volcado de dumpdata a convertir en lugar de leer la base.'
+        )
+        parser.add_argument(
+            '--models',
+            nargs='+',
+            help=f'Modelos a respaldar como app.Modelo (por defecto: {" ".join(respaldo.MODELOS)}).'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=respaldo.TAMANO_TANDA,
+            help=f'Filas leídas por consulta (por defecto: {respaldo.TAMANO_TANDA}).'
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size debe ser mayor o igual a 1.")
+        try:
+            lista_modelos = respaldo.modelos(options['models'])
+        except (LookupError, ValueError, respaldo.ErrorRespaldo) as error:
+            raise CommandError(error)
+        salida = options['output'] or f"respaldo-{timezone.now():%Y%m%d-%H%M%S}.ndjson.gz"
+
+        ignorados = 0
+        try:
+            with respaldo.abrir(salida, 'wt') as archivo:
+                if options['from_json']:
+                    cantidades, ignorados = respaldo.convertir(options['from_json'], archivo, lista_modelos)
+                else:
+                    cantidades = respaldo.escribir(archivo, lista_modelos, options['chunk_size'])
+        except (OSError, respaldo.ErrorRespaldo) as error:
+            raise CommandError(error)
+
+        for modelo in lista_modelos:
+            self.stdout.write(f"  {modelo._meta.label}: {cantidades[modelo]}")
+        if ignorados:
+            self.stdout.write(f"  {ignorados} objetos de otros modelos no se incluyeron.")
+        self.stdout.write(self.style.SUCCESS(f"Respaldo guardado en {salida}: {sum(cantidades.values())} filas."))
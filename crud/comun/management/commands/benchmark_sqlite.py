@@ -0,0 +1,202 @@
+import random
+import statistics
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from comun import versiones
+from comun.borrado import borrar_filas
+from comun.escrituras import AgrupadorEscrituras
+from persona import estadisticas
+from persona.models import ParDuplicado, Persona
+
+DOMINIO = 'benchmark.invalid'
+
+
+class Command(BaseCommand):
+    help = ('Mide lecturas y escrituras concurrentes de personas contra la base configurada, con '
+            'escrituras directas y con el agrupador de escrituras. Borra sus filas al terminar.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Hilos simulando requests (por defecto: 8).'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=5.0,
+            help='Segundos por modo (por defecto: 5).'
+        )
+        parser.add_argument(
+            '--write-ratio',
+            type=float,
+            default=0.3,
+            help='Proporción de operaciones que escriben (por defecto: 0.3).'
+        )
+        parser.add_argument(
+            '--import-batch',
+            type=int,
+            default=500,
+            help='Filas por lote de un hilo extra que simula una importación con bulk_create; 0 para no simularla.'
+        )
+        parser.add_argument(
+            '--mode',
+            choices=['directo', 'agrupado', 'ambos'],
+            default='ambos',
+            help='Modo de escritura a medir (por defecto: ambos).'
+        )
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['duration'] <= 0:
+            raise CommandError("--threads y --duration deben ser positivos.")
+        if not 0 <= options['write_ratio'] <= 1:
+            raise CommandError("--write-ratio debe estar entre 0 y 1.")
+
+        self._mostrar_ajustes()
+        modos = ['directo', 'agrupado'] if options['mode'] == 'ambos' else [options['mode']]
+        try:
+            for modo in modos:
+                resultado = self._medir(modo, options)
+                self._informar(modo, resultado, options['duration'])
+        finally:
+            borradas = self._limpiar()
+            self.stdout.write(f"Se borraron {borradas} personas de prueba.")
+
+    def _mostrar_ajustes(self):
+        self.stdout.write(f"Base: {connection.vendor} {connection.settings_dict['NAME']}")
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as cursor:
+            ajustes = []
+            for pragma in ('journal_mode', 'synchronous', 'mmap_size', 'busy_timeout'):
+                cursor.execute(f'PRAGMA {pragma}')
+                ajustes.append(f'{pragma}={cursor.fetchone()[0]}')
+        self.stdout.write('  ' + ', '.join(ajustes))
+
+    def _medir(self, modo, options):
+        agrupador = AgrupadorEscrituras() if modo == 'agrupado' else None
+        fin = time.monotonic() + options['duration']
+        resultado = {'lecturas': [], 'escrituras': [], 'bloqueos': 0, 'otros_errores': 0, 'importadas': 0}
+        lock = threading.Lock()
+
+        def request(numero):
+            rng = random.Random(numero)
+            propias = []
+            lecturas, escrituras, bloqueos, otros = [], [], 0, 0
+            contador = 0
+            try:
+                while time.monotonic() < fin:
+                    inicio = time.perf_counter()
+                    try:
+                        if rng.random() < options['write_ratio']:
+                            contador += 1
+                            escribir = self._escritura(modo, numero, contador, propias, rng)
+                            persona = agrupador.ejecutar(escribir) if agrupador else escribir()
+                            if persona is not None:
+                                propias.append(persona.pk)
+                            escrituras.append(time.perf_counter() - inicio)
+                        else:
+                            list(Persona.objects.order_by('-id')[:10])
+                            lecturas.append(time.perf_counter() - inicio)
+                    except OperationalError as error:
+                        if 'locked' in str(error):
+                            bloqueos += 1
+                        else:
+                            otros += 1
+                    except Exception:
+                        otros += 1
+            finally:
+                connection.close()
+            with lock:
+                resultado['lecturas'] += lecturas
+                resultado['escrituras'] += escrituras
+                resultado['bloqueos'] += bloqueos
+                resultado['otros_errores'] += otros
+
+        def importacion():
+            lote = 0
+            try:
+                while time.monotonic() < fin:
+                    lote += 1
+                    personas = [
+                        Persona(nombre=f'Importada {lote}-{i}', edad=i % 90, email=f'imp-{modo}-{lote}-{i}@{DOMINIO}')
+                        for i in range(options['import_batch'])
+                    ]
+                    try:
+                        with transaction.atomic():
+                            Persona.objects.bulk_create(personas)
+                        resultado['importadas'] += len(personas)
+                    except OperationalError:
+                        with lock:
+                            resultado['bloqueos'] += 1
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=request, args=(n,)) for n in range(options['threads'])]
+        if options['import_batch']:
+            hilos.append(threading.Thread(target=importacion))
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        if agrupador:
+            resultado['lotes'] = agrupador.lotes
+        return resultado
+
+    def _escritura(self, modo, numero, contador, propias, rng):
+        # Misma mezcla que los formularios: altas y modificaciones con save() (señales incluidas)
+        if propias and rng.random() < 0.5:
+            pk = rng.choice(propias)
+
+            def modificar():
+                persona = Persona.objects.get(pk=pk)
+                persona.edad = rng.randint(18, 80)
+                persona.save()
+                return None
+            return modificar
+
+        def crear():
+            persona = Persona(
+                nombre=f'Benchmark {numero}-{contador}',
+                edad=rng.randint(18, 80),
+                email=f'{modo}-{numero}-{contador}@{DOMINIO}',
+            )
+            persona.save()
+            return persona
+
+        if modo == 'directo':
+            # Como un POST sin agrupar: su propia transacción
+            return lambda: transaction.atomic()(crear)()
+        return crear
+
+    def _informar(self, modo, resultado, duracion):
+        def percentil(valores, p):
+            if len(valores) < 2:
+                return valores[0] * 1000 if valores else 0.0
+            return statistics.quantiles(valores, n=100)[p - 1] * 1000
+
+        lecturas, escrituras = resultado['lecturas'], resultado['escrituras']
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Modo {modo}:"))
+        self.stdout.write(f"  lecturas:   {len(lecturas) / duracion:8.1f}/s  p50 {percentil(lecturas, 50):7.1f} ms  "
+                          f"p95 {percentil(lecturas, 95):7.1f} ms")
+        self.stdout.write(f"  escrituras: {len(escrituras) / duracion:8.1f}/s  p50 {percentil(escrituras, 50):7.1f} ms  "
+                          f"p95 {percentil(escrituras, 95):7.1f} ms")
+        self.stdout.write(f"  filas importadas en paralelo: {resultado['importadas']}")
+        if 'lotes' in resultado:
+            self.stdout.write(f"  transacciones del agrupador: {resultado['lotes']}")
+        estilo = self.style.ERROR if resultado['bloqueos'] else self.style.SUCCESS
+        self.stdout.write(estilo(f"  'database is locked': {resultado['bloqueos']}  otros errores: {resultado['otros_errores']}"))
+
+    def _limpiar(self):
+        # Borrado en bloque sin señales; las de prueba son todas sin oficina, se recalcula ese grupo
+        with transaction.atomic():
+            prueba = Persona.objects.filter(email__endswith=f'@{DOMINIO}')
+            ParDuplicado.objects.filter(persona_a__in=prueba).delete()
+            ParDuplicado.objects.filter(persona_b__in=prueba).delete()
+            borradas = borrar_filas(Persona, prueba.values_list('id', flat=True))
+            estadisticas.recalcular_oficina(None)
+            versiones.incrementar('persona')
+        return borradas
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from crud import routers
+
+
+class Command(BaseCommand):
+    help = 'Muestra si cada réplica de lectura responde y cuánto atraso tiene respecto de la primaria.'
+
+    def handle(self, *args, **options):
+        if not settings.REPLICAS:
+            self.stdout.write("No hay réplicas configuradas (variable DB_REPLICAS).")
+            return
+        caidas = 0
+        for alias, (sana, atraso) in routers.EstadoReplicas().estado().items():
+            nombre = settings.DATABASES[alias]['NAME'] or settings.DATABASES[alias]['HOST']
+            if atraso is None:
+                caidas += 1
+                self.stdout.write(self.style.ERROR(f"  {alias} ({nombre}): no responde"))
+            elif sana:
+                self.stdout.write(self.style.SUCCESS(f"  {alias} ({nombre}): atraso {atraso:.1f} s"))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    f"  {alias} ({nombre}): atraso {atraso:.1f} s, más que REPLICA_MAX_LAG ({settings.REPLICA_MAX_LAG} s)"
+                ))
+        if caidas == len(settings.REPLICAS):
+            raise CommandError("Ninguna réplica responde; las lecturas van a la primaria.")
@@ -0,0 +1,148 @@
+import os
+import re
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+LINEA_IMPORTTIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)')
+
+# Envoltorio del proceso medido: al salir manda su pico de memoria (VmHWM, en KB) por el fd recibido.
+# El ru_maxrss de wait4 no sirve: incluye la memoria de este proceso, heredada en el fork antes del exec
+MEDIDOR = """
+import atexit, os, runpy, sys
+fd = int(sys.argv.pop(1))
+def informar():
+    with open('/proc/self/status') as status:
+        pico = next((linea.split()[1] for linea in status if linea.startswith('VmHWM:')), '')
+    os.write(fd, pico.encode())
+atexit.register(informar)
+del sys.argv[0]
+if sys.argv[0] == '-c':
+    exec(sys.argv[1])
+else:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+"""
+
+# Perfiles que compara --benchmark: (nombre, DJANGO_SETTINGS_MODULE, CRUD_ROL)
+PERFILES = [
+    ('desarrollo', 'crud.settings', None),
+    ('produccion web', 'crud.settings_produccion', 'web'),
+    ('produccion comando', 'crud.settings_produccion', 'comando'),
+    ('produccion worker', 'crud.settings_produccion', 'worker'),
+]
+
+
+class Command(BaseCommand):
+    help = ('Mide el costo de arranque: tiempo de import por app de INSTALLED_APPS y, con --benchmark, '
+            'tiempo y memoria de manage.py con cada perfil de settings.')
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--benchmark',
+            action='store_true',
+            help='Compara el arranque de manage.py con los perfiles de desarrollo y producción.'
+        )
+        parser.add_argument(
+            '--command',
+            type=str,
+            default='load_personas --help',
+            help='Comando de manage.py a medir en --benchmark (por defecto: "load_personas --help").'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Repeticiones por perfil en --benchmark (por defecto: 5).'
+        )
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            self._benchmark(shlex.split(options['command']), options['repeat'])
+        else:
+            self._perfil_imports()
+
+    def _perfil_imports(self):
+        # Proceso nuevo: en este ya está todo importado
+        codigo = 'import django; django.setup(); import importlib; importlib.import_module(%r)' % settings.ROOT_URLCONF
+        resultado = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', codigo],
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+        )
+        if resultado.returncode != 0:
+            self.stderr.write(resultado.stderr[-2000:])
+            return
+
+        apps = sorted(settings.INSTALLED_APPS, key=len, reverse=True)
+        por_app = defaultdict(int)
+        for linea in resultado.stderr.splitlines():
+            coincidencia = LINEA_IMPORTTIME.match(linea)
+            if not coincidencia:
+                continue
+            microsegundos, modulo = int(coincidencia.group(1)), coincidencia.group(3)
+            por_app[self._app_de(modulo, apps)] += microsegundos
+
+        total = sum(por_app.values())
+        self.stdout.write(f"Imports de django.setup() + URLconf: {total / 1000:.1f} ms")
+        for app, microsegundos in sorted(por_app.items(), key=lambda item: -item[1]):
+            self.stdout.write(f"  {app:<32} {microsegundos / 1000:8.1f} ms  {microsegundos * 100 / total:5.1f}%")
+
+    def _app_de(self, modulo, apps):
+        for app in apps:
+            if modulo == app or modulo.startswith(app + '.'):
+                return app
+        raiz = modulo.split('.')[0]
+        if raiz == 'django':
+            return 'django (núcleo)'
+        if raiz in ('PIL', 'ranged_response'):
+            return f'{raiz} (captcha)'
+        if raiz in sys.stdlib_module_names or raiz.startswith('_'):
+            return 'biblioteca estándar'
+        return raiz
+
+    def _benchmark(self, comando, repeticiones):
+        self.stdout.write(f"manage.py {' '.join(comando)} x{repeticiones}")
+        manage = os.path.join(settings.BASE_DIR, 'manage.py')
+        # Piso: el ORM de Django solo, sin apps ni settings; ningún perfil puede bajar de esto
+        self._medir('piso (django.db.models)', ['-c', 'import django.db.models'], os.environ.copy(), repeticiones)
+        for nombre, modulo, rol in PERFILES:
+            env = os.environ.copy()
+            env['DJANGO_SETTINGS_MODULE'] = modulo
+            if rol:
+                env['CRUD_ROL'] = rol
+            self._medir(nombre, [manage, *comando], env, repeticiones)
+
+    def _medir(self, nombre, argumentos, env, repeticiones):
+        tiempos = []
+        memorias = []
+        for _ in range(repeticiones):
+            lectura, escritura = os.pipe()
+            inicio = time.perf_counter()
+            proceso = subprocess.Popen(
+                [sys.executable, '-c', MEDIDOR, str(escritura), *argumentos],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                pass_fds=(escritura,),
+            )
+            os.close(escritura)
+            _, estado, uso = os.wait4(proceso.pid, 0)
+            tiempos.append(time.perf_counter() - inicio)
+            with os.fdopen(lectura, 'rb') as f:
+                pico = f.read()
+            # Sin /proc (macOS) queda el ru_maxrss del hijo, que sobreestima
+            memorias.append(int(pico) if pico else uso.ru_maxrss)
+            if os.waitstatus_to_exitcode(estado) != 0:
+                self.stdout.write(self.style.ERROR(f"  {nombre}: el comando terminó con error"))
+                break
+        self.stdout.write(
+            f"  {nombre:<24} mediana {statistics.median(tiempos) * 1000:7.0f} ms  "
+            f"mínimo {min(tiempos) * 1000:7.0f} ms  RSS {max(memorias) / 1024:6.1f} MB"
+        )
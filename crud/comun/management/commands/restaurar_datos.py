@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from comun import respaldo, versiones
+from persona import estadisticas
+
+
+class Command(BaseCommand):
+    help = ('Restaura un respaldo de backup_datos (NDJSON, con o sin gzip) o un volcado de dumpdata (.json) '
+            'con inserciones por tandas en una sola transacción. Reconstruye las estadísticas al terminar.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'archivo',
+            help='Respaldo a restaurar (.ndjson.gz, .ndjson/.jsonl o .json de dumpdata).'
+        )
+        parser.add_argument(
+            '--models',
+            nargs='+',
+            help=f'Modelos a restaurar como app.Modelo (por defecto: {" ".join(respaldo.MODELOS)}).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=respaldo.TAMANO_TANDA,
+            help=f'Filas por tanda de inserción (por defecto: {respaldo.TAMANO_TANDA}).'
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Borra antes los datos actuales de esos modelos; sin esta opción la base tiene que estar vacía.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size debe ser mayor o igual a 1.")
+        try:
+            lista_modelos = respaldo.modelos(options['models'])
+        except (LookupError, ValueError, respaldo.ErrorRespaldo) as error:
+            raise CommandError(error)
+
+        try:
+            with transaction.atomic():
+                cantidades, ignorados = respaldo.restaurar(
+                    respaldo.leer(options['archivo']), lista_modelos, options['batch_size'], options['replace'],
+                )
+                if not cantidades:
+                    # Un respaldo vacío nunca reemplaza datos (tampoco con --replace)
+                    transaction.set_rollback(True)
+                    self.stdout.write(self.style.WARNING(
+                        f"{options['archivo']} no tiene datos para restaurar; la base no se modificó."
+                    ))
+                    return
+                estadisticas.recalcular_todo()
+                versiones.incrementar('persona', 'oficina')
+        except (OSError, respaldo.ErrorRespaldo) as error:
+            raise CommandError(error)
+
+        for modelo in lista_modelos:
+            self.stdout.write(f"  {modelo._meta.label}: {cantidades[modelo]}")
+        if ignorados:
+            self.stdout.write(f"  {ignorados} objetos de otros modelos se ignoraron.")
+        self.stdout.write(self.style.SUCCESS(f"Restauradas {sum(cantidades.values())} filas."))
@@ -0,0 +1,218 @@
+import hashlib
+from functools import cache
+from django.conf import settings
+from django.contrib import messages
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from django.http import HttpResponseRedirect
+from django.middleware.csrf import get_token
+from django.urls import get_script_prefix, reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+from crud import routers
+from crud.texto import normalizar
+from . import versiones
+from .escrituras import agrupador
+
+
+class VersionCondicionalMixin:
+    """GET condicional (ETag / Last-Modified / 304) para vistas basadas en clases.
+
+    El validador sale de los contadores de `versiones_tablas`, del usuario logueado y de su
+    sesión, en una consulta barata que se hace antes de la consulta principal: si el cliente ya
+    tiene esa versión se responde 304 sin consultar ni renderizar nada más. Si hay mensajes
+    pendientes (de un redirect) la página siempre se renderiza, porque el 304 los perdería.
+
+    Las vistas cuya página tiene un formulario POST lo indican con `usa_formulario()`: solo
+    entonces el token CSRF entra en el ETag (y se genera la cookie si todavía no existe).
+    """
+    versiones_tablas = ()
+    con_formulario = False
+
+    def dispatch(self, request, *args, **kwargs):
+        if messages.get_messages(request):
+            response = super().dispatch(request, *args, **kwargs)
+        else:
+            vista = condition(etag_func=self._etag, last_modified_func=self._ultima_modificacion)(super().dispatch)
+            response = vista(request, *args, **kwargs)
+        # La barra de navegación muestra el usuario: la respuesta depende de la cookie de sesión
+        patch_vary_headers(response, ('Cookie',))
+        if self._por_usuario(request):
+            patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+        else:
+            patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+        return response
+
+    def usa_formulario(self, request):
+        """La página renderiza un {% csrf_token %}."""
+        return self.con_formulario
+
+    def _por_usuario(self, request):
+        # Con sesión o token CSRF la página (y su ETag) es de un solo cliente: no va a caches compartidas
+        return (
+            request.user.is_authenticated
+            or request.session.session_key is not None
+            or self.usa_formulario(request)
+        )
+
+    def _versiones(self):
+        if not hasattr(self, '_versiones_cache'):
+            self._versiones_cache = versiones.obtener(*self.versiones_tablas)
+        return self._versiones_cache
+
+    def _etag(self, request, *args, **kwargs):
+        partes = [f'{nombre}:{valor}' for nombre, (valor, _) in sorted(self._versiones().items())]
+        partes.append(f'u:{request.user.pk or 0}')
+        # Después de un login o logout cambian la sesión y el token: el HTML viejo ya no sirve para POST
+        partes.append(f"s:{request.session.session_key or ''}")
+        if self.usa_formulario(request):
+            get_token(request)
+            partes.append(f"csrf:{request.META.get('CSRF_COOKIE', '')}")
+        return hashlib.md5('|'.join(partes).encode(), usedforsecurity=False).hexdigest()
+
+    def _ultima_modificacion(self, request, *args, **kwargs):
+        fechas = [actualizado for _, actualizado in self._versiones().values() if actualizado]
+        return max(fechas) if fechas else None
+
+
+def es_parcial(request):
+    """El request lo hizo HTMX o un XHR: alcanza con el fragmento, sin base.html ni navbar."""
+    return request.headers.get('HX-Request') == 'true' or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+
+# pk de relleno para armar una URL una sola vez y completarla por fila con str.format
+_PK_MARCA = 987654321
+
+
+@cache
+def plantilla_url(nombre, prefijo):
+    """URL de `nombre` (que recibe un pk) como formato con {pk}; `prefijo` es el del script."""
+    return reverse(nombre, args=[_PK_MARCA]).replace(str(_PK_MARCA), '{pk}')
+
+
+class ListaParcialMixin:
+    """Listas paginadas que, pedidas por HTMX o XHR, devuelven solo `template_parcial`.
+
+    La plantilla completa incluye ese mismo fragmento (tabla y paginador), así que el cambio
+    de página o de búsqueda no vuelve a renderizar base.html ni la navbar. Va antes de
+    VersionCondicionalMixin: el fragmento tiene su propio ETag.
+
+    `urls_fila` es {clave: nombre de URL}; cada objeto de la página recibe `urls[clave]`
+    armado con un format, en lugar de un {% url %} (un reverse()) por enlace y por fila.
+    """
+    template_parcial = None
+    urls_fila = {}
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.parcial = es_parcial(request)
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        patch_vary_headers(response, ('HX-Request', 'X-Requested-With'))
+        return response
+
+    def _etag(self, request, *args, **kwargs):
+        etag = super()._etag(request, *args, **kwargs)
+        return f'{etag}-parcial' if self.parcial else etag
+
+    def get_template_names(self):
+        if self.parcial and self.template_parcial:
+            return [self.template_parcial]
+        return super().get_template_names()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        pagina = context.get('page_obj')
+        if pagina is not None:
+            # Las páginas vecinas que muestra paginator.html, sin recorrer todo el page_range
+            context['paginas'] = range(max(1, pagina.number - 2), min(pagina.paginator.num_pages, pagina.number + 2) + 1)
+        if self.urls_fila:
+            prefijo = get_script_prefix()
+            formatos = {clave: plantilla_url(nombre, prefijo) for clave, nombre in self.urls_fila.items()}
+            for objeto in context['object_list']:
+                objeto.urls = {clave: formato.format(pk=objeto.pk) for clave, formato in formatos.items()}
+        return context
+
+
+class BusquedaCacheadaMixin:
+    """Búsqueda por ?q= con cache de ids (comun.cache_busqueda) para vistas de lista.
+
+    Se combina con VersionCondicionalMixin: la versión de `versiones_tablas` que ya se leyó
+    para el ETag es la que invalida la cache. La subclase define `campo_busqueda` (la columna
+    normalizada donde se busca la clave) y `orden_busqueda`; la página que se muestra se arma
+    con una sola consulta por id.
+    """
+    cache_busqueda = None
+    campo_busqueda = None
+    orden_busqueda = ('pk',)
+
+    def get_queryset(self):
+        clave = normalizar(self.request.GET.get('q'))
+        if not clave:
+            return []
+        version = tuple(valor for _, (valor, _) in sorted(self._versiones().items()))
+        ids = self.cache_busqueda.obtener(clave, version)
+        if ids is None:
+            # El mismo array que queda en la cache: el count y el slice del paginador no reconsultan
+            ids = self.cache_busqueda.guardar(clave, version, self.buscar_ids(clave))
+        self._ids_cacheados = True
+        return ids
+
+    def filtro_busqueda(self, clave):
+        if self.campo_busqueda is None:
+            raise ImproperlyConfigured(f"{self.__class__.__name__} tiene que definir campo_busqueda.")
+        return Q(**{f'{self.campo_busqueda}__contains': clave})
+
+    def buscar_ids(self, clave):
+        return (
+            self.model._default_manager.filter(self.filtro_busqueda(clave))
+            .order_by(*self.orden_busqueda)
+            .values_list('pk', flat=True)
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # El paginador conserva la búsqueda en los enlaces de página
+        parametros = self.request.GET.copy()
+        parametros.pop('page', None)
+        context['parametros_busqueda'] = parametros.urlencode() + '&' if parametros else ''
+        if getattr(self, '_ids_cacheados', False):
+            objetos = self.hidratar(context['object_list'])
+            context['object_list'] = context[self.get_context_object_name(objetos)] = objetos
+            if context.get('page_obj') is not None:
+                context['page_obj'].object_list = objetos
+        return context
+
+    def hidratar(self, ids):
+        por_id = self.model._default_manager.in_bulk(list(ids))
+        return [por_id[i] for i in ids if i in por_id]
+
+
+class EscrituraAgrupadaMixin:
+    """Con AGRUPAR_ESCRITURAS activo, el form.save() de un Create/UpdateView lo hace el agrupador
+    de escrituras (comun.escrituras) junto con los demás POST que lleguen al mismo tiempo."""
+
+    def form_valid(self, form):
+        if not settings.AGRUPAR_ESCRITURAS:
+            return super().form_valid(form)
+        self.object = agrupador.ejecutar(form.save)
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class LecturaReplicaMixin:
+    """GET y HEAD leen de una réplica (crud.routers), salvo que el cliente haya escrito hace poco.
+
+    Va primero en las bases de la vista, así también la versión del ETag sale de la réplica.
+    La respuesta se renderiza adentro del bloque para que las consultas que hace el template
+    (la página de object_list, relaciones) vayan a la misma base.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or routers.primaria_reciente(request):
+            return super().dispatch(request, *args, **kwargs)
+        with routers.leer_de_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
@@ -0,0 +1,16 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Version(models.Model):
+    """Contador de versión por tabla; se incrementa en cada escritura para invalidar caches y ETags."""
+    nombre = models.CharField(verbose_name="tabla", max_length=50, primary_key=True)
+    valor = models.BigIntegerField(default=0)
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "versión"
+        verbose_name_plural = "versiones"
+
+    def __str__(self):
+        return f'{self.nombre} v{self.valor}'
@@ -0,0 +1,38 @@
+class Concatenados:
+    """Varios querysets uno detrás del otro, para paginarlos sin traerlos enteros a memoria.
+
+    Paginator solo pide la cantidad y una porción: cada queryset se cuenta una vez y la porción
+    se arma con un LIMIT/OFFSET en los querysets que toca (dos como mucho si cae en el borde).
+    """
+
+    def __init__(self, *querysets):
+        self.querysets = querysets
+        self._cantidades = None
+
+    def cantidades(self):
+        if self._cantidades is None:
+            self._cantidades = [queryset.count() for queryset in self.querysets]
+        return self._cantidades
+
+    def count(self):
+        return sum(self.cantidades())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, indice):
+        if not isinstance(indice, slice):
+            objetos = self[indice:indice + 1] if indice >= 0 else self[indice:][:1]
+            if not objetos:
+                raise IndexError(indice)
+            return objetos[0]
+        inicio, fin, _ = indice.indices(len(self))
+        objetos = []
+        for queryset, cantidad in zip(self.querysets, self.cantidades()):
+            if fin <= 0:
+                break
+            if inicio < cantidad:
+                objetos.extend(queryset[max(inicio, 0):min(fin, cantidad)])
+            inicio -= cantidad
+            fin -= cantidad
+        return objetos
@@ -0,0 +1,160 @@
+import gzip
+from collections import Counter
+from django.apps import apps
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from .borrado import borrar_filas
+from .campos import CampoNormalizado, EmailNormalizado
+from .transacciones import lectura_consistente
+
+# Lo que se respalda por defecto; estadísticas y versiones se reconstruyen al restaurar
+MODELOS = ['oficina.Oficina', 'persona.Persona', 'persona.PersonaArchivada', 'persona.ParDuplicado']
+TAMANO_TANDA = 2000
+
+
+class ErrorRespaldo(Exception):
+    """El respaldo no se puede leer o no se puede restaurar sobre la base actual."""
+
+
+def modelos(etiquetas=None):
+    """Modelos de `etiquetas` ordenados para que cada uno vaya después de los que referencia."""
+    pendientes = [apps.get_model(etiqueta) for etiqueta in (etiquetas or MODELOS)]
+    ordenados = []
+    while pendientes:
+        for modelo in pendientes:
+            referidos = {
+                campo.related_model for campo in modelo._meta.concrete_fields
+                if campo.is_relation and campo.related_model is not modelo
+            }
+            if not referidos & set(pendientes):
+                break
+        else:
+            raise ErrorRespaldo("Hay referencias circulares entre los modelos a respaldar.")
+        pendientes.remove(modelo)
+        ordenados.append(modelo)
+    return ordenados
+
+
+def abrir(ruta, modo='rt'):
+    """Abre un respaldo NDJSON, comprimido con gzip si termina en .gz."""
+    if str(ruta).endswith('.gz'):
+        return gzip.open(ruta, modo, encoding='utf-8')
+    return open(ruta, modo, encoding='utf-8')
+
+
+def escribir(salida, lista_modelos, tamano=TAMANO_TANDA):
+    """Vuelca cada modelo como una línea JSON por fila, leyendo la base de a `tamano` filas.
+
+    Todo se lee en una transacción de solo lectura para que las referencias entre modelos sean
+    consistentes; no toma el lock de escritura, así que el sitio sigue escribiendo mientras
+    tanto. Devuelve {modelo: filas escritas}.
+    """
+    cantidades = Counter()
+    with lectura_consistente():
+        for modelo in lista_modelos:
+            filas = modelo._base_manager.order_by('pk').iterator(chunk_size=tamano)
+            serializers.serialize('jsonl', _contar(filas, cantidades, modelo), stream=salida)
+    return cantidades
+
+
+def convertir(origen, salida, lista_modelos):
+    """Pasa un volcado de dumpdata (JSON) a NDJSON, en el orden de `lista_modelos`.
+
+    Devuelve ({modelo: filas}, objetos ignorados por ser de otros modelos).
+    """
+    orden = {modelo: posicion for posicion, modelo in enumerate(lista_modelos)}
+    objetos = [deserializado.object for deserializado in leer(origen)]
+    elegidos = sorted((obj for obj in objetos if type(obj) in orden), key=lambda obj: orden[type(obj)])
+    cantidades = Counter()
+    serializers.serialize('jsonl', _contar(elegidos, cantidades), stream=salida)
+    return cantidades, len(objetos) - len(elegidos)
+
+
+def leer(ruta):
+    """Objetos deserializados de un respaldo: NDJSON (.jsonl/.ndjson, con o sin .gz) o JSON de dumpdata.
+
+    El NDJSON se lee línea por línea; el JSON de dumpdata se carga entero (es el formato viejo).
+    Un archivo vacío no tiene objetos.
+    """
+    formato = 'json' if str(ruta).endswith('.json') else 'jsonl'
+    with abrir(ruta) as entrada:
+        if formato == 'json':
+            contenido = entrada.read()
+            if not contenido.strip():
+                return
+            entrada = contenido
+        try:
+            yield from serializers.deserialize(formato, entrada, ignorenonexistent=True)
+        except serializers.base.DeserializationError as error:
+            raise ErrorRespaldo(f"No se pudo leer {ruta}: {error}")
+
+
+def restaurar(objetos, lista_modelos, tamano=TAMANO_TANDA, reemplazar=False):
+    """Inserta los objetos en tandas por modelo, en una transacción y con los chequeos de FK al final.
+
+    Las tandas van con el mismo INSERT que bulk_create pero en modo raw, como loaddata: no
+    pasan por pre_save, así `actualizado` y `archivado` quedan como en el respaldo. Los campos
+    normalizados sí se recalculan (ver `_insertar`). Devuelve ({modelo: filas insertadas},
+    objetos ignorados por ser de otros modelos).
+    """
+    elegidos = set(lista_modelos)
+    cantidades = Counter()
+    ignorados = 0
+    with transaction.atomic(), connection.constraint_checks_disabled():
+        if reemplazar:
+            for modelo in reversed(lista_modelos):
+                borrar_filas(modelo, using=connection.alias)
+        else:
+            ocupados = [modelo._meta.label for modelo in lista_modelos if modelo._base_manager.exists()]
+            if ocupados:
+                raise ErrorRespaldo(f"La base ya tiene datos en {', '.join(ocupados)}.")
+
+        tanda = []
+        for deserializado in objetos:
+            obj = deserializado.object
+            if type(obj) not in elegidos:
+                ignorados += 1
+                continue
+            if tanda and (type(obj) is not type(tanda[0]) or len(tanda) >= tamano):
+                cantidades[type(tanda[0])] += _insertar(tanda)
+                tanda = []
+            tanda.append(obj)
+        if tanda:
+            cantidades[type(tanda[0])] += _insertar(tanda)
+
+        connection.check_constraints(table_names=[modelo._meta.db_table for modelo in lista_modelos])
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), lista_modelos):
+                cursor.execute(sql)
+    return cantidades, ignorados
+
+
+def _insertar(tanda):
+    modelo = type(tanda[0])
+    campos = modelo._meta.concrete_fields
+    for obj in tanda:
+        for campo in campos:
+            # Los campos normalizados se recalculan siempre: un respaldo viejo puede traer emails
+            # con mayúsculas o un nombre_busqueda de otra versión de normalizar(). Los que faltan
+            # (respaldos de antes de un campo nuevo) se completan como lo haría save()
+            if isinstance(campo, (CampoNormalizado, EmailNormalizado)) or (
+                not campo.null and getattr(obj, campo.attname) in (None, '')
+            ):
+                campo.pre_save(obj, add=True)
+    tamano = connection.ops.bulk_batch_size(campos, tanda) or len(tanda)
+    for inicio in range(0, len(tanda), tamano):
+        try:
+            modelo._base_manager._insert(
+                tanda[inicio:inicio + tamano], fields=campos, raw=True, using=connection.alias,
+            )
+        except IntegrityError as error:
+            # Por ejemplo dos emails que solo difieren en mayúsculas en un volcado de antes de la restricción
+            raise ErrorRespaldo(f"No se pudo restaurar {modelo._meta.label}: {error}")
+    return len(tanda)
+
+
+def _contar(objetos, cantidades, modelo=None):
+    for obj in objetos:
+        cantidades[modelo or type(obj)] += 1
+        yield obj
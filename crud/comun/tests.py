@@ -0,0 +1,474 @@
+import gzip
+import json
+import os
+import tempfile
+import subprocess
+import sys
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from comun import respaldo, versiones
+from comun.borrado import borrar_filas
+from comun.cache_busqueda import CacheBusqueda
+from comun.management.commands import perfil_arranque
+from comun.mixins import BusquedaCacheadaMixin, VersionCondicionalMixin
+from comun.models import Version
+from comun.paginacion import Concatenados
+from comun.transacciones import lectura_consistente
+from crud import estaticos, routers
+from oficina.models import Oficina
+from persona import estadisticas
+from persona.models import EstadisticaOficina, Persona, PersonaArchivada
+from persona.views import PersonaSearchView
+
+# Las páginas se renderizan sin el manifest de collectstatic
+SIN_MANIFEST = override_settings(STORAGES={
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+
+
+@SIN_MANIFEST
+class CacheBusquedaTests(TestCase):
+
+    def setUp(self):
+        PersonaSearchView.cache_busqueda._vaciar(None)
+        self.url = reverse('persona:buscar')
+
+    def test_version_nueva_vacia_la_cache(self):
+        cache = CacheBusqueda('prueba')
+        guardados = cache.guardar('ana', (1,), [1, 2, 3])
+        self.assertIs(cache.obtener('ana', (1,)), guardados)
+        self.assertEqual(list(guardados), [1, 2, 3])
+        self.assertIsNone(cache.obtener('ana', (2,)))
+        self.assertEqual(cache.estadisticas()['entradas'], 0)
+
+    def test_busqueda_ve_las_altas_al_incrementar_la_version(self):
+        Persona.objects.create(nombre='Ana Pérez', edad=30, email='ana@prueba.com')
+
+        self.assertContains(self.client.get(self.url, {'q': 'perez'}), 'Ana Pérez')
+        aciertos = PersonaSearchView.cache_busqueda.aciertos
+        self.client.get(self.url, {'q': 'perez'})
+        self.assertEqual(PersonaSearchView.cache_busqueda.aciertos, aciertos + 1)
+
+        # save() incrementa la versión de 'persona': la entrada vieja no se vuelve a usar
+        Persona.objects.create(nombre='Juan Perez', edad=40, email='juan@prueba.com')
+        self.assertContains(self.client.get(self.url, {'q': 'perez'}), 'Juan Perez')
+
+    def test_incrementar_sin_escribir_tambien_invalida(self):
+        persona = Persona.objects.create(nombre='Ana Pérez', edad=30, email='ana@prueba.com')
+        self.client.get(self.url, {'q': 'perez'})
+        # Un UPDATE directo no pasa por las señales; quien lo hace incrementa la versión
+        Persona.objects.filter(pk=persona.pk).update(nombre='Ana Gómez', nombre_busqueda='ana gomez')
+        versiones.incrementar('persona')
+        self.assertNotContains(self.client.get(self.url, {'q': 'perez'}), 'Ana')
+
+    def test_los_ids_se_consultan_una_sola_vez(self):
+        Persona.objects.bulk_create(
+            [Persona(nombre=f'Ana {i}', edad=30, email=f'ana{i}@prueba.com') for i in range(15)]
+        )
+        # Versiones, ids y la página por id; el count y el slice del paginador usan el array
+        with self.assertNumQueries(3):
+            self.client.get(self.url, {'q': 'ana', 'page': 2})
+        # Con la búsqueda en cache, solo versiones y la página
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {'q': 'ana', 'page': 2})
+
+    def test_sin_campo_de_busqueda(self):
+        class SinCampo(BusquedaCacheadaMixin, VersionCondicionalMixin):
+            model = Persona
+
+        with self.assertRaises(ImproperlyConfigured):
+            SinCampo().buscar_ids('ana')
+
+
+class BorrarFilasTests(TestCase):
+
+    def setUp(self):
+        self.personas = Persona.objects.bulk_create(
+            [Persona(nombre=f'Persona {i}', edad=i, email=f'p{i}@prueba.com') for i in range(7)]
+        )
+
+    def test_borra_por_tandas_sin_cargar_objetos(self):
+        ids = [persona.pk for persona in self.personas[:5]] + [999999]
+        with mock.patch.object(connection.ops, 'bulk_batch_size', return_value=2), self.assertNumQueries(3):
+            self.assertEqual(borrar_filas(Persona, ids), 5)
+        self.assertEqual(Persona.objects.count(), 2)
+
+    def test_sin_ids_no_consulta_y_none_borra_todo(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(borrar_filas(Persona, []), 0)
+        self.assertEqual(borrar_filas(Persona), 7)
+        self.assertFalse(Persona.objects.exists())
+
+
+class ConcatenadosTests(TestCase):
+
+    def test_pagina_sobre_el_borde_entre_tablas(self):
+        personas = Persona.objects.bulk_create(
+            [Persona(nombre=f'Activa {i}', edad=i, email=f'a{i}@prueba.com') for i in range(3)]
+        )
+        PersonaArchivada.objects.bulk_create([
+            PersonaArchivada.desde_persona(
+                Persona(id=100 + i, nombre=f'Archivada {i}', edad=i, email=f'b{i}@prueba.com',
+                        actualizado=timezone.now()),
+                PersonaArchivada.SIN_OFICINA,
+            )
+            for i in range(4)
+        ])
+        concatenados = Concatenados(Persona.objects.order_by('id'), PersonaArchivada.objects.order_by('id'))
+
+        self.assertEqual(len(concatenados), 7)
+        with self.assertNumQueries(2):
+            pagina = concatenados[2:5]
+        self.assertEqual([p.nombre for p in pagina], ['Activa 2', 'Archivada 0', 'Archivada 1'])
+        self.assertEqual(concatenados[0].pk, personas[0].pk)
+        self.assertEqual(concatenados[-1].nombre, 'Archivada 3')
+        self.assertEqual(concatenados[5:50], list(PersonaArchivada.objects.order_by('id')[2:]))
+
+
+class RespaldoTests(TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+        self.oficina = Oficina.objects.create(nombre="Personal", nombre_corto="PER")
+        self.ana = Persona.objects.create(nombre="Ana Pérez", edad=30, email="ana@prueba.com", oficina=self.oficina)
+        self.archivada = PersonaArchivada.objects.create(
+            id=999, nombre="Beto Gómez", edad=50, email="beto@prueba.com",
+            actualizado=timezone.now().replace(microsecond=0), motivo=PersonaArchivada.INACTIVA,
+        )
+        # El serializador JSON guarda milisegundos: fechas redondas para comparar la vuelta
+        PersonaArchivada.objects.update(archivado=timezone.now().replace(microsecond=0) - timedelta(days=1))
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def restaurar(self, archivo, *argumentos):
+        call_command('restaurar_datos', archivo, *argumentos, stdout=StringIO())
+
+    def test_ida_y_vuelta(self):
+        archivo = self.ruta('respaldo.ndjson.gz')
+        call_command('backup_datos', '-o', archivo, stdout=StringIO())
+        with gzip.open(archivo, 'rt') as f:
+            self.assertEqual(len(f.readlines()), 3)
+        archivada = PersonaArchivada.objects.values().get()
+
+        self.restaurar(archivo, '--replace')
+
+        ana = Persona.objects.get()
+        self.assertEqual((ana.pk, ana.email, ana.oficina_id), (self.ana.pk, 'ana@prueba.com', self.oficina.pk))
+        # La archivada vuelve tal cual, sin que auto_now_add pise la fecha de archivo
+        self.assertEqual(PersonaArchivada.objects.values().get(), archivada)
+        self.assertEqual(EstadisticaOficina.objects.get(oficina=self.oficina).cantidad, 1)
+
+    def test_volcado_viejo_con_mayusculas(self):
+        volcado = [
+            {'model': 'oficina.oficina', 'pk': 1, 'fields': {'nombre': 'Administración', 'nombre_corto': 'ADM'}},
+            {'model': 'persona.persona', 'pk': 7, 'fields': {
+                'nombre': 'Ana Pérez', 'edad': 30, 'email': ' Ana@Prueba.COM ', 'oficina': 1,
+            }},
+            {'model': 'persona.personaarchivada', 'pk': 8, 'fields': {
+                'nombre': 'Beto', 'edad': 50, 'email': 'BETO@prueba.com', 'oficina': None,
+                'actualizado': '2024-01-01T00:00:00Z', 'archivado': '2025-01-01T00:00:00Z',
+                'motivo': PersonaArchivada.SIN_OFICINA,
+            }},
+        ]
+        archivo = self.ruta('backup.json')
+        with open(archivo, 'w') as f:
+            json.dump(volcado, f)
+
+        self.restaurar(archivo, '--replace')
+
+        ana = Persona.objects.get()
+        self.assertEqual((ana.email, ana.nombre_busqueda), ('ana@prueba.com', 'ana perez'))
+        self.assertEqual(Persona.objects.get(email__lower='ana@prueba.com').pk, 7)
+        self.assertEqual(PersonaArchivada.objects.get().email, 'beto@prueba.com')
+        estadistica = EstadisticaOficina.objects.get(oficina_id=1)
+        self.assertEqual((estadistica.cantidad, estadistica.edad_promedio), (1, 30))
+
+    def test_emails_que_chocan_sin_mayusculas(self):
+        archivo = self.ruta('backup.json')
+        with open(archivo, 'w') as f:
+            json.dump([
+                {'model': 'persona.persona', 'pk': pk, 'fields': {'nombre': 'Ana', 'edad': 30, 'email': email}}
+                for pk, email in ((1, 'ana@prueba.com'), (2, 'ANA@prueba.com'))
+            ], f)
+        with self.assertRaisesMessage(CommandError, 'No se pudo restaurar persona.Persona'):
+            self.restaurar(archivo, '--replace')
+        # Nada se borró: el reemplazo va en la misma transacción
+        self.assertEqual(Persona.objects.get().pk, self.ana.pk)
+
+
+@SIN_MANIFEST
+@override_settings(REPLICAS=['replica1'], REPLICA_MAX_LAG=5, REPLICA_STICKY=10)
+class ReplicasTests(TestCase):
+    def setUp(self):
+        self.estado = routers.EstadoReplicas(intervalo=0)
+        versiones.incrementar('persona')
+        versiones.incrementar('persona')
+
+    def replica_con(self, filas):
+        """La réplica devuelve `filas` como sus versiones; la primaria es la base de los tests."""
+        using = Version.objects.using
+        replica = mock.Mock()
+        replica.values_list.return_value = filas
+        return mock.patch.object(
+            Version.objects, 'using', side_effect=lambda base: replica if base == 'replica1' else using(base),
+        )
+
+    def test_router(self):
+        router = routers.RouterReplicas()
+        with mock.patch.object(routers.estado, 'elegir', return_value='replica1'):
+            self.assertEqual(router.db_for_read(Persona), 'default')
+            with routers.leer_de_replica():
+                self.assertEqual(router.db_for_read(Persona), 'replica1')
+                # Sesiones y usuarios siempre de la primaria
+                self.assertEqual(router.db_for_read(User), 'default')
+                self.assertEqual(router.db_for_write(Persona), 'default')
+                with routers.en_primaria():
+                    self.assertEqual(router.db_for_read(Persona), 'default')
+        self.assertFalse(router.allow_migrate('replica1', 'persona'))
+        self.assertTrue(router.allow_migrate('default', 'persona'))
+
+    def test_replica_al_dia(self):
+        with self.replica_con([('persona', 2, timezone.now())]):
+            self.assertEqual(self.estado.estado(), {'replica1': (True, 0.0)})
+            self.assertEqual(self.estado.elegir(), 'replica1')
+
+    def test_replica_atrasada_usa_la_primaria(self):
+        # La réplica aplicó la versión 1 hace un minuto y todavía no la 2: atraso de un minuto
+        with self.replica_con([('persona', 1, timezone.now() - timedelta(minutes=1))]):
+            sana, atraso = self.estado.estado()['replica1']
+            self.assertFalse(sana)
+            self.assertGreaterEqual(atraso, 60)
+            self.assertEqual(self.estado.elegir(), 'default')
+        # Sin ninguna escritura aplicada de esa tabla no hay forma de acotar el atraso
+        with self.replica_con([]):
+            self.assertEqual(self.estado.estado(), {'replica1': (False, float('inf'))})
+
+    def test_estado_se_revisa_por_intervalo(self):
+        estado = routers.EstadoReplicas(intervalo=60)
+        with mock.patch.object(estado, '_revisar', return_value=(True, 0.0)) as revisar:
+            estado.elegir()
+            estado.elegir()
+            self.assertEqual(revisar.call_count, 1)
+            estado.invalidar()
+            estado.elegir()
+            self.assertEqual(revisar.call_count, 2)
+
+    def test_primaria_despues_de_escribir(self):
+        self.client.force_login(User.objects.create_user('ana', password='clave-de-prueba'))
+        with mock.patch.object(routers.estado, 'elegir', return_value='default') as elegir:
+            self.client.get(reverse('persona:lista'))
+            self.assertTrue(elegir.called)
+            elegir.reset_mock()
+
+            respuesta = self.client.post(reverse('persona:crear'), {
+                'nombre': 'Ana', 'edad': 30, 'email': 'ana@prueba.com',
+            })
+            self.assertEqual(respuesta.status_code, 302)
+            cookie = respuesta.cookies[routers.COOKIE_PRIMARIA]
+            self.assertEqual((cookie.value, cookie['max-age']), ('1', 10))
+
+            # Con la cookie, la lista (que ya muestra a Ana) se lee de la primaria
+            respuesta = self.client.get(reverse('persona:lista'))
+            self.assertContains(respuesta, '1 personas encontradas')
+            self.assertFalse(elegir.called)
+
+            # Vencida la cookie vuelve a la réplica
+            del self.client.cookies[routers.COOKIE_PRIMARIA]
+            self.client.get(reverse('persona:lista'))
+            self.assertTrue(elegir.called)
+
+    def test_sin_replicas_no_hay_cookie(self):
+        self.client.force_login(User.objects.create_user('ana', password='clave-de-prueba'))
+        with override_settings(REPLICAS=[]):
+            respuesta = self.client.post(reverse('persona:crear'), {
+                'nombre': 'Ana', 'edad': 30, 'email': 'ana@prueba.com',
+            })
+        self.assertNotIn(routers.COOKIE_PRIMARIA, respuesta.cookies)
+
+
+class EscriturasConcurrentesTests(TransactionTestCase):
+    """Con WAL, busy timeout y BEGIN IMMEDIATE varios hilos escriben sin 'database is locked'."""
+    HILOS = 8
+    ESCRITURAS = 25
+
+    def test_escrituras_concurrentes(self):
+        errores = []
+
+        def escribir(numero):
+            try:
+                for i in range(self.ESCRITURAS):
+                    email = f'h{numero}-{i}@prueba.com'
+                    with transaction.atomic():
+                        # Lee antes de escribir, como la validación de unicidad de un formulario: sin
+                        # BEGIN IMMEDIATE, pasar de lectura a escritura falla sin esperar el timeout
+                        if Persona.objects.filter(email=email).exists():
+                            continue
+                        persona = Persona.objects.create(nombre=f'Hilo {numero}-{i}', edad=20 + i, email=email)
+                        persona.edad += 1
+                        persona.save()
+            except OperationalError as error:
+                errores.append(error)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=escribir, args=(numero,)) for numero in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(Persona.objects.count(), self.HILOS * self.ESCRITURAS)
+        self.assertEqual(estadisticas.verificar(), [])
+
+    def test_lectura_consistente_no_bloquea_a_los_escritores(self):
+        Persona.objects.create(nombre='Ana', edad=30, email='ana@prueba.com')
+        resultado = {}
+
+        def escribir():
+            inicio = time.monotonic()
+            try:
+                with transaction.atomic():
+                    Persona.objects.create(nombre='Juan', edad=40, email='juan@prueba.com')
+                resultado['demora'] = time.monotonic() - inicio
+            except OperationalError as error:
+                resultado['error'] = error
+            finally:
+                connection.close()
+
+        with lectura_consistente():
+            antes = Persona.objects.count()
+            hilo = threading.Thread(target=escribir)
+            hilo.start()
+            hilo.join()
+            # La foto de la lectura no cambia aunque el otro hilo ya haya escrito
+            self.assertEqual(Persona.objects.count(), antes)
+
+        self.assertNotIn('error', resultado)
+        self.assertLess(resultado['demora'], 5)
+        self.assertEqual(Persona.objects.count(), 2)
+
+
+class PerfilesDeArranqueTests(SimpleTestCase):
+    """Cada rol de settings_produccion arranca en un intérprete nuevo, como en producción."""
+    CODIGO = (
+        'import json, sys, django; django.setup(); from django.conf import settings; '
+        'import importlib; importlib.import_module(settings.ROOT_URLCONF); '
+        'print(json.dumps({"apps": settings.INSTALLED_APPS, "middleware": settings.MIDDLEWARE, '
+        '"modulos": [m for m in ("allauth", "captcha", "captcha.views", "PIL") if m in sys.modules]}))'
+    )
+
+    def arrancar(self, rol):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='crud.settings_produccion', CRUD_ROL=rol)
+        resultado = subprocess.run([sys.executable, '-c', self.CODIGO], env=env, cwd=settings.BASE_DIR,
+                                   capture_output=True, text=True)
+        self.assertEqual(resultado.returncode, 0, resultado.stderr[-2000:])
+        return json.loads(resultado.stdout)
+
+    def test_comando_y_worker_no_cargan_el_sitio(self):
+        for rol in ('comando', 'worker'):
+            with self.subTest(rol=rol):
+                arranque = self.arrancar(rol)
+                self.assertNotIn('allauth', arranque['apps'])
+                self.assertEqual(arranque['middleware'], [])
+                self.assertEqual(arranque['modulos'], [])
+
+    def test_web_difiere_las_vistas_de_captcha(self):
+        arranque = self.arrancar('web')
+        self.assertIn('captcha', arranque['apps'])
+        self.assertNotIn('django_extensions', arranque['apps'])
+        # captcha.views (y Pillow) se importan recién con el primer request de captcha
+        self.assertNotIn('captcha.views', arranque['modulos'])
+        self.assertNotIn('PIL', arranque['modulos'])
+
+    def test_rol_desconocido(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='crud.settings_produccion', CRUD_ROL='otro')
+        resultado = subprocess.run([sys.executable, '-c', 'import django; django.setup()'], env=env,
+                                   cwd=settings.BASE_DIR, capture_output=True, text=True)
+        self.assertIn('ImproperlyConfigured: CRUD_ROL', resultado.stderr)
+
+    def test_el_benchmark_mide_la_memoria_del_hijo(self):
+        salida = StringIO()
+        comando = perfil_arranque.Command(stdout=salida)
+        comando._medir('vacío', ['-c', 'pass'], os.environ.copy(), 1)
+        # Un intérprete vacío ocupa bastante menos que este proceso, que ya cargó Django
+        megas = float(salida.getvalue().split('RSS')[1].split()[0])
+        self.assertLess(megas, 25)
+
+
+class AlmacenComprimidoTests(SimpleTestCase):
+    CSS = b'body { color: #333; }\n' * 200
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        origen = os.path.join(directorio.name, 'origen')
+        os.makedirs(os.path.join(origen, 'css'))
+        with open(os.path.join(origen, 'css', 'sitio.css'), 'wb') as f:
+            f.write(self.CSS)
+        with open(os.path.join(origen, 'chico.js'), 'wb') as f:
+            f.write(b'x')
+
+        configuracion = override_settings(
+            STATIC_ROOT=os.path.join(directorio.name, 'destino'),
+            STATICFILES_DIRS=[origen],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': 'crud.estaticos.AlmacenComprimido'}},
+        )
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        estaticos._versionados.cache_clear()
+        self.addCleanup(estaticos._versionados.cache_clear)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hasheado = estaticos.staticfiles_storage.stored_name('css/sitio.css')
+        self.fabrica = RequestFactory()
+
+    def servir(self, path, **headers):
+        return estaticos.servir(self.fabrica.get('/static/' + path, headers=headers), path)
+
+    def test_collectstatic_deja_copias_comprimidas(self):
+        self.assertNotEqual(self.hasheado, 'css/sitio.css')
+        ruta = estaticos.staticfiles_storage.path(self.hasheado)
+        with open(ruta + '.gz', 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), self.CSS)
+        # Un archivo que no se achica comprimido no tiene copia
+        chico = estaticos.staticfiles_storage.path(estaticos.staticfiles_storage.stored_name('chico.js'))
+        self.assertFalse(os.path.exists(chico + '.gz'))
+
+    def test_hasheado_inmutable_y_comprimido(self):
+        respuesta = self.servir(self.hasheado, accept_encoding='gzip, deflate')
+        self.assertEqual(respuesta['Cache-Control'], f'public, max-age={estaticos.UN_ANIO}, immutable')
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertEqual(respuesta['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(b''.join(respuesta.streaming_content)), self.CSS)
+
+        sin_gzip = self.servir(self.hasheado)
+        self.assertFalse(sin_gzip.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(sin_gzip.streaming_content), self.CSS)
+
+    def test_sin_hash_se_revalida(self):
+        respuesta = self.servir('css/sitio.css')
+        self.assertEqual(respuesta['Cache-Control'], 'public, max-age=0, must-revalidate')
+        repetida = self.servir('css/sitio.css', if_modified_since=respuesta['Last-Modified'])
+        self.assertEqual(repetida.status_code, 304)
+
+    def test_fuera_de_static_root(self):
+        with self.assertRaises(Http404):
+            self.servir('../../etc/passwd')
+        with self.assertRaises(Http404):
+            self.servir('no/existe.css')
@@ -0,0 +1,28 @@
+from contextlib import contextmanager
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def lectura_consistente(using=DEFAULT_DB_ALIAS):
+    """Transacción de solo lectura: todas las consultas del bloque ven la misma foto de la base.
+
+    Con SQLite, transaction.atomic() empieza con BEGIN IMMEDIATE (ver transaction_mode en
+    settings) y se queda con el lock de escritura hasta el final, así que una lectura larga
+    haría esperar a todas las escrituras. Acá se abre un BEGIN DEFERRED: en WAL solo fija una
+    foto de la base en la primera consulta y los escritores siguen trabajando. Dentro del
+    bloque no se puede escribir ni abrir otro atomic(). En otros motores, o si ya hay una
+    transacción abierta, es un atomic() común.
+    """
+    conexion = connections[using]
+    if conexion.vendor != 'sqlite' or conexion.in_atomic_block or not conexion.get_autocommit():
+        with transaction.atomic(using=using):
+            yield
+        return
+    with conexion.cursor() as cursor:
+        cursor.execute('BEGIN DEFERRED')
+    try:
+        yield
+    finally:
+        # No escribió nada: ROLLBACK y COMMIT dan lo mismo, y ROLLBACK no puede fallar por el lock
+        with conexion.cursor() as cursor:
+            cursor.execute('ROLLBACK')
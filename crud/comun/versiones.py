@@ -0,0 +1,31 @@
+from django.db.models import F
+from django.utils import timezone
+
+
+def incrementar(*nombres):
+    """Incrementa la versión de las tablas indicadas.
+
+    Se llama después de escribir (en la misma transacción si la hay), así ningún lector
+    puede ver la versión nueva antes que los datos nuevos.
+    """
+    from .models import Version
+
+    ahora = timezone.now()
+    for nombre in nombres:
+        actualizadas = Version.objects.filter(nombre=nombre).update(valor=F('valor') + 1, actualizado=ahora)
+        if not actualizadas:
+            _, creada = Version.objects.get_or_create(nombre=nombre, defaults={'valor': 1, 'actualizado': ahora})
+            if not creada:
+                Version.objects.filter(nombre=nombre).update(valor=F('valor') + 1, actualizado=ahora)
+
+
+def obtener(*nombres):
+    """Devuelve {nombre: (valor, actualizado)} en una sola consulta; las tablas sin escrituras valen 0."""
+    from .models import Version
+
+    versiones = {nombre: (0, None) for nombre in nombres}
+    for nombre, valor, actualizado in Version.objects.filter(nombre__in=nombres).values_list(
+        'nombre', 'valor', 'actualizado'
+    ):
+        versiones[nombre] = (valor, actualizado)
+    return versiones
@@ -0,0 +1,14 @@
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.http import JsonResponse
+from django.views import View
+from . import cache_busqueda
+
+
+class CacheBusquedaJsonView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Aciertos, fallos y ocupación de las caches de búsqueda del proceso que atiende el request."""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({'caches': cache_busqueda.estadisticas()})
@@ -0,0 +1,60 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import sys
+
+# Buffer grande para reducir la cantidad de syscalls al leer archivos de millones de filas
+TAMANIO_BUFFER = 1024 * 1024
+
+FIRMAS_COMPRESION = (
+    (b'\x1f\x8b', 'gzip', lambda flujo: gzip.GzipFile(fileobj=flujo, mode='rb')),
+    (b'BZh', 'bz2', lambda flujo: bz2.BZ2File(flujo, mode='rb')),
+    (b'\xfd7zXZ\x00', 'xz', lambda flujo: lzma.LZMAFile(flujo, mode='rb')),
+)
+
+
+class EntradaCSV:
+    """Abre un CSV plano, .gz, .bz2 o .xz (o stdin con '-') como flujo de texto.
+
+    La compresion se detecta por la firma de los primeros bytes, asi que tambien
+    funciona con datos comprimidos que llegan por un pipe.
+    """
+
+    def __init__(self, ruta, encoding='utf-8', tamanio_buffer=TAMANIO_BUFFER):
+        self.ruta = ruta
+        if ruta == '-':
+            # closefd=False: cerrar la entrada no debe cerrar el stdin del proceso
+            self._crudo = open(sys.stdin.fileno(), 'rb', buffering=0, closefd=False)
+            self.total_bytes = None
+        else:
+            self._crudo = open(ruta, 'rb', buffering=0)
+            self.total_bytes = os.fstat(self._crudo.fileno()).st_size
+
+        flujo = io.BufferedReader(self._crudo, buffer_size=tamanio_buffer)
+        self.compresion = None
+        firma = flujo.peek(6)[:6]
+        for prefijo, nombre, descompresor in FIRMAS_COMPRESION:
+            if firma.startswith(prefijo):
+                self.compresion = nombre
+                flujo = io.BufferedReader(descompresor(flujo), buffer_size=tamanio_buffer)
+                break
+        self.texto = io.TextIOWrapper(flujo, encoding=encoding, newline='')
+
+    def offset(self):
+        """Bytes consumidos del archivo de origen (comprimido o no); None si no se puede saber."""
+        try:
+            return self._crudo.tell()
+        except (OSError, ValueError):
+            return None
+
+    def close(self):
+        self.texto.close()
+        self._crudo.close()
+
+    def __enter__(self):
+        return self.texto
+
+    def __exit__(self, *exc):
+        self.close()
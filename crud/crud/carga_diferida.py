@@ -0,0 +1,20 @@
+from django.utils.module_loading import import_string
+
+
+def vista_diferida(ruta):
+    """Vista que importa su módulo recién en el primer request.
+
+    Sirve para no pagar al arrancar cada worker imports pesados (p. ej. Pillow en captcha.views)
+    de vistas que casi nunca se usan.
+    """
+    vista = None
+
+    def diferida(request, *args, **kwargs):
+        nonlocal vista
+        if vista is None:
+            vista = import_string(ruta)
+        return vista(request, *args, **kwargs)
+
+    diferida.__module__, _, diferida.__name__ = ruta.rpartition('.')
+    diferida.__qualname__ = diferida.__name__
+    return diferida
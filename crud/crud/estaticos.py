@@ -0,0 +1,100 @@
+import gzip
+import mimetypes
+import os
+from functools import cache
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Extensiones que vale la pena comprimir (las imágenes y fuentes ya vienen comprimidas)
+COMPRIMIBLES = ('.css', '.js', '.svg', '.txt', '.json', '.map')
+# Variantes precomprimidas, en orden de preferencia
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+UN_ANIO = 365 * 24 * 60 * 60
+
+
+class AlmacenComprimido(ManifestStaticFilesStorage):
+    """Estáticos con hash en el nombre, más una copia .gz (y .br si está instalado `brotli`).
+
+    Las copias se generan en collectstatic, una sola vez por versión de cada archivo: como el
+    nombre cambia con el contenido, si la copia ya existe es de ese mismo contenido.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for nombre in set(self.hashed_files.values()):
+            if nombre.endswith(COMPRIMIBLES):
+                self._comprimir(nombre)
+
+    def _comprimir(self, nombre):
+        ruta = self.path(nombre)
+        variantes = {'.gz': lambda datos: gzip.compress(datos, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes['.br'] = lambda datos: brotli.compress(datos, quality=11)
+        datos = None
+        for sufijo, comprimir in variantes.items():
+            if os.path.exists(ruta + sufijo):
+                continue
+            if datos is None:
+                with open(ruta, 'rb') as archivo:
+                    datos = archivo.read()
+            comprimido = comprimir(datos)
+            # Si no achica (archivos muy chicos) no se guarda y se sirve el original
+            if len(comprimido) < len(datos):
+                with open(ruta + sufijo, 'wb') as archivo:
+                    archivo.write(comprimido)
+
+
+@cache
+def _versionados():
+    """Nombres con hash del manifest: su contenido no cambia nunca."""
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def servir(request, path):
+    """Sirve STATIC_ROOT cuando no hay servidor web delante (DEBUG=False).
+
+    Los archivos con hash se marcan `immutable` por un año, así una página que ya se visitó no
+    vuelve a pedir su CSS ni su JS; el resto se revalida. Si el cliente acepta br o gzip y
+    collectstatic dejó la copia comprimida, se manda esa.
+    """
+    try:
+        ruta = staticfiles_storage.path(path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(ruta):
+        raise Http404
+
+    tipo, _ = mimetypes.guess_type(ruta)
+    aceptadas = request.headers.get('Accept-Encoding', '')
+    codificacion = None
+    for nombre, sufijo in CODIFICACIONES:
+        if nombre in aceptadas and os.path.isfile(ruta + sufijo):
+            codificacion, ruta = nombre, ruta + sufijo
+            break
+
+    stat = os.stat(ruta)
+    if not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        respuesta = HttpResponseNotModified()
+    else:
+        respuesta = FileResponse(
+            open(ruta, 'rb'), content_type=tipo or 'application/octet-stream', filename=os.path.basename(path)
+        )
+        if codificacion:
+            respuesta['Content-Encoding'] = codificacion
+    respuesta['Last-Modified'] = http_date(stat.st_mtime)
+    respuesta['Vary'] = 'Accept-Encoding'
+    if path in _versionados():
+        respuesta['Cache-Control'] = f'public, max-age={UN_ANIO}, immutable'
+    else:
+        respuesta['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return respuesta
@@ -0,0 +1,147 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+
+# Solo los datos del sitio van a las réplicas; sesiones y usuarios siempre se leen de la primaria
+APPS_REPLICADAS = {'persona', 'oficina', 'comun'}
+COOKIE_PRIMARIA = 'leer_primaria'
+METODOS_LECTURA = ('GET', 'HEAD', 'OPTIONS')
+
+_leer_de_replica = ContextVar('leer_de_replica', default=False)
+
+
+@contextmanager
+def leer_de_replica(activo=True):
+    """Dentro del bloque, las lecturas de APPS_REPLICADAS van a una réplica sana (si hay)."""
+    token = _leer_de_replica.set(activo)
+    try:
+        yield
+    finally:
+        _leer_de_replica.reset(token)
+
+
+def en_primaria():
+    """Fuerza la primaria dentro del bloque, aunque se esté atendiendo una vista de lectura."""
+    return leer_de_replica(False)
+
+
+def primaria_reciente(request):
+    """El cliente escribió hace menos de REPLICA_STICKY segundos: tiene que leer lo que escribió."""
+    return COOKIE_PRIMARIA in request.COOKIES
+
+
+class EstadoReplicas:
+    """Salud y atraso de cada réplica, revisados como mucho una vez cada `intervalo` segundos.
+
+    El atraso se estima con los contadores de comun.Version: si la réplica tiene una versión
+    más vieja que la primaria, le falta al menos una escritura posterior a la última que
+    aplicó, así que está desactualizada desde entonces como mucho: el atraso es el tiempo
+    transcurrido desde esa última escritura aplicada (una cota superior del atraso real, que
+    sigue creciendo si la réplica se congela). Una réplica que no responde o que pasa de
+    REPLICA_MAX_LAG se saltea hasta la próxima revisión.
+    """
+
+    def __init__(self, intervalo=5.0):
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._revisado = None
+        self._estado = {}
+
+    def invalidar(self):
+        self._revisado = None
+
+    def estado(self):
+        """{alias: (sana, atraso en segundos o None si no respondió)}."""
+        ahora = time.monotonic()
+        if self._revisado is None or ahora - self._revisado >= self.intervalo:
+            with self._lock:
+                if self._revisado is None or ahora - self._revisado >= self.intervalo:
+                    self._estado = {alias: self._revisar(alias) for alias in settings.REPLICAS}
+                    self._revisado = ahora
+        return self._estado
+
+    def disponibles(self):
+        return [alias for alias, (sana, _) in self.estado().items() if sana]
+
+    def elegir(self):
+        disponibles = self.disponibles() if settings.REPLICAS else []
+        return random.choice(disponibles) if disponibles else DEFAULT_DB_ALIAS
+
+    def _revisar(self, alias):
+        try:
+            atraso = self.atraso(alias)
+        except DatabaseError:
+            connections[alias].close()
+            return False, None
+        return atraso <= settings.REPLICA_MAX_LAG, atraso
+
+    def atraso(self, alias):
+        from comun.models import Version
+
+        def versiones(base):
+            return {
+                nombre: (valor, actualizado)
+                for nombre, valor, actualizado in Version.objects.using(base).values_list(
+                    'nombre', 'valor', 'actualizado'
+                )
+            }
+
+        primaria = versiones(DEFAULT_DB_ALIAS)
+        replica = versiones(alias)
+        ahora = timezone.now()
+        atraso = 0.0
+        for nombre, (valor, _) in primaria.items():
+            valor_replica, actualizado_replica = replica.get(nombre, (0, None))
+            if valor_replica >= valor:
+                continue
+            if actualizado_replica is None:
+                return float('inf')
+            atraso = max(atraso, (ahora - actualizado_replica).total_seconds())
+        return atraso
+
+
+estado = EstadoReplicas()
+
+
+class RouterReplicas:
+    """Escrituras a la primaria; lecturas a una réplica solo dentro de leer_de_replica()."""
+
+    def db_for_read(self, model, **hints):
+        if _leer_de_replica.get() and model._meta.app_label in APPS_REPLICADAS:
+            return estado.elegir()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Son los mismos datos: un objeto leído de una réplica puede referenciar uno de la primaria
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por la replicación, no con migrate
+        return db not in settings.REPLICAS
+
+
+class PrimariaTrasEscrituraMiddleware:
+    """Después de un POST (o cualquier método que escribe) el cliente lee de la primaria por un rato.
+
+    Se marca con una cookie que vence sola a los REPLICA_STICKY segundos, así no hace falta
+    guardar nada en la sesión.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if settings.REPLICAS and request.method not in METODOS_LECTURA and response.status_code < 500:
+            response.set_cookie(
+                COOKIE_PRIMARIA, '1', max_age=settings.REPLICA_STICKY, httponly=True, samesite='Lax'
+            )
+        return response
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'persona',
     'accounts',
     'oficina',
+    'comun',
     'captcha',
     'bootstrap4',
     'crispy_forms',
@@ -62,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'crud.routers.PrimariaTrasEscrituraMiddleware',
     
 ]
 
@@ -96,9 +98,47 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD'),
         'HOST':   os.environ.get('POSTGRES_HOST'),
         'PORT':   os.environ.get('POSTGRES_PORT'),
+        # Ajustes de SQLite para lecturas y escrituras concurrentes, aplicados a cada conexión nueva:
+        # - WAL: los lectores no bloquean al escritor ni al revés.
+        # - synchronous=NORMAL: en WAL no pierde consistencia y evita un fsync por commit.
+        # - mmap_size: lecturas desde memoria mapeada en lugar de read() por página.
+        # - timeout: espera (busy timeout) antes de fallar con "database is locked".
+        # - IMMEDIATE: toma el lock de escritura al empezar la transacción; así el timeout
+        #   aplica siempre, en lugar de fallar al querer pasar de lectura a escritura.
+        #   Vale para todo atomic(); las lecturas largas que necesitan una foto consistente
+        #   (p. ej. backup_datos) usan comun.transacciones.lectura_consistente, que no bloquea.
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))};"
+            ),
+            'timeout': int(os.environ.get('SQLITE_TIMEOUT', 20)),
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Los tests usan un archivo y no la base en memoria: así prueban WAL y el lock entre hilos
+        'TEST': {'NAME': os.environ.get('SQLITE_TEST_DB', str(BASE_DIR / 'test_crud_db'))},
     }
 }
 
+# Réplicas de solo lectura (crud.routers): DB_REPLICAS es una lista separada por comas de archivos
+# SQLite o, con otro motor, de hosts con la misma base. Las vistas de lista, detalle y búsqueda leen
+# de una réplica sana con atraso de hasta REPLICA_MAX_LAG segundos; quien escribió lee de la
+# primaria durante REPLICA_STICKY segundos. Para probar en local alcanza con una copia del archivo
+# (sqlite3 crud_db ".backup replica.db") y DB_REPLICAS=replica.db.
+REPLICAS = []
+for numero, replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    campo = 'NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3') else 'HOST'
+    DATABASES[f'replica{numero}'] = {**DATABASES['default'], campo: replica.strip(), 'TEST': {'MIRROR': 'default'}}
+    REPLICAS.append(f'replica{numero}')
+DATABASE_ROUTERS = ['crud.routers.RouterReplicas']
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 5))
+REPLICA_STICKY = int(os.environ.get('REPLICA_STICKY', 10))
+
+# Agrupa las escrituras de los formularios en transacciones cortas hechas por un único hilo
+# (comun.escrituras). Opcional: sirve cuando muchos POST compiten por el lock de SQLite.
+AGRUPAR_ESCRITURAS = os.environ.get('AGRUPAR_ESCRITURAS', '') == '1'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -135,6 +175,36 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATICFILES_DIRS = [BASE_DIR / 'static']
+# Destino de collectstatic; con DEBUG=False los estáticos se sirven desde acá (crud.estaticos.servir)
+STATIC_ROOT = os.environ.get('STATIC_ROOT', BASE_DIR / 'staticfiles')
+
+# Nombres con hash del contenido y copias .gz/.br generadas en collectstatic. Con DEBUG=False
+# hay que correr collectstatic antes de levantar el sitio: {% static %} lee el manifest.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'crud.estaticos.AlmacenComprimido'},
+}
+
+# Directorio donde se guardan los CSV subidos hasta que los procesa `manage.py procesar_importaciones`
+IMPORTACIONES_DIR = os.environ.get('IMPORTACIONES_DIR', BASE_DIR / 'importaciones')
+# Segundos sin latido tras los cuales una importación en curso se da por abandonada (worker caído)
+IMPORTACIONES_SIN_LATIDO = int(os.environ.get('IMPORTACIONES_SIN_LATIDO', 300))
+
+# Tokens (separados por coma) con los que los integradores llaman a persona:api_lote sin sesión
+API_LOTE_TOKENS = [token for token in os.environ.get('API_LOTE_TOKENS', '').split(',') if token]
+
+# Tamaño de la cache de búsquedas de cada proceso (comun.cache_busqueda), por vista de búsqueda
+BUSQUEDA_CACHE_ENTRADAS = int(os.environ.get('BUSQUEDA_CACHE_ENTRADAS', 512))
+BUSQUEDA_CACHE_IDS = int(os.environ.get('BUSQUEDA_CACHE_IDS', 200_000))
+
+# Cache de cada proceso; la usan las filas de las listas ({% cache %} por versión de cada fila)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_ENTRADAS', 20_000))},
+    }
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
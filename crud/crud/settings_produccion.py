@@ -0,0 +1,56 @@
+"""
+Perfil de producción: DJANGO_SETTINGS_MODULE=crud.settings_produccion
+
+Cada proceso carga solo las apps que su rol necesita (variable CRUD_ROL):
+
+- web:      el sitio completo, sin django_extensions.
+- comando:  comandos de manage.py en cron (load_personas, runscript...); sin allauth,
+            captcha ni los paquetes de formularios/bootstrap.
+- worker:   `procesar_importaciones`; lo mínimo para los modelos.
+
+Las migraciones se corren con el rol web, que tiene todos los modelos del sitio.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *
+
+DEBUG = False
+
+CRUD_ROL = os.environ.get('CRUD_ROL', 'web')
+
+APPS_POR_ROL = {
+    'web': [app for app in INSTALLED_APPS if app != 'django_extensions'],
+    'comando': [
+        'django_extensions',
+        'django.contrib.auth',
+        'django.contrib.contenttypes',
+        'persona',
+        'oficina',
+        'comun',
+    ],
+    'worker': [
+        'django.contrib.auth',
+        'django.contrib.contenttypes',
+        'persona',
+        'oficina',
+        'comun',
+    ],
+}
+
+if CRUD_ROL not in APPS_POR_ROL:
+    raise ImproperlyConfigured(f"CRUD_ROL debe ser uno de {', '.join(APPS_POR_ROL)} (recibido: {CRUD_ROL!r})")
+
+INSTALLED_APPS = APPS_POR_ROL[CRUD_ROL]
+
+if CRUD_ROL != 'web':
+    MIDDLEWARE = []
+
+# Plantillas compiladas una sola vez por proceso
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
@@ -0,0 +1,20 @@
+import re
+import unicodedata
+
+_ESPACIOS = re.compile(r'\s+')
+
+
+def normalizar(texto):
+    """Pasa a minusculas (casefold), quita acentos y colapsa los espacios."""
+    if not texto:
+        return ''
+    descompuesto = unicodedata.normalize('NFKD', texto.casefold())
+    sin_acentos = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return _ESPACIOS.sub(' ', sin_acentos).strip()
+
+
+def normalizar_email(email):
+    """Email sin espacios alrededor y en minúsculas; así se guarda y así se compara."""
+    if not email:
+        return email
+    return email.strip().lower()
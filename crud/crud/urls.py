@@ -14,14 +14,42 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path, include
+import re
+from django.apps import apps
+from django.conf import settings
+from django.urls import path, re_path, include
+from crud.carga_diferida import vista_diferida
+from crud.estaticos import servir
+from comun.views import CacheBusquedaJsonView
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('persona/', include('persona.urls')),
-    path('account/', include('allauth.urls')),
-    path('captcha/', include('captcha.urls')),
-    path('oficina/', include('oficina.urls'))
+    path('oficina/', include('oficina.urls')),
+    path('cache-busqueda/', CacheBusquedaJsonView.as_view(), name='cache_busqueda'),
     
 ]
+
+# Los perfiles de settings_produccion pueden no instalar admin/allauth/captcha (p. ej. en comandos)
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+    urlpatterns.append(path('admin/', admin.site.urls))
+
+if apps.is_installed('allauth.account'):
+    urlpatterns.append(path('account/', include('allauth.urls')))
+
+if apps.is_installed('captcha'):
+    # Mismas rutas que captcha.urls, pero sin importar captcha.views (y con él Pillow) al arrancar
+    urlpatterns += [
+        re_path(r'captcha/image/(?P<key>\w+)/$', vista_diferida('captcha.views.captcha_image'),
+                name='captcha-image', kwargs={'scale': 1}),
+        re_path(r'captcha/image/(?P<key>\w+)@2/$', vista_diferida('captcha.views.captcha_image'),
+                name='captcha-image-2x', kwargs={'scale': 2}),
+        re_path(r'captcha/audio/(?P<key>\w+).wav$', vista_diferida('captcha.views.captcha_audio'),
+                name='captcha-audio'),
+        re_path(r'captcha/refresh/$', vista_diferida('captcha.views.captcha_refresh'),
+                name='captcha-refresh'),
+    ]
+
+if not settings.DEBUG and apps.is_installed('django.contrib.staticfiles'):
+    # Con DEBUG=True los sirve runserver desde las carpetas de origen, sin hash
+    urlpatterns.append(re_path(r'^%s(?P<path>.+)$' % re.escape(settings.STATIC_URL.lstrip('/')), servir))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 17:01
+
+import comun.campos
+from django.db import migrations
+from crud.texto import normalizar
+
+
+def completar_nombre_busqueda(apps, schema_editor):
+    Oficina = apps.get_model('oficina', 'Oficina')
+    oficinas = list(Oficina.objects.only('id', 'nombre'))
+    for oficina in oficinas:
+        oficina.nombre_busqueda = normalizar(oficina.nombre)
+    Oficina.objects.bulk_update(oficinas, ['nombre_busqueda'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0003_alter_oficina_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='oficina',
+            name='nombre_busqueda',
+            field=comun.campos.CampoNormalizado(default='', max_length=100, origen='nombre'),
+        ),
+        migrations.RunPython(completar_nombre_busqueda, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0004_oficina_nombre_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='oficina',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última modificación'),
+        ),
+    ]
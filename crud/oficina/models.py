@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.exceptions import ValidationError
+from comun.campos import CampoNormalizado
 
 def validate_nombre_corto(value):
     if not value.isupper():
@@ -13,6 +14,10 @@ class Oficina(models.Model):
                                     help_text="Codigo corto unico. (ej: PER,ADM,etc)",
     validators= [validate_nombre_corto],
     )
+    # nombre normalizado para las búsquedas, lo completa el propio campo al guardar
+    nombre_busqueda = CampoNormalizado(origen="nombre", max_length=100, default="")
+    # Última modificación; es parte de la clave de la fila cacheada en la lista
+    actualizado = models.DateTimeField(verbose_name="Última modificación", auto_now=True)
     
     class Meta:
         """meta definicion for oficina"""
@@ -0,0 +1,97 @@
+import threading
+import time
+from comun import versiones
+from crud import routers
+from crud.texto import normalizar
+
+
+class ResolverOficinas:
+    """Mapa en memoria nombre_corto / nombre -> id de Oficina, compartido por todo el proceso.
+
+    Se carga la primera vez que se usa y se recarga cuando cambia el contador de versión
+    'oficina'. Dentro del proceso las señales lo invalidan al instante; los cambios hechos por
+    otros procesos se detectan consultando la versión como mucho una vez cada `ttl` segundos.
+    """
+
+    def __init__(self, ttl=5.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._version = None
+        self._verificado = None
+        self._por_codigo = {}
+        self._por_nombre = {}
+        self._datos = {}
+
+    def invalidar(self):
+        self._verificado = None
+
+    def _asegurar(self):
+        ahora = time.monotonic()
+        if self._verificado is not None and ahora - self._verificado < self.ttl:
+            return
+        with self._lock:
+            if self._verificado is not None and ahora - self._verificado < self.ttl:
+                return
+            # La versión se lee antes que los datos: si alguien escribe en el medio, la próxima
+            # verificación ve una versión más nueva y vuelve a cargar
+            # Siempre de la primaria: lo usan los formularios que escriben
+            with routers.en_primaria():
+                version = versiones.obtener('oficina')['oficina'][0]
+                if version != self._version:
+                    self._cargar()
+                    self._version = version
+            self._verificado = ahora
+
+    def _cargar(self):
+        from .models import Oficina
+
+        por_codigo = {}
+        por_nombre = {}
+        datos = {}
+        for oficina_id, nombre, nombre_corto in Oficina.objects.values_list('id', 'nombre', 'nombre_corto'):
+            por_codigo[nombre_corto] = oficina_id
+            por_nombre[normalizar(nombre)] = oficina_id
+            datos[oficina_id] = (nombre, nombre_corto)
+        self._por_codigo, self._por_nombre, self._datos = por_codigo, por_nombre, datos
+
+    def resolver(self, valor):
+        """Id de la oficina por nombre_corto (sin importar mayúsculas) o por nombre; None si no existe."""
+        if not valor:
+            return None
+        self._asegurar()
+        valor = valor.strip()
+        oficina_id = self._por_codigo.get(valor.upper())
+        if oficina_id is None:
+            oficina_id = self._por_nombre.get(normalizar(valor))
+        return oficina_id
+
+    def resolver_muchos(self, valores):
+        """Resuelve varios valores con una sola verificación de versión: {valor: id o None}."""
+        self._asegurar()
+        return {valor: self.resolver(valor) for valor in set(valores)}
+
+    def existe(self, oficina_id):
+        self._asegurar()
+        return oficina_id in self._datos
+
+    def opciones(self):
+        """(id, etiqueta) ordenadas por nombre, con la misma etiqueta que Oficina.__str__."""
+        self._asegurar()
+        return [
+            (oficina_id, f'{nombre} - ({nombre_corto})')
+            for oficina_id, (nombre, nombre_corto) in sorted(self._datos.items(), key=lambda item: item[1][0])
+        ]
+
+    def instancia(self, oficina_id):
+        """Oficina armada desde el mapa, sin consultar la base (sirve para asignar FKs)."""
+        from .models import Oficina
+
+        self._asegurar()
+        nombre, nombre_corto = self._datos[oficina_id]
+        oficina = Oficina(id=oficina_id, nombre=nombre, nombre_corto=nombre_corto)
+        oficina._state.adding = False
+        oficina._state.db = 'default'
+        return oficina
+
+
+resolver = ResolverOficinas()
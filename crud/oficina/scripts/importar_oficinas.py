@@ -2,18 +2,22 @@ import csv
 import sys
 from django.db import transaction
 from django.core.exceptions import ValidationError
+from crud.archivos import EntradaCSV
 from oficina.models import Oficina
+from oficina.resolver import resolver
+from comun import versiones
 
 def run(*args):
     if not args:
         print("Error: proporcionar ruta del archivo")
         print("uso:./manage.py runscript importar_oficinas --script-args <ruta del archivo>")
+        print("la ruta puede ser un .csv, .csv.gz, .csv.bz2, .csv.xz o - para leer de stdin")
         sys.exit(1)
         
     csv_file = args[0]
     
     try:
-        with open(csv_file,'r', encoding = 'utf8') as f:
+        with EntradaCSV(csv_file, encoding='utf8') as f:
             reader = csv.DictReader(f)
             oficinas_a_crear =[]
             
@@ -36,7 +40,9 @@ def run(*args):
                 
             with transaction.atomic():
                 Oficina.objects.bulk_create(oficinas_a_crear)
-                print(f"importacion de {len(oficinas_a_crear)} oficinas completada exitosamente")
+                versiones.incrementar('oficina')
+            resolver.invalidar()
+            print(f"importacion de {len(oficinas_a_crear)} oficinas completada exitosamente")
     
     except FileNotFoundError:
         print(f"Error no se encontro el el archivo {csv_file}")
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.db import transaction
+from django.dispatch import receiver
+from comun import versiones
+from .models import Oficina
+from .resolver import resolver
+
+
+@receiver(post_save, sender=Oficina)
+def incrementar_version_al_guardar(sender, instance, raw=False, **kwargs):
+    versiones.incrementar('oficina')
+    transaction.on_commit(resolver.invalidar)
+
+
+@receiver(post_delete, sender=Oficina)
+def incrementar_version_al_borrar(sender, instance, **kwargs):
+    # Borrar una oficina deja en NULL la oficina de sus personas (SET_NULL, sin señales)
+    versiones.incrementar('oficina', 'persona')
+    transaction.on_commit(resolver.invalidar)
@@ -1,3 +1,80 @@
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.test import TestCase
+from django.urls import reverse
+from comun import versiones
+from .models import Oficina
+from .resolver import ResolverOficinas, resolver
 
-# Create your tests here.
+
+class ResolverOficinasTests(TestCase):
+
+    def setUp(self):
+        resolver.invalidar()
+        self.ventas = Oficina.objects.create(nombre='Ventas y Atención', nombre_corto='VEN')
+
+    def test_resuelve_por_codigo_o_nombre(self):
+        self.assertEqual(resolver.resolver('ven'), self.ventas.pk)
+        self.assertEqual(resolver.resolver(' ventas y atencion '), self.ventas.pk)
+        self.assertIsNone(resolver.resolver('COM'))
+        self.assertEqual(resolver.resolver_muchos(['VEN', 'COM']), {'VEN': self.ventas.pk, 'COM': None})
+        self.assertEqual(resolver.opciones(), [(self.ventas.pk, 'Ventas y Atención - (VEN)')])
+
+    def test_guardar_invalida_al_confirmar(self):
+        self.assertEqual(resolver.resolver('VEN'), self.ventas.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ventas.nombre_corto = 'VTA'
+            self.ventas.save()
+        with self.assertNumQueries(2):
+            # Una consulta para la versión y otra para recargar el mapa
+            self.assertEqual(resolver.resolver('VTA'), self.ventas.pk)
+        self.assertIsNone(resolver.resolver('VEN'))
+
+    def test_borrar_invalida_al_confirmar(self):
+        self.assertTrue(resolver.existe(self.ventas.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ventas.delete()
+        self.assertIsNone(resolver.resolver('VEN'))
+        self.assertFalse(resolver.existe(self.ventas.pk))
+
+    def test_sin_cambios_no_consulta(self):
+        resolver.resolver('VEN')
+        with self.assertNumQueries(0):
+            resolver.resolver('VEN')
+
+    def test_cambios_de_otro_proceso_se_ven_por_la_version(self):
+        propio = ResolverOficinas(ttl=0)
+        self.assertEqual(propio.resolver('VEN'), self.ventas.pk)
+        # Otro proceso: UPDATE sin señales en este proceso, solo el contador de versión
+        Oficina.objects.filter(pk=self.ventas.pk).update(nombre_corto='VTA')
+        self.assertEqual(propio.resolver('VEN'), self.ventas.pk)
+        versiones.incrementar('oficina')
+        self.assertEqual(propio.resolver('VTA'), self.ventas.pk)
+
+
+class FilaCacheadaTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.ventas = Oficina.objects.create(nombre='Ventas', nombre_corto='VEN')
+        self.compras = Oficina.objects.create(nombre='Compras', nombre_corto='COM')
+
+    def lista(self):
+        # El fragmento (HTMX) es lo que tiene las filas cacheadas
+        return self.client.get(reverse('oficina:lista'), headers={'HX-Request': 'true'})
+
+    def clave(self, oficina):
+        return make_template_fragment_key('fila_oficina', [oficina.pk, oficina.actualizado])
+
+    def test_editar_cambia_solo_la_clave_de_esa_fila(self):
+        self.lista()
+        clave_ventas, clave_compras = self.clave(self.ventas), self.clave(self.compras)
+        self.assertIsNotNone(cache.get(clave_compras))
+
+        self.ventas.nombre = 'Ventas y Atención'
+        self.ventas.save()
+        self.assertNotEqual(self.clave(self.ventas), clave_ventas)
+        self.assertContains(self.lista(), 'Ventas y Atención')
+        self.assertIsNotNone(cache.get(self.clave(self.ventas)))
+        # La otra oficina no cambió: su fila sigue con la misma clave
+        self.assertEqual(self.clave(Oficina.objects.get(pk=self.compras.pk)), clave_compras)
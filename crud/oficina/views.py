@@ -7,26 +7,35 @@ from django.urls import reverse_lazy
 from .models import Oficina
 #import login mixin
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.conf import settings
+from comun.cache_busqueda import CacheBusqueda
+from comun.mixins import (
+    BusquedaCacheadaMixin, EscrituraAgrupadaMixin, LecturaReplicaMixin, ListaParcialMixin, VersionCondicionalMixin,
+)
 
 
-class OficinaListView(ListView):
+class OficinaListView(LecturaReplicaMixin, ListaParcialMixin, VersionCondicionalMixin, ListView):
     model = Oficina
     template_name = "oficina/lista.html"
+    template_parcial = "oficina/lista_resultados.html"
+    urls_fila = {'detalle': 'oficina:detalle', 'editar': 'oficina:editar', 'eliminar': 'oficina:eliminar'}
     context_object_name = "oficinas"
+    versiones_tablas = ('oficina',)
     paginate_by = 10
     
-class OficinaDetailView(DetailView):
+class OficinaDetailView(LecturaReplicaMixin, VersionCondicionalMixin, DetailView):
     model = Oficina
     template_name = "oficina/detalle.html"
     context_object_name = "oficinas"
+    versiones_tablas = ('oficina', 'persona')
     
-class OficinaCreateView(LoginRequiredMixin, CreateView):
+class OficinaCreateView(LoginRequiredMixin, EscrituraAgrupadaMixin, CreateView):
     model = Oficina
     template_name = "oficina/crear.html"
     fields = ['nombre', 'nombre_corto']
     success_url = reverse_lazy('oficina:lista')
     
-class OficinaUpdateView(LoginRequiredMixin, UpdateView):
+class OficinaUpdateView(LoginRequiredMixin, EscrituraAgrupadaMixin, UpdateView):
     model = Oficina
     template_name = "oficina/editar.html"
     fields = ['nombre', 'nombre_corto']
@@ -43,17 +52,16 @@ class OficinaDeleteView(LoginRequiredMixin, DeleteView):
         context['action'] = 'Eliminar Oficina'
         return context
 
-class OficinaSearchView(ListView):
+class OficinaSearchView(LecturaReplicaMixin, ListaParcialMixin, VersionCondicionalMixin, BusquedaCacheadaMixin, ListView):
     model = Oficina
     template_name = "oficina/buscar.html"
+    template_parcial = "oficina/buscar_resultados.html"
     context_object_name = "oficinas"
-    
-    def get_queryset(self):
-        query = self.request.GET.get('q')
-        if query:
-            return Oficina.objects.filter(nombre__icontains=query)
-        else:
-            return Oficina.objects.none()
+    versiones_tablas = ('oficina',)
+    cache_busqueda = CacheBusqueda('oficina', settings.BUSQUEDA_CACHE_ENTRADAS, settings.BUSQUEDA_CACHE_IDS)
+    campo_busqueda = 'nombre_busqueda'
+    orden_busqueda = ('nombre',)
+    paginate_by = 10
         
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from comun import versiones
+from comun.borrado import borrar_filas
+from crud.texto import normalizar
+from . import estadisticas
+from .models import ParDuplicado, Persona
+
+TAMANO_TANDA = 1000
+
+
+def filtrar(q=None, oficina_id=None, sin_oficina=False, queryset=None):
+    """Personas que coinciden con la búsqueda `q` y/o la oficina, como en la lista y el buscador."""
+    qs = Persona.objects.all() if queryset is None else queryset
+    clave = normalizar(q)
+    if clave:
+        qs = qs.filter(nombre_busqueda__contains=clave)
+    if sin_oficina:
+        qs = qs.filter(oficina__isnull=True)
+    elif oficina_id is not None:
+        qs = qs.filter(oficina_id=oficina_id)
+    return qs
+
+
+def _por_tandas(queryset, tamano, procesar):
+    """Aplica `procesar(filas)` a tandas de (id, oficina_id, edad) ordenadas por id.
+
+    Cada tanda se lee y se procesa en su propia transacción, pidiendo las filas a partir del
+    último id: sirve aunque la operación saque las filas del filtro (reasignar todo lo de una
+    oficina, borrar), y los deltas de estadísticas salen de los mismos valores que se cambian.
+    Devuelve la suma de lo que devuelve `procesar`.
+    """
+    total = 0
+    ultimo = 0
+    while True:
+        with transaction.atomic():
+            filas = list(
+                queryset.select_for_update().filter(id__gt=ultimo).order_by('id')
+                .values_list('id', 'oficina_id', 'edad')[:tamano]
+            )
+            if not filas:
+                return total
+            total += procesar(filas)
+            versiones.incrementar('persona')
+        ultimo = filas[-1][0]
+
+
+def reasignar(queryset, oficina_id, tamano=TAMANO_TANDA):
+    """Mueve las personas del queryset a la oficina indicada (None = sin oficina).
+
+    Un UPDATE por tanda, cada una en su transacción; las estadísticas de las oficinas de
+    origen y destino se ajustan por deltas dentro de la misma tanda. Devuelve la cantidad movida.
+    """
+    if oficina_id is None:
+        pendientes = queryset.exclude(oficina__isnull=True)
+    else:
+        pendientes = queryset.exclude(oficina_id=oficina_id)
+
+    def mover(filas):
+        movidas = Persona.objects.filter(id__in=[persona_id for persona_id, _, _ in filas]).update(
+            oficina_id=oficina_id, actualizado=timezone.now()
+        )
+        estadisticas.aplicar_deltas(
+            [(origen, edad, -1) for _, origen, edad in filas] + [(oficina_id, edad, 1) for _, _, edad in filas]
+        )
+        return movidas
+
+    return _por_tandas(pendientes, tamano, mover)
+
+
+def eliminar(queryset, tamano=TAMANO_TANDA):
+    """Borra las personas del queryset con un DELETE por tanda, sin cargar los objetos.
+
+    Se saltean las señales por fila (un DELETE directo); los pares de posibles duplicados
+    que las referencian se borran antes y las estadísticas se restan por tanda.
+    """
+    def borrar(filas):
+        ids = [persona_id for persona_id, _, _ in filas]
+        ParDuplicado.objects.filter(Q(persona_a_id__in=ids) | Q(persona_b_id__in=ids)).delete()
+        borradas = borrar_filas(Persona, ids)
+        estadisticas.registrar_bajas([(origen, edad) for _, origen, edad in filas])
+        return borradas
+
+    return _por_tandas(queryset, tamano, borrar)
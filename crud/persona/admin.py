@@ -1,6 +1,83 @@
-from django.contrib import admin
-from .models import Persona
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.template.response import TemplateResponse
+from . import acciones
+from .forms import OficinaChoiceField
+from .models import Persona, PersonaArchivada, ParDuplicado
 
-admin.site.register(Persona)
+
+@admin.register(Persona)
+class PersonaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'email', 'edad', 'oficina')
+    list_select_related = ('oficina',)
+    list_filter = ('oficina',)
+    search_fields = ('nombre', 'email')
+    actions = ['reasignar_oficina', 'eliminar_en_bloque']
+
+    @admin.action(description="Mover a otra oficina", permissions=['change'])
+    def reasignar_oficina(self, request, queryset):
+        campo = OficinaChoiceField()
+        if request.POST.get('confirmado'):
+            try:
+                destino = campo.clean(request.POST.get('destino'))
+            except forms.ValidationError:
+                self.message_user(request, "Oficina destino inválida.", messages.ERROR)
+                return None
+            cantidad = acciones.reasignar(queryset, destino.pk if destino else None)
+            self.message_user(request, f"Se movieron {cantidad} personas a {destino or 'sin oficina'}.")
+            return None
+        return self._confirmar(request, queryset, 'reasignar_oficina', opciones_destino=campo.choices)
+
+    @admin.action(description="Eliminar en bloque (sin cargar los objetos)", permissions=['delete'])
+    def eliminar_en_bloque(self, request, queryset):
+        if request.POST.get('confirmado'):
+            cantidad = acciones.eliminar(queryset)
+            self.message_user(request, f"Se eliminaron {cantidad} personas.")
+            return None
+        return self._confirmar(request, queryset, 'eliminar_en_bloque')
+
+    def _confirmar(self, request, queryset, accion, **extra):
+        # Solo se cuenta: con "seleccionar todo" el queryset puede ser la tabla entera
+        return TemplateResponse(request, "admin/persona/accion_masiva.html", {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Confirmar acción",
+            'accion': accion,
+            'cantidad': queryset.count(),
+            'seleccionados': request.POST.getlist(ACTION_CHECKBOX_NAME),
+            'seleccionar_todo': request.POST.get('select_across', '0'),
+            **extra,
+        })
+
+
+@admin.register(ParDuplicado)
+class ParDuplicadoAdmin(admin.ModelAdmin):
+    """Reporte de posibles duplicados generado por `manage.py find_duplicates`."""
+    list_display = ('persona_a', 'persona_b', 'puntaje', 'bloque', 'creado')
+    list_select_related = ('persona_a', 'persona_b')
+    list_filter = ('creado',)
+    search_fields = ('persona_a__nombre', 'persona_b__nombre', 'persona_a__email', 'persona_b__email')
+    raw_id_fields = ('persona_a', 'persona_b')
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(PersonaArchivada)
+class PersonaArchivadaAdmin(admin.ModelAdmin):
+    """Personas movidas por `manage.py archivar_personas`; solo lectura."""
+    list_display = ('id', 'nombre', 'email', 'oficina', 'motivo', 'actualizado', 'archivado')
+    list_select_related = ('oficina',)
+    list_filter = ('motivo', 'archivado')
+    search_fields = ('nombre', 'email')
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 # Register your models here.
@@ -0,0 +1,49 @@
+from django.db import transaction
+from django.db.models import Q
+from comun import versiones
+from comun.borrado import borrar_filas
+from . import estadisticas
+from .models import ParDuplicado, Persona, PersonaArchivada
+
+
+def filtro_politica(sin_oficina=False, inactivas_desde=None):
+    """Q con las personas a archivar: sin oficina y/o sin cambios desde `inactivas_desde`."""
+    filtro = Q()
+    if sin_oficina:
+        filtro |= Q(oficina__isnull=True)
+    if inactivas_desde is not None:
+        filtro |= Q(actualizado__lt=inactivas_desde)
+    if not filtro:
+        raise ValueError("Hace falta al menos una política de archivo.")
+    return filtro
+
+
+def archivar_lote(filtro, batch_size=500):
+    """Mueve al archivo hasta `batch_size` personas en una transacción. Devuelve cuántas movió.
+
+    Cada lote es atómico: si el proceso se corta, lo ya movido queda en el archivo y lo demás
+    en la tabla principal, así que volver a correrlo continúa donde quedó.
+    """
+    with transaction.atomic():
+        personas = list(
+            Persona.objects.select_for_update().filter(filtro).order_by('id')[:batch_size]
+        )
+        if not personas:
+            return 0
+        ids = [persona.id for persona in personas]
+        archivadas = [
+            PersonaArchivada.desde_persona(
+                persona,
+                PersonaArchivada.SIN_OFICINA if persona.oficina_id is None else PersonaArchivada.INACTIVA,
+            )
+            for persona in personas
+        ]
+        # Un id ya archivado solo puede ser una copia vieja: gana la de la tabla principal
+        PersonaArchivada.objects.filter(id__in=ids).delete()
+        PersonaArchivada.objects.bulk_create(archivadas)
+        ParDuplicado.objects.filter(Q(persona_a_id__in=ids) | Q(persona_b_id__in=ids)).delete()
+        # Borrado directo, sin señales por fila: estadísticas y versión se actualizan una vez por lote
+        borrar_filas(Persona, ids)
+        estadisticas.registrar_bajas([(persona.oficina_id, persona.edad) for persona in personas])
+        versiones.incrementar('persona')
+    return len(personas)
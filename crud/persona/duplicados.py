@@ -0,0 +1,150 @@
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from crud.texto import normalizar
+
+_NO_LETRAS = re.compile(r'[^a-z]')
+_REPETIDAS = re.compile(r'(.)\1+')
+_VOCALES = re.compile(r'[aeiouy]')
+
+
+def clave_fonetica(nombre_normalizado):
+    """Clave fonetica aproximada para nombres en castellano (b/v, c/s/z, ll/y, h muda...)."""
+    claves = []
+    for palabra in nombre_normalizado.split():
+        p = _NO_LETRAS.sub('', palabra)
+        if not p:
+            continue
+        p = p.replace('ll', 'y').replace('qu', 'k').replace('ch', 'x')
+        p = re.sub(r'c(?=[ei])', 's', p)
+        p = re.sub(r'g(?=[ei])', 'j', p)
+        p = p.replace('c', 'k').replace('z', 's').replace('v', 'b').replace('h', '').replace('w', 'u')
+        p = _REPETIDAS.sub(r'\1', p)
+        if p:
+            claves.append(p[0] + _VOCALES.sub('', p[1:]))
+    return ' '.join(claves)
+
+
+def claves_bloqueo(nombre_normalizado, oficina_id=None, por_oficina=False):
+    """Claves de bloque de una persona: nombre normalizado, su clave fonetica y prefijos de sus palabras."""
+    palabras = nombre_normalizado.split()
+    if not palabras:
+        return []
+    claves = [
+        'n:' + nombre_normalizado,
+        'f:' + clave_fonetica(nombre_normalizado),
+        # Los prefijos ordenados toleran typos al final y el orden nombre/apellido invertido
+        'p:' + ' '.join(sorted(p[:4] for p in palabras)),
+    ]
+    if por_oficina:
+        claves = [f'{oficina_id}|{clave}' for clave in claves]
+    return claves
+
+
+PESO_NOMBRE = 0.55
+PESO_USUARIO = 0.2
+PESO_DOMINIO = 0.05
+PESO_EDAD = 0.2
+
+
+def _similitud(a, b):
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _termino_edad(edad_a, edad_b):
+    return PESO_EDAD * max(0.0, 1 - abs(edad_a - edad_b) / 5)
+
+
+def puntaje(a, b):
+    """Puntaje entre 0 y 1 de que dos filas (id, nombre_normalizado, edad, email) sean la misma persona."""
+    _, nombre_a, edad_a, email_a = a
+    _, nombre_b, edad_b, email_b = b
+    usuario_a, _, dominio_a = email_a.partition('@')
+    usuario_b, _, dominio_b = email_b.partition('@')
+    return (
+        PESO_NOMBRE * _similitud(nombre_a, nombre_b)
+        + PESO_USUARIO * _similitud(usuario_a, usuario_b)
+        + PESO_DOMINIO * (dominio_a == dominio_b)
+        + _termino_edad(edad_a, edad_b)
+    )
+
+
+def _puede_superar(a, b, umbral):
+    """Cota superior barata: descarta el par antes de calcular las similitudes caras."""
+    cota = PESO_NOMBRE + PESO_USUARIO + PESO_DOMINIO + _termino_edad(a[2], b[2])
+    if cota < umbral:
+        return False
+    cota -= PESO_NOMBRE * (1 - SequenceMatcher(None, a[1], b[1]).real_quick_ratio())
+    return cota >= umbral
+
+
+def comparar_bloques(bloques, umbral):
+    """Compara todos los pares dentro de cada bloque. Se ejecuta en los procesos worker."""
+    pares = {}
+    for clave, filas in bloques:
+        for a, b in combinations(filas, 2):
+            if a[0] > b[0]:
+                a, b = b, a
+            par = (a[0], b[0])
+            if par in pares or not _puede_superar(a, b, umbral):
+                continue
+            valor = puntaje(a, b)
+            if valor >= umbral:
+                pares[par] = (valor, clave)
+    return pares
+
+
+def agrupar_en_bloques(filas, por_oficina=False, max_bloque=200):
+    """Reparte las filas (id, nombre, edad, email, oficina_id) en bloques.
+
+    Devuelve (bloques, omitidos): los bloques de un solo elemento se descartan y los que superan
+    max_bloque se omiten, porque compararlos volveria cuadratico el trabajo.
+    """
+    bloques = defaultdict(list)
+    for persona_id, nombre, edad, email, oficina_id in filas:
+        nombre_normalizado = normalizar(nombre)
+        fila = (persona_id, nombre_normalizado, edad, (email or '').lower())
+        for clave in claves_bloqueo(nombre_normalizado, oficina_id, por_oficina):
+            bloques[clave].append(fila)
+    candidatos = []
+    omitidos = []
+    for clave, miembros in bloques.items():
+        if len(miembros) < 2:
+            continue
+        if len(miembros) > max_bloque:
+            omitidos.append((clave, len(miembros)))
+            continue
+        candidatos.append((clave, miembros))
+    return candidatos, omitidos
+
+
+def buscar_duplicados(filas, umbral=0.85, por_oficina=False, max_bloque=200, workers=None):
+    """Devuelve ({(id_a, id_b): (puntaje, clave)}, bloques_omitidos) comparando solo dentro de cada bloque."""
+    bloques, omitidos = agrupar_en_bloques(filas, por_oficina=por_oficina, max_bloque=max_bloque)
+    workers = workers or os.cpu_count() or 1
+    # Varias tandas por proceso para repartir bien bloques de tamaños dispares
+    tamanio_tanda = max(1, -(-len(bloques) // (workers * 4)))
+    tandas = [bloques[i:i + tamanio_tanda] for i in range(0, len(bloques), tamanio_tanda)]
+    pares = {}
+
+    def acumular(resultado):
+        for par, (valor, clave) in resultado.items():
+            if valor > pares.get(par, (0.0, ''))[0]:
+                pares[par] = (valor, clave)
+
+    if workers == 1 or len(tandas) <= 1:
+        for tanda in tandas:
+            acumular(comparar_bloques(tanda, umbral))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for resultado in executor.map(comparar_bloques, tandas, [umbral] * len(tandas)):
+                acumular(resultado)
+    return pares, omitidos
@@ -0,0 +1,195 @@
+from collections import defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Min, Q, Sum
+
+# Rangos de 10 años; el ultimo acumula 90 o mas y el primero tambien cuenta edades negativas
+LIMITES_HISTOGRAMA = list(range(10, 100, 10))
+
+
+def rango_edad(edad):
+    """Clave del histograma para una edad: '0-9', '10-19', ..., '90+'."""
+    for limite in LIMITES_HISTOGRAMA:
+        if edad < limite:
+            return f'{limite - 10}-{limite - 1}'
+    return f'{LIMITES_HISTOGRAMA[-1]}+'
+
+
+def rangos():
+    return [rango_edad(limite - 10) for limite in LIMITES_HISTOGRAMA] + [rango_edad(LIMITES_HISTOGRAMA[-1])]
+
+
+def registrar_altas(personas):
+    """Suma a las estadisticas personas creadas sin pasar por save() (bulk_create)."""
+    aplicar_deltas([(p.oficina_id, p.edad, 1) for p in personas])
+
+
+def registrar_bajas(filas):
+    """Resta (oficina_id, edad) de personas borradas o movidas sin señales."""
+    aplicar_deltas([(oficina_id, edad, -1) for oficina_id, edad in filas])
+
+
+def aplicar_deltas(deltas):
+    """Aplica una lista de (oficina_id, edad, +1/-1) bloqueando una fila de resumen por oficina.
+
+    Las altas actualizan min/max directamente; si una baja se lleva el minimo o el maximo de la
+    oficina, solo esos dos valores se releen de la base con una consulta agregada. Cantidad,
+    suma e histograma se mantienen siempre por deltas: QuerySet.delete() manda los post_delete
+    cuando ya se borraron todas las filas, y reemplazarlos por el agregado en vivo haria que
+    las bajas siguientes se restaran dos veces.
+    """
+    from .models import EstadisticaOficina
+
+    por_oficina = defaultdict(list)
+    for oficina_id, edad, signo in deltas:
+        if edad is not None:
+            por_oficina[oficina_id].append((edad, signo))
+    if not por_oficina:
+        return
+
+    a_recalcular = []
+    with transaction.atomic():
+        for oficina_id, cambios in por_oficina.items():
+            resumen = _obtener_bloqueado(EstadisticaOficina, oficina_id)
+            histograma = dict(resumen.histograma)
+            for edad, signo in cambios:
+                resumen.cantidad = max(resumen.cantidad + signo, 0)
+                resumen.suma_edad += signo * edad
+                clave = rango_edad(edad)
+                histograma[clave] = max(histograma.get(clave, 0) + signo, 0)
+                if signo > 0:
+                    resumen.edad_min = edad if resumen.edad_min is None else min(resumen.edad_min, edad)
+                    resumen.edad_max = edad if resumen.edad_max is None else max(resumen.edad_max, edad)
+                elif edad in (resumen.edad_min, resumen.edad_max):
+                    a_recalcular.append(oficina_id)
+            resumen.histograma = histograma
+            resumen.save()
+        for oficina_id in set(a_recalcular):
+            _recalcular_extremos(oficina_id)
+
+
+def _recalcular_extremos(oficina_id):
+    from .models import EstadisticaOficina, Persona
+
+    extremos = Persona.objects.filter(oficina_id=oficina_id).aggregate(edad_min=Min('edad'), edad_max=Max('edad'))
+    EstadisticaOficina.objects.filter(oficina_id=oficina_id).update(**extremos)
+
+
+def _obtener_bloqueado(modelo, oficina_id):
+    qs = modelo.objects.select_for_update()
+    resumen = qs.filter(oficina_id=oficina_id).first()
+    if resumen is None:
+        # Dos transacciones pueden llegar aca a la vez; la restriccion unica deja crear solo a una
+        try:
+            with transaction.atomic():
+                resumen = modelo.objects.create(oficina_id=oficina_id)
+        except IntegrityError:
+            resumen = qs.get(oficina_id=oficina_id)
+    return resumen
+
+
+def agregado_en_vivo(oficina_ids=None):
+    """Calcula en una sola pasada (un GROUP BY) las estadisticas de todas las oficinas pedidas."""
+    from .models import Persona
+
+    histograma = {'h_0': Count('id', filter=Q(edad__lt=LIMITES_HISTOGRAMA[0]))}
+    for limite in LIMITES_HISTOGRAMA[1:]:
+        histograma[f'h_{limite - 10}'] = Count('id', filter=Q(edad__gte=limite - 10, edad__lt=limite))
+    histograma[f'h_{LIMITES_HISTOGRAMA[-1]}'] = Count('id', filter=Q(edad__gte=LIMITES_HISTOGRAMA[-1]))
+
+    qs = Persona.objects.all()
+    if oficina_ids is not None:
+        # isnull no entra en un __in, se agrega aparte si se pide la oficina nula
+        filtro = Q(oficina_id__in=[i for i in oficina_ids if i is not None])
+        if None in oficina_ids:
+            filtro |= Q(oficina__isnull=True)
+        qs = qs.filter(filtro)
+    filas = (
+        qs.order_by()
+        .values('oficina_id')
+        .annotate(
+            cantidad=Count('id'),
+            suma_edad=Sum('edad'),
+            edad_min=Min('edad'),
+            edad_max=Max('edad'),
+            **histograma,
+        )
+    )
+    resultado = {}
+    for fila in filas:
+        resultado[fila['oficina_id']] = {
+            'cantidad': fila['cantidad'],
+            'suma_edad': fila['suma_edad'] or 0,
+            'edad_min': fila['edad_min'],
+            'edad_max': fila['edad_max'],
+            'histograma': {
+                rango_edad(int(clave[2:])): fila[clave]
+                for clave in histograma
+                if fila[clave]
+            },
+        }
+    return resultado
+
+
+def recalcular_oficina(oficina_id):
+    """Reemplaza el resumen de una oficina por el agregado en vivo."""
+    from .models import EstadisticaOficina
+
+    datos = agregado_en_vivo([oficina_id]).get(oficina_id)
+    with transaction.atomic():
+        resumen = _obtener_bloqueado(EstadisticaOficina, oficina_id)
+        _copiar(resumen, datos)
+        resumen.save()
+
+
+def recalcular_todo():
+    """Reconstruye la tabla completa a partir de un unico agregado. Devuelve la cantidad de filas."""
+    from .models import EstadisticaOficina
+    from oficina.models import Oficina
+
+    datos = agregado_en_vivo()
+    oficina_ids = list(Oficina.objects.values_list('id', flat=True)) + [None]
+    resumenes = []
+    for oficina_id in oficina_ids:
+        resumen = EstadisticaOficina(oficina_id=oficina_id)
+        _copiar(resumen, datos.get(oficina_id))
+        resumenes.append(resumen)
+    with transaction.atomic():
+        EstadisticaOficina.objects.all().delete()
+        EstadisticaOficina.objects.bulk_create(resumenes, batch_size=500)
+    return len(resumenes)
+
+
+def verificar():
+    """Compara la tabla materializada con el agregado en vivo y devuelve las diferencias."""
+    from .models import EstadisticaOficina
+
+    datos = agregado_en_vivo()
+    vacio = {'cantidad': 0, 'suma_edad': 0, 'edad_min': None, 'edad_max': None, 'histograma': {}}
+    diferencias = []
+    vistas = set()
+    for resumen in EstadisticaOficina.objects.all():
+        vistas.add(resumen.oficina_id)
+        esperado = datos.get(resumen.oficina_id, vacio)
+        actual = {
+            'cantidad': resumen.cantidad,
+            'suma_edad': resumen.suma_edad,
+            'edad_min': resumen.edad_min,
+            'edad_max': resumen.edad_max,
+            'histograma': {k: v for k, v in resumen.histograma.items() if v},
+        }
+        if actual != esperado:
+            diferencias.append((resumen.oficina_id, actual, esperado))
+    for oficina_id, esperado in datos.items():
+        if oficina_id not in vistas:
+            diferencias.append((oficina_id, None, esperado))
+    return diferencias
+
+
+
+def _copiar(resumen, datos):
+    datos = datos or {}
+    resumen.cantidad = datos.get('cantidad', 0)
+    resumen.suma_edad = datos.get('suma_edad', 0)
+    resumen.edad_min = datos.get('edad_min')
+    resumen.edad_max = datos.get('edad_max')
+    resumen.histograma = datos.get('histograma', {})
@@ -0,0 +1,98 @@
+from django import forms
+from oficina.resolver import resolver
+from . import acciones
+from .models import Persona
+
+
+class ImportacionForm(forms.Form):
+    archivo = forms.FileField(
+        label="Archivo CSV",
+        help_text="Columnas: nombre, edad, email y opcionalmente oficina_nombre_corto. Se aceptan .csv, .csv.gz, .csv.bz2 y .csv.xz.",
+    )
+    actualizar = forms.BooleanField(
+        label="Actualizar personas existentes (por email)",
+        required=False,
+    )
+
+
+class OficinaChoiceField(forms.TypedChoiceField):
+    """Select de oficinas armado con el resolver en memoria en lugar de recorrer la tabla en cada render."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('required', False)
+        super().__init__(choices=self.opciones, coerce=int, empty_value=None, **kwargs)
+
+    @staticmethod
+    def opciones():
+        return [('', '---------')] + resolver.opciones()
+
+    def clean(self, value):
+        oficina_id = super().clean(value)
+        if oficina_id is None:
+            return None
+        try:
+            return resolver.instancia(oficina_id)
+        except KeyError:
+            # Borrada entre la validación y el armado de la instancia
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice',
+                                        params={'value': value})
+
+
+class PersonaForm(forms.ModelForm):
+    oficina = OficinaChoiceField(label="Oficina asignada")
+
+    class Meta:
+        model = Persona
+        fields = ['nombre', 'edad', 'email', 'oficina']
+
+
+class IdsField(forms.Field):
+    """Lista de ids enteros que llega como varios valores con el mismo nombre (checkboxes)."""
+    widget = forms.MultipleHiddenInput
+    hidden_widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        try:
+            return sorted({int(v) for v in value})
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Selección inválida.", code='invalid')
+
+
+class AccionMasivaForm(forms.Form):
+    """Acción sobre varias personas: las seleccionadas (`ids`) o todas las del filtro (`todos`)."""
+    REASIGNAR = "reasignar"
+    ELIMINAR = "eliminar"
+
+    accion = forms.ChoiceField(choices=[(REASIGNAR, "Mover a otra oficina"), (ELIMINAR, "Eliminar")])
+    destino = OficinaChoiceField(label="Oficina destino")
+    ids = IdsField(required=False)
+    todos = forms.BooleanField(required=False, widget=forms.HiddenInput)
+    # Filtro de la lista, para `todos`: texto buscado y oficina ('' = todas, 'ninguna' = sin oficina)
+    q = forms.CharField(required=False, widget=forms.HiddenInput)
+    oficina = forms.CharField(required=False, widget=forms.HiddenInput)
+    confirmado = forms.BooleanField(required=False, widget=forms.HiddenInput)
+
+    def clean_oficina(self):
+        oficina = self.cleaned_data['oficina']
+        if oficina and oficina != 'ninguna' and not oficina.isdigit():
+            raise forms.ValidationError("Filtro de oficina inválido.")
+        return oficina
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('todos') and not cleaned_data.get('ids'):
+            raise forms.ValidationError("No se seleccionó ninguna persona.")
+        return cleaned_data
+
+    def queryset(self):
+        datos = self.cleaned_data
+        if datos['todos']:
+            oficina = datos['oficina']
+            return acciones.filtrar(
+                datos['q'],
+                oficina_id=int(oficina) if oficina.isdigit() else None,
+                sin_oficina=oficina == 'ninguna',
+            )
+        return Persona.objects.filter(id__in=datos['ids'])
@@ -0,0 +1,234 @@
+import csv
+from django.core.validators import validate_email
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from crud.archivos import EntradaCSV
+from crud.texto import normalizar_email
+from comun import versiones
+from oficina.resolver import resolver
+from . import estadisticas
+from .metricas import MetricasImportacion
+from .models import Persona
+
+COLUMNAS_REQUERIDAS = {'nombre', 'edad', 'email'}
+# Opcional: nombre_corto (o nombre) de la oficina, resuelto con el resolver en memoria
+COLUMNA_OFICINA = 'oficina_nombre_corto'
+
+
+class ErrorImportacion(Exception):
+    """El archivo no se puede importar (columnas faltantes, formato, etc.)."""
+
+
+class ImportadorPersonas:
+    """Motor de carga masiva de Personas desde CSV.
+
+    Lo usan el comando `load_personas` y el worker de importaciones en segundo plano;
+    la salida se informa por callbacks para no depender de la consola.
+    """
+
+    def __init__(self, actualizar=False, dry_run=False, batch_size=500, encoding='utf-8',
+                 error_writer=None, informar=None, progreso=None, intervalo_progreso=0.5):
+        self.actualizar = actualizar
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.encoding = encoding
+        self.error_writer = error_writer
+        self.informar = informar or (lambda mensaje: None)
+        self.progreso = progreso
+        self.intervalo_progreso = intervalo_progreso
+
+        self.creadas = 0
+        self.actualizadas = 0
+        self.omitidas = 0
+        self.errores = []
+        self.metricas = None
+        self.compresion = None
+
+    def ejecutar(self, ruta):
+        entrada = EntradaCSV(ruta, encoding=self.encoding)
+        self.compresion = entrada.compresion
+        self.metricas = metricas = MetricasImportacion(total_bytes=entrada.total_bytes)
+        personas_para_crear = []
+        emails_vistos = set()
+
+        with entrada as csvfile:
+            reader = csv.DictReader(csvfile)
+            # Validar que existan las columnas requeridas
+            if not COLUMNAS_REQUERIDAS.issubset(set(reader.fieldnames or [])):
+                raise ErrorImportacion(
+                    f"El CSV debe tener las columnas: {', '.join(COLUMNAS_REQUERIDAS)}. "
+                    f"Columnas encontradas: {reader.fieldnames}"
+                )
+
+            con_oficina = COLUMNA_OFICINA in reader.fieldnames
+            fila_num = 1
+            while True:
+                with metricas.etapa('parseo_csv'):
+                    row = next(reader, None)
+                if row is None:
+                    break
+                fila_num += 1
+                metricas.contar('filas_leidas')
+                if self.progreso and metricas.debe_mostrar_progreso(self.intervalo_progreso):
+                    self.progreso(metricas, entrada.offset())
+
+                nombre = (row.get('nombre') or '').strip()
+                edad_str = (row.get('edad') or '').strip()
+                email = normalizar_email(row.get('email') or '')
+                oficina_str = (row.get(COLUMNA_OFICINA) or '').strip()
+                oficina_id = None
+                row_errors = []
+
+                # Validar nombre
+                if not nombre:
+                    row_errors.append(('nombre', nombre, 'Nombre vacío'))
+
+                # Validar edad
+                if not edad_str:
+                    row_errors.append(('edad', edad_str, 'Edad vacía'))
+                else:
+                    try:
+                        edad = int(edad_str)
+                        if edad < 0:
+                            row_errors.append(('edad', edad_str, 'Edad negativa'))
+                    except ValueError:
+                        row_errors.append(('edad', edad_str, 'Edad no es un entero válido'))
+
+                # Validar email
+                if not email:
+                    row_errors.append(('email', email, 'Email vacío'))
+                else:
+                    try:
+                        with metricas.etapa('validate_email'):
+                            validate_email(email)
+                    except ValidationError:
+                        row_errors.append(('email', email, 'Email inválido'))
+
+                # Validar oficina (sin consultar la base salvo que haya cambiado la tabla)
+                if oficina_str:
+                    oficina_id = resolver.resolver(oficina_str)
+                    if oficina_id is None:
+                        row_errors.append((COLUMNA_OFICINA, oficina_str, 'Oficina inexistente'))
+
+                # Chequear duplicados en el mismo archivo
+                if email and email in emails_vistos:
+                    row_errors.append(('email', email, 'Email duplicado en archivo'))
+                # Si hay errores básicos, registrar y saltar
+                if row_errors:
+                    self.omitidas += 1
+                    for campo, valor, msg in row_errors:
+                        self._error(fila_num, campo, valor, msg)
+                    continue
+
+                # Marcar email visto
+                emails_vistos.add(email)
+
+                # Convertir edad a entero (ya validado)
+                edad = int(edad_str)
+
+                # Si se pide actualizar y existe
+                if self.actualizar:
+                    with metricas.etapa('busqueda_update'):
+                        persona = Persona.objects.filter(email__lower=email).first()
+                    if persona is not None:
+                        self._actualizar(persona, fila_num, row, nombre, edad, email, con_oficina, oficina_id)
+                        # Saltar creación
+                        continue
+
+                # Preparar nueva instancia
+                instancia = Persona(nombre=nombre, edad=edad, email=email, oficina_id=oficina_id)
+                try:
+                    with metricas.etapa('full_clean'):
+                        # La oficina ya la validó el resolver
+                        instancia.full_clean(exclude=['oficina'])
+                except ValidationError as e:
+                    # Registrar error de validación de modelo
+                    for campo, msgs in e.message_dict.items():
+                        for m in msgs:
+                            self._error(fila_num, campo, row.get(campo), m)
+                    self.omitidas += 1
+                    continue
+
+                # Añadir para bulk_create
+                personas_para_crear.append(instancia)
+
+                # Si alcanzamos batch_size, hacemos bulk_create
+                if len(personas_para_crear) >= self.batch_size:
+                    primera_fila = fila_num - len(personas_para_crear) + 1
+                    self._guardar_lote(personas_para_crear, primera_fila, 'bulk->individual')
+                    personas_para_crear = []
+
+        # Fin de lectura: crear lo que quede en la lista
+        if personas_para_crear:
+            self._guardar_lote(personas_para_crear, None, 'bulk-final->individual', final=True)
+
+        metricas.contar('creadas', self.creadas)
+        metricas.contar('actualizadas', self.actualizadas)
+        metricas.contar('omitidas', self.omitidas)
+        if self.progreso:
+            self.progreso(metricas, metricas.total_bytes, final=True)
+        return self
+
+    def _actualizar(self, persona, fila_num, row, nombre, edad, email, con_oficina, oficina_id):
+        cambios = {}
+        if persona.nombre != nombre:
+            cambios['nombre'] = (persona.nombre, nombre)
+            persona.nombre = nombre
+        if persona.edad != edad:
+            cambios['edad'] = (persona.edad, edad)
+            persona.edad = edad
+        # Una celda de oficina vacía deja a la persona sin oficina, solo si el archivo trae la columna
+        if con_oficina and persona.oficina_id != oficina_id:
+            cambios['oficina'] = (persona.oficina_id, oficina_id)
+            persona.oficina_id = oficina_id
+        # email no cambia pues es clave de búsqueda aquí
+        if not cambios:
+            self.informar(f"Fila {fila_num}: Persona con email={email} ya existe y no requiere actualización.")
+            return
+        try:
+            # Validar instancias antes de guardar
+            with self.metricas.etapa('full_clean'):
+                persona.full_clean(exclude=['oficina'])
+            if not self.dry_run:
+                with self.metricas.etapa('save_update'):
+                    persona.save()
+            self.actualizadas += 1
+            self.informar(f"Fila {fila_num}: actualizado Persona email={email}. Cambios: {cambios}")
+        except ValidationError as e:
+            msg = "; ".join(f"{k}: {v}" for k, v in e.message_dict.items())
+            self._error(fila_num, 'validación', str(row), msg)
+            self.omitidas += 1
+
+    def _guardar_lote(self, personas, primera_fila, campo_error, final=False):
+        if self.dry_run:
+            # dry-run: solo contamos
+            self.creadas += len(personas)
+            return
+        try:
+            with self.metricas.etapa('bulk_create'), transaction.atomic():
+                Persona.objects.bulk_create(personas)
+                estadisticas.registrar_altas(personas)
+                versiones.incrementar('persona')
+            self.metricas.contar('lotes')
+        except Exception:
+            # Si bulk falla, registrar cada uno por separado
+            self.metricas.contar('lotes_fallidos')
+            for offset, inst in enumerate(personas):
+                fila = primera_fila + offset if primera_fila is not None else 'desconocida'
+                try:
+                    with self.metricas.etapa('fallback_individual'):
+                        inst.full_clean()
+                        inst.save()
+                    self.metricas.contar('fallbacks')
+                    self.creadas += 1
+                except Exception as e_single:
+                    self._error(fila, campo_error, str(inst), str(e_single))
+                    self.omitidas += 1
+            return
+        self.creadas += len(personas)
+        self.informar(f"Se crearon {len(personas)} instancias ({'batch final' if final else 'batch'}).")
+
+    def _error(self, fila, campo, valor, mensaje):
+        self.errores.append({'fila': fila, 'campo': campo, 'valor': valor, 'mensajes': mensaje})
+        if self.error_writer:
+            self.error_writer.writerow([fila, campo, valor, mensaje])
@@ -0,0 +1,174 @@
+import json
+from django import forms
+from django.db import IntegrityError, transaction
+from comun import versiones
+from crud.texto import normalizar_email
+from oficina.resolver import resolver
+from . import estadisticas
+from .models import Persona
+
+MAX_ITEMS = 5000
+# Emails por consulta al buscar existentes (por debajo del límite de parámetros de SQLite)
+TAMANO_CONSULTA = 500
+# Campos que completa pre_save y que bulk_update no recalcula
+CAMPOS_CALCULADOS = ('nombre_busqueda', 'actualizado')
+# Veces que se repite la escritura si otro proceso inserta los mismos emails al mismo tiempo
+REINTENTOS = 3
+
+
+class ErrorLote(Exception):
+    """El cuerpo del request no es un lote válido (JSON mal formado, demasiados items, etc.)."""
+
+    def __init__(self, mensaje, status=400):
+        super().__init__(mensaje)
+        self.status = status
+
+
+class PersonaLoteForm(forms.Form):
+    """Validación de un item del lote sin consultar la base (email único y oficina van aparte)."""
+    nombre = forms.CharField(max_length=50)
+    edad = forms.IntegerField(min_value=0)
+    email = forms.EmailField(max_length=254)
+    oficina = forms.CharField(max_length=50, required=False)
+
+
+def leer_items(request):
+    """Lista de items de un JSON (array) o NDJSON (un objeto por línea)."""
+    tipo = request.content_type
+    if tipo in ('application/x-ndjson', 'application/jsonl'):
+        items = []
+        for numero, linea in enumerate(request, start=1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            if len(items) >= MAX_ITEMS:
+                raise ErrorLote(f"El lote admite hasta {MAX_ITEMS} items.", status=413)
+            try:
+                items.append(json.loads(linea))
+            except ValueError as e:
+                raise ErrorLote(f"Línea {numero}: JSON inválido ({e}).")
+        return items
+    if tipo == 'application/json':
+        try:
+            items = json.loads(request.body)
+        except ValueError as e:
+            raise ErrorLote(f"JSON inválido ({e}).")
+        if not isinstance(items, list):
+            raise ErrorLote("Se esperaba un array JSON de personas.")
+        if len(items) > MAX_ITEMS:
+            raise ErrorLote(f"El lote admite hasta {MAX_ITEMS} items.", status=413)
+        return items
+    raise ErrorLote("Content-Type debe ser application/json o application/x-ndjson.", status=415)
+
+
+def procesar(items, actualizar=True, dry_run=False, batch_size=500):
+    """Valida y guarda (alta o actualización por email) una lista de personas.
+
+    Devuelve un resultado por item, en el mismo orden: estado 'creada', 'actualizada',
+    'sin_cambios' o 'error' (con los errores por campo). Los emails se comparan sin distinguir
+    mayúsculas. Todo lo válido se escribe en una sola transacción: las altas con bulk_create y
+    los cambios con bulk_update, en lotes de `batch_size`.
+    """
+    resultados = [None] * len(items)
+    validos = {}
+
+    # 1) Campos de cada item, sin base
+    for indice, item in enumerate(items):
+        if not isinstance(item, dict):
+            resultados[indice] = _error(indice, {'__all__': ["Se esperaba un objeto JSON."]})
+            continue
+        form = PersonaLoteForm(item)
+        if not form.is_valid():
+            resultados[indice] = _error(indice, {campo: list(errores) for campo, errores in form.errors.items()})
+            continue
+        datos = form.cleaned_data
+        email = datos['email'] = normalizar_email(datos['email'])
+        if email in validos:
+            resultados[indice] = _error(indice, {'email': ["Email duplicado en el lote."]})
+            continue
+        validos[email] = (indice, datos)
+
+    # 2) Oficinas, todas de una vez con el resolver en memoria
+    oficinas = resolver.resolver_muchos(datos['oficina'] for _, datos in validos.values() if datos['oficina'])
+    for email, (indice, datos) in list(validos.items()):
+        datos['oficina_id'] = oficinas.get(datos['oficina']) if datos['oficina'] else None
+        if datos['oficina'] and datos['oficina_id'] is None:
+            resultados[indice] = _error(indice, {'oficina': [f"No existe la oficina {datos['oficina']}."]})
+            del validos[email]
+
+    # 3 y 4) Si otro request inserta uno de estos emails entre la consulta de existentes y el
+    # bulk_create, la restricción única corta la transacción: se repite y esta vez se ve como existente
+    for _ in range(REINTENTOS):
+        try:
+            with transaction.atomic():
+                _guardar(validos, resultados, actualizar, dry_run, batch_size)
+            break
+        except IntegrityError as e:
+            error = e
+    else:
+        # No se guardó nada del lote: cada item válido lo informa para que el cliente lo reintente
+        for indice, _ in validos.values():
+            resultados[indice] = _error(indice, {'__all__': [f"Conflicto con escrituras concurrentes ({error})."]})
+    return resultados
+
+
+def _existentes(emails):
+    """Personas que ya tienen alguno de los emails, en pocas consultas por el índice de Lower('email')."""
+    existentes = {}
+    for inicio in range(0, len(emails), TAMANO_CONSULTA):
+        for persona in Persona.objects.filter(email__lower__in=emails[inicio:inicio + TAMANO_CONSULTA]).only(
+            'id', 'email', 'nombre', 'edad', 'oficina_id'
+        ):
+            existentes[normalizar_email(persona.email)] = persona
+    return existentes
+
+
+def _guardar(validos, resultados, actualizar, dry_run, batch_size):
+    # 3) Unicidad por conjunto
+    existentes = _existentes(list(validos))
+
+    nuevas = []
+    modificadas = []
+    bajas = []
+    for email, (indice, datos) in validos.items():
+        nuevo = (datos['nombre'], datos['edad'], datos['oficina_id'])
+        persona = existentes.get(email)
+        if persona is None:
+            resultados[indice] = {'indice': indice, 'estado': 'creada', 'id': None}
+            nuevas.append((indice, Persona(
+                nombre=datos['nombre'], edad=datos['edad'], email=email, oficina_id=datos['oficina_id'],
+            )))
+        elif not actualizar:
+            resultados[indice] = _error(indice, {'email': ["Ya existe una persona con este email."]}, persona.id)
+        elif (persona.nombre, persona.edad, persona.oficina_id) == nuevo:
+            resultados[indice] = {'indice': indice, 'estado': 'sin_cambios', 'id': persona.id}
+        else:
+            bajas.append((persona.oficina_id, persona.edad))
+            resultados[indice] = {'indice': indice, 'estado': 'actualizada', 'id': persona.id}
+            persona.nombre, persona.edad, persona.oficina_id = nuevo
+            modificadas.append(persona)
+
+    # 4) Escritura en lotes. bulk_create completa actualizado y nombre_busqueda con pre_save;
+    # bulk_update no, así que a esos dos se les llama pre_save a mano
+    if (nuevas or modificadas) and not dry_run:
+        Persona.objects.bulk_create([persona for _, persona in nuevas], batch_size=batch_size)
+        for indice, persona in nuevas:
+            resultados[indice]['id'] = persona.pk
+        for persona in modificadas:
+            for campo in CAMPOS_CALCULADOS:
+                Persona._meta.get_field(campo).pre_save(persona, add=False)
+        Persona.objects.bulk_update(
+            modificadas, ['nombre', 'nombre_busqueda', 'edad', 'oficina', 'actualizado'], batch_size=batch_size,
+        )
+        # Bajas y altas juntas: si una baja obliga a recalcular una oficina, el recálculo
+        # (que lee los datos ya guardados) tiene que ser lo último
+        estadisticas.aplicar_deltas(
+            [(oficina_id, edad, -1) for oficina_id, edad in bajas]
+            + [(persona.oficina_id, persona.edad, 1) for _, persona in nuevas]
+            + [(persona.oficina_id, persona.edad, 1) for persona in modificadas]
+        )
+        versiones.incrementar('persona')
+
+
+def _error(indice, errores, persona_id=None):
+    return {'indice': indice, 'estado': 'error', 'id': persona_id, 'errores': errores}
@@ -0,0 +1,67 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from persona import archivo
+from persona.models import Persona
+
+
+class Command(BaseCommand):
+    help = ('Mueve a la tabla de archivo las personas que cumplen la política indicada, '
+            'en lotes transaccionales que se pueden retomar.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--without-oficina',
+            action='store_true',
+            help='Archivar las personas sin oficina asignada.'
+        )
+        parser.add_argument(
+            '--inactive-months',
+            type=int,
+            help='Archivar las personas que no se modificaron en los últimos N meses (30 días por mes).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Personas movidas por transacción (por defecto: 500).'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Cantidad máxima de personas a archivar en esta corrida.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo cuenta cuántas personas se archivarían.'
+        )
+
+    def handle(self, *args, **options):
+        meses = options['inactive_months']
+        if meses is not None and meses < 1:
+            raise CommandError("--inactive-months debe ser mayor o igual a 1.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size debe ser mayor o igual a 1.")
+        # El corte se fija al empezar para que todos los lotes usen la misma política
+        inactivas_desde = timezone.now() - timedelta(days=30 * meses) if meses else None
+        try:
+            filtro = archivo.filtro_politica(options['without_oficina'], inactivas_desde)
+        except ValueError:
+            raise CommandError("Indicá al menos una política: --without-oficina y/o --inactive-months.")
+
+        if options['dry_run']:
+            cantidad = Persona.objects.filter(filtro).count()
+            self.stdout.write(f"Se archivarían {cantidad} personas.")
+            return
+
+        limite = options['limit']
+        total = 0
+        while limite is None or total < limite:
+            lote = options['batch_size'] if limite is None else min(options['batch_size'], limite - total)
+            movidas = archivo.archivar_lote(filtro, lote)
+            if not movidas:
+                break
+            total += movidas
+            self.stdout.write(f"  {total} personas archivadas...")
+        self.stdout.write(self.style.SUCCESS(f"Archivado terminado: {total} personas movidas."))
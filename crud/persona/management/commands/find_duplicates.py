@@ -0,0 +1,95 @@
+import csv
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from persona.models import Persona, ParDuplicado
+from persona.duplicados import buscar_duplicados
+
+
+class Command(BaseCommand):
+    help = ('Detecta personas posiblemente duplicadas (mismo nombre y edad con distinto email) '
+            'comparando solo dentro de bloques de nombre normalizado, fonético y por prefijos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.85,
+            help='Puntaje mínimo (0 a 1) para reportar un par (por defecto: 0.85).'
+        )
+        parser.add_argument(
+            '--by-oficina',
+            action='store_true',
+            help='Agrega la oficina a la clave de bloque: solo compara personas de la misma oficina.'
+        )
+        parser.add_argument(
+            '--max-block-size',
+            type=int,
+            default=200,
+            help='Bloques con más personas que esto se omiten para no volver cuadrático el trabajo (por defecto: 200).'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Cantidad de procesos para comparar bloques en paralelo (por defecto: uno por CPU).'
+        )
+        parser.add_argument(
+            '--output', '-o',
+            type=str,
+            help='Ruta de un CSV donde escribir los pares encontrados.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='No reemplaza la tabla de posibles duplicados que muestra el admin.'
+        )
+
+    def handle(self, *args, **options):
+        umbral = options['threshold']
+        if not 0 <= umbral <= 1:
+            raise CommandError("--threshold debe estar entre 0 y 1.")
+
+        inicio = time.perf_counter()
+        filas = Persona.objects.values_list('id', 'nombre', 'edad', 'email', 'oficina_id').iterator(chunk_size=5000)
+        pares, omitidos = buscar_duplicados(
+            filas,
+            umbral=umbral,
+            por_oficina=options['by_oficina'],
+            max_bloque=options['max_block_size'],
+            workers=options['workers'],
+        )
+        self.stdout.write(
+            f"Comparación terminada en {time.perf_counter() - inicio:.2f}s: {len(pares)} pares sobre el umbral."
+        )
+        for clave, cantidad in omitidos[:20]:
+            self.stdout.write(self.style.WARNING(f"  Bloque omitido por tamaño ({cantidad} personas): {clave}"))
+        if len(omitidos) > 20:
+            self.stdout.write(self.style.WARNING(f"  ... y {len(omitidos) - 20} bloques omitidos más."))
+
+        ordenados = sorted(pares.items(), key=lambda item: -item[1][0])
+
+        if options['output']:
+            try:
+                with open(options['output'], 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(['persona_a', 'persona_b', 'puntaje', 'bloque'])
+                    for (id_a, id_b), (valor, clave) in ordenados:
+                        writer.writerow([id_a, id_b, f'{valor:.4f}', clave])
+            except OSError as e:
+                raise CommandError(f"No se pudo escribir el CSV de salida en '{options['output']}': {e}")
+            self.stdout.write(f"Pares escritos en: {options['output']}")
+
+        if not options['dry_run']:
+            with transaction.atomic():
+                ParDuplicado.objects.all().delete()
+                ParDuplicado.objects.bulk_create(
+                    (
+                        ParDuplicado(persona_a_id=id_a, persona_b_id=id_b, puntaje=valor, bloque=clave[:120])
+                        for (id_a, id_b), (valor, clave) in ordenados
+                    ),
+                    batch_size=1000,
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f"Se guardaron {len(ordenados)} posibles duplicados para revisar en el admin."
+            ))
@@ -0,0 +1,65 @@
+import signal
+import time
+from django.core.management.base import BaseCommand
+from persona import trabajos
+
+
+class Command(BaseCommand):
+    help = 'Worker que ejecuta las importaciones de personas subidas desde la web.'
+    # Sin chequeos de sistema: evitan importar el URLconf y todas las apps en cada corrida de cron
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesa los trabajos pendientes y termina, en lugar de quedarse esperando nuevos.'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Segundos de espera entre consultas cuando no hay trabajos pendientes (por defecto: 2).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Número de instancias a crear por lote en bulk_create (por defecto: 500).'
+        )
+        parser.add_argument(
+            '--keep-files',
+            action='store_true',
+            help='No borrar los archivos subidos después de importarlos correctamente.'
+        )
+
+    def handle(self, *args, **options):
+        # SIGTERM (systemd, docker stop, kill) se trata como Ctrl+C: el trabajo en curso vuelve a la cola
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        self.stdout.write("Worker de importaciones iniciado.")
+        trabajo = None
+        try:
+            while True:
+                trabajo = trabajos.tomar_siguiente()
+                if trabajo is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+                self.stdout.write(f"Importando trabajo #{trabajo.pk}: {trabajo.nombre_original}")
+                trabajos.ejecutar(
+                    trabajo,
+                    batch_size=options['batch_size'],
+                    conservar_archivo=options['keep_files'],
+                )
+                estilo = self.style.SUCCESS if trabajo.estado == trabajo.TERMINADO else self.style.ERROR
+                self.stdout.write(estilo(
+                    f"Trabajo #{trabajo.pk} {trabajo.get_estado_display().lower()}: creadas={trabajo.creadas}, "
+                    f"actualizadas={trabajo.actualizadas}, omitidas={trabajo.omitidas}."
+                ))
+        except KeyboardInterrupt:
+            if trabajo is not None and trabajo.estado == trabajo.EN_CURSO:
+                # Se devuelve a la cola; al reintentar, las filas ya creadas se omiten por email duplicado.
+                # Si el worker muere sin pasar por acá, lo recupera tomar_siguiente cuando vence el latido
+                trabajos.devolver(trabajo)
+            self.stdout.write("Worker detenido.")
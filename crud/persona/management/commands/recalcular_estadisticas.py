@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from persona import estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye en una sola pasada las estadísticas de edad por oficina, o las verifica contra un agregado en vivo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='No reconstruye: compara la tabla materializada con el agregado en vivo y falla si difieren.'
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            diferencias = estadisticas.verificar()
+            if not diferencias:
+                self.stdout.write(self.style.SUCCESS("Las estadísticas materializadas coinciden con los datos."))
+                return
+            for oficina_id, actual, esperado in diferencias:
+                self.stdout.write(
+                    f"  Oficina {oficina_id or 'sin oficina'}: tabla={actual} en vivo={esperado}"
+                )
+            raise CommandError(
+                f"{len(diferencias)} oficinas con estadísticas desactualizadas. "
+                "Ejecutá recalcular_estadisticas sin --check para reconstruirlas."
+            )
+
+        filas = estadisticas.recalcular_todo()
+        self.stdout.write(self.style.SUCCESS(f"Estadísticas reconstruidas para {filas} oficinas."))
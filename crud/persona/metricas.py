@@ -0,0 +1,79 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class MetricasImportacion:
+    """Cronometros y contadores por etapa para las cargas masivas."""
+
+    def __init__(self, total_bytes=None):
+        self.total_bytes = total_bytes
+        self.inicio = time.perf_counter()
+        self.tiempos = defaultdict(float)
+        self.contadores = defaultdict(int)
+        self._ultimo_progreso = 0.0
+
+    @contextmanager
+    def etapa(self, nombre):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tiempos[nombre] += time.perf_counter() - t0
+
+    def contar(self, nombre, cantidad=1):
+        self.contadores[nombre] += cantidad
+
+    def transcurrido(self):
+        return time.perf_counter() - self.inicio
+
+    def filas_por_segundo(self):
+        segundos = self.transcurrido()
+        if not segundos:
+            return 0.0
+        return self.contadores['filas_leidas'] / segundos
+
+    def linea_progreso(self, offset=None):
+        """Arma la linea de progreso; el ETA se estima por el offset en bytes del archivo."""
+        segundos = self.transcurrido()
+        partes = [
+            f"filas={self.contadores['filas_leidas']}",
+            f"{self.filas_por_segundo():.0f} filas/s",
+        ]
+        if offset is not None and self.total_bytes:
+            fraccion = min(offset / self.total_bytes, 1.0)
+            partes.append(f"{fraccion * 100:.1f}%")
+            if fraccion > 0:
+                restante = segundos * (1 - fraccion) / fraccion
+                partes.append(f"ETA {restante:.0f}s")
+        return " | ".join(partes)
+
+    def debe_mostrar_progreso(self, intervalo=0.5):
+        ahora = time.perf_counter()
+        if ahora - self._ultimo_progreso >= intervalo:
+            self._ultimo_progreso = ahora
+            return True
+        return False
+
+    def como_dict(self):
+        total = self.transcurrido()
+        return {
+            'duracion_total': round(total, 6),
+            'filas_por_segundo': round(self.filas_por_segundo(), 2),
+            'total_bytes': self.total_bytes,
+            'contadores': dict(self.contadores),
+            'etapas': {
+                nombre: {
+                    'segundos': round(segundos, 6),
+                    'porcentaje': round(segundos * 100 / total, 2) if total else 0.0,
+                }
+                for nombre, segundos in sorted(self.tiempos.items(), key=lambda item: -item[1])
+            },
+        }
+
+    def escribir_reporte(self, ruta, **extra):
+        datos = self.como_dict()
+        datos.update(extra)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('persona', '0003_alter_persona_options_alter_persona_oficina'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParDuplicado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('puntaje', models.FloatField(db_index=True, verbose_name='Puntaje')),
+                ('bloque', models.CharField(max_length=120, verbose_name='Clave de bloque')),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('persona_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='persona.persona')),
+                ('persona_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='persona.persona')),
+            ],
+            options={
+                'verbose_name': 'posible duplicado',
+                'verbose_name_plural': 'posibles duplicados',
+                'ordering': ['-puntaje'],
+                'constraints': [models.UniqueConstraint(fields=('persona_a', 'persona_b'), name='par_duplicado_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def resumenes(Persona, oficina_ids):
+    """Estadisticas de cada oficina pedida a partir de un GROUP BY (oficina, edad).
+
+    Se calcula aca y no con persona.estadisticas para que la migracion use solo los modelos
+    historicos y siga dando el mismo resultado aunque ese modulo cambie.
+    """
+    datos = {
+        oficina_id: {'cantidad': 0, 'suma_edad': 0, 'edad_min': None, 'edad_max': None, 'histograma': {}}
+        for oficina_id in oficina_ids
+    }
+    filas = Persona.objects.order_by().values_list('oficina_id', 'edad').annotate(cantidad=models.Count('id'))
+    for oficina_id, edad, cantidad in filas:
+        if oficina_id not in datos or edad is None:
+            continue
+        resumen = datos[oficina_id]
+        resumen['cantidad'] += cantidad
+        resumen['suma_edad'] += edad * cantidad
+        resumen['edad_min'] = edad if resumen['edad_min'] is None else min(resumen['edad_min'], edad)
+        resumen['edad_max'] = edad if resumen['edad_max'] is None else max(resumen['edad_max'], edad)
+        # Rangos de 10 años: '0-9' (tambien las negativas), '10-19', ..., '90+'
+        decena = min(max(edad, 0) // 10 * 10, 90)
+        rango = '90+' if decena == 90 else f'{decena}-{decena + 9}'
+        resumen['histograma'][rango] = resumen['histograma'].get(rango, 0) + cantidad
+    return datos
+
+
+def rellenar(apps, schema_editor):
+    # Las personas que ya existen entran en el resumen, una fila por oficina mas la de "sin oficina"
+    Persona = apps.get_model('persona', 'Persona')
+    Oficina = apps.get_model('oficina', 'Oficina')
+    EstadisticaOficina = apps.get_model('persona', 'EstadisticaOficina')
+
+    oficina_ids = list(Oficina.objects.values_list('id', flat=True)) + [None]
+    EstadisticaOficina.objects.bulk_create(
+        [
+            EstadisticaOficina(oficina_id=oficina_id, **datos)
+            for oficina_id, datos in resumenes(Persona, oficina_ids).items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0003_alter_oficina_options'),
+        ('persona', '0004_parduplicado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaOficina',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(default=0, verbose_name='Cantidad de personas')),
+                ('suma_edad', models.BigIntegerField(default=0)),
+                ('edad_min', models.IntegerField(blank=True, null=True, verbose_name='Edad mínima')),
+                ('edad_max', models.IntegerField(blank=True, null=True, verbose_name='Edad máxima')),
+                ('histograma', models.JSONField(default=dict, verbose_name='Histograma de edades')),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('oficina', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='estadistica', to='oficina.oficina', verbose_name='oficina')),
+            ],
+            options={
+                'verbose_name': 'estadística de oficina',
+                'verbose_name_plural': 'estadísticas de oficinas',
+            },
+        ),
+        migrations.RunPython(rellenar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-19 16:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('persona', '0005_estadisticaoficina'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoImportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.CharField(max_length=500, verbose_name='Ruta del archivo')),
+                ('nombre_original', models.CharField(max_length=255, verbose_name='Archivo subido')),
+                ('actualizar', models.BooleanField(default=False, verbose_name='Actualizar existentes')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('terminado', 'Terminado'), ('fallido', 'Fallido')], db_index=True, default='pendiente', max_length=20)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('iniciado', models.DateTimeField(blank=True, null=True)),
+                ('terminado', models.DateTimeField(blank=True, null=True)),
+                ('filas_procesadas', models.PositiveIntegerField(default=0)),
+                ('bytes_procesados', models.BigIntegerField(default=0)),
+                ('bytes_totales', models.BigIntegerField(blank=True, null=True)),
+                ('creadas', models.PositiveIntegerField(default=0)),
+                ('actualizadas', models.PositiveIntegerField(default=0)),
+                ('omitidas', models.PositiveIntegerField(default=0)),
+                ('errores', models.JSONField(blank=True, default=list)),
+                ('mensaje', models.TextField(blank=True)),
+                ('reporte', models.JSONField(blank=True, null=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'importación',
+                'verbose_name_plural': 'importaciones',
+                'ordering': ['-creado'],
+            },
+        ),
+    ]
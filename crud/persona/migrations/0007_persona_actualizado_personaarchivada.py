@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 18:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0003_alter_oficina_options'),
+        ('persona', '0006_trabajoimportacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='persona',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Última modificación'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='PersonaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID original')),
+                ('edad', models.IntegerField(verbose_name='Edad')),
+                ('email', models.EmailField(db_index=True, max_length=254, verbose_name='correo Electronico')),
+                ('nombre', models.CharField(max_length=50, verbose_name='Nombre y apellido')),
+                ('actualizado', models.DateTimeField(verbose_name='Última modificación')),
+                ('archivado', models.DateTimeField(auto_now_add=True, verbose_name='Archivada el')),
+                ('motivo', models.CharField(choices=[('sin_oficina', 'Sin oficina'), ('inactiva', 'Sin cambios recientes')], max_length=20)),
+                ('oficina', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='personas_archivadas', to='oficina.oficina', verbose_name='oficina asignada')),
+            ],
+            options={
+                'verbose_name': 'persona archivada',
+                'verbose_name_plural': 'personas archivadas',
+            },
+        ),
+    ]
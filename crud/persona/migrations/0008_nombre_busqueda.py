@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 17:01
+
+import comun.campos
+from django.db import migrations
+from crud.texto import normalizar
+
+
+def completar_nombre_busqueda(apps, schema_editor):
+    for nombre_modelo in ('Persona', 'PersonaArchivada',):
+        modelo = apps.get_model('persona', nombre_modelo)
+        lote = []
+        for instancia in modelo.objects.only('id', 'nombre').iterator(chunk_size=2000):
+            instancia.nombre_busqueda = normalizar(instancia.nombre)
+            lote.append(instancia)
+            if len(lote) >= 2000:
+                modelo.objects.bulk_update(lote, ['nombre_busqueda'])
+                lote = []
+        modelo.objects.bulk_update(lote, ['nombre_busqueda'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('persona', '0007_persona_actualizado_personaarchivada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='persona',
+            name='nombre_busqueda',
+            field=comun.campos.CampoNormalizado(default='', max_length=100, origen='nombre'),
+        ),
+        migrations.AddField(
+            model_name='personaarchivada',
+            name='nombre_busqueda',
+            field=comun.campos.CampoNormalizado(default='', max_length=100, origen='nombre'),
+        ),
+        migrations.RunPython(completar_nombre_busqueda, migrations.RunPython.noop),
+    ]
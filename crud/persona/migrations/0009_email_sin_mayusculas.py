@@ -0,0 +1,76 @@
+# Generated by Django 5.2.5 on 2026-10-19 17:23
+
+import comun.campos
+import django.db.models.functions.text
+from collections import defaultdict
+from django.db import migrations, models
+from crud.texto import normalizar_email
+
+# Grupos de colisiones que se listan en el error; el resto solo se cuenta
+MAX_COLISIONES_INFORMADAS = 50
+
+
+def informar_colisiones(personas):
+    """Frena la migración si hay emails que solo difieren en mayúsculas o espacios, listándolos.
+
+    Se compara en Python con la misma normalización que se guarda: el LOWER de SQLite solo
+    pasa a minúsculas letras ASCII y no vería, por ejemplo, 'JOSÉ@' y 'josé@' como iguales.
+    """
+    grupos = defaultdict(list)
+    for persona_id, email in personas:
+        grupos[normalizar_email(email)].append((persona_id, email))
+    colisiones = sorted((clave, grupo) for clave, grupo in grupos.items() if len(grupo) > 1)
+    if not colisiones:
+        return
+    lineas = [
+        f"  {clave}: " + ', '.join(f"#{persona_id} {email!r}" for persona_id, email in grupo)
+        for clave, grupo in colisiones[:MAX_COLISIONES_INFORMADAS]
+    ]
+    if len(colisiones) > MAX_COLISIONES_INFORMADAS:
+        lineas.append(f"  ... y {len(colisiones) - MAX_COLISIONES_INFORMADAS} emails más.")
+    raise RuntimeError(
+        f"{len(colisiones)} emails están repetidos si no se distinguen mayúsculas:\n" + '\n'.join(lineas)
+        + "\nUnificá o corregí esas personas (por ejemplo desde el admin) y volvé a correr migrate."
+    )
+
+
+def normalizar_emails(apps, schema_editor):
+    Persona = apps.get_model('persona', 'Persona')
+    informar_colisiones(Persona.objects.order_by('id').values_list('id', 'email').iterator(chunk_size=2000))
+    for nombre_modelo in ('Persona', 'PersonaArchivada'):
+        modelo = apps.get_model('persona', nombre_modelo)
+        lote = []
+        for instancia in modelo.objects.only('id', 'email').iterator(chunk_size=2000):
+            if instancia.email != normalizar_email(instancia.email):
+                instancia.email = normalizar_email(instancia.email)
+                lote.append(instancia)
+            if len(lote) >= 2000:
+                modelo.objects.bulk_update(lote, ['email'])
+                lote = []
+        modelo.objects.bulk_update(lote, ['email'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0004_oficina_nombre_busqueda'),
+        ('persona', '0008_nombre_busqueda'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalizar_emails, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='persona',
+            name='email',
+            field=comun.campos.EmailNormalizado(db_index=True, max_length=254, verbose_name='correo Electronico'),
+        ),
+        migrations.AlterField(
+            model_name='personaarchivada',
+            name='email',
+            field=comun.campos.EmailNormalizado(db_index=True, max_length=254, verbose_name='correo Electronico'),
+        ),
+        migrations.AddConstraint(
+            model_name='persona',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='persona_email_unico_sin_mayusculas', violation_error_code='email_duplicado', violation_error_message='Ya existe una persona con este email.'),
+        ),
+    ]
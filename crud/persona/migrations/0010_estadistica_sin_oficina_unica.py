@@ -0,0 +1,52 @@
+# Generated by Django 5.2.5 on 2026-10-19 17:43
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def unificar_sin_oficina(apps, schema_editor):
+    # Si se llegó a duplicar la fila de "sin oficina" se deja una sola, recalculada desde personas
+    Persona = apps.get_model('persona', 'Persona')
+    EstadisticaOficina = apps.get_model('persona', 'EstadisticaOficina')
+    sin_oficina = EstadisticaOficina.objects.filter(oficina__isnull=True)
+    if sin_oficina.count() <= 1:
+        return
+
+    personas = Persona.objects.filter(oficina__isnull=True)
+    datos = personas.aggregate(
+        cantidad=models.Count('id'),
+        suma_edad=models.Sum('edad'),
+        edad_min=models.Min('edad'),
+        edad_max=models.Max('edad'),
+    )
+    histograma = {}
+    for edad, cantidad in personas.order_by().values_list('edad').annotate(cantidad=models.Count('id')):
+        # Rangos de 10 años: '0-9' (tambien las negativas), '10-19', ..., '90+'
+        decena = min(max(edad, 0) // 10 * 10, 90)
+        rango = '90+' if decena == 90 else f'{decena}-{decena + 9}'
+        histograma[rango] = histograma.get(rango, 0) + cantidad
+    sin_oficina.delete()
+    EstadisticaOficina.objects.create(
+        oficina=None,
+        cantidad=datos['cantidad'],
+        suma_edad=datos['suma_edad'] or 0,
+        edad_min=datos['edad_min'],
+        edad_max=datos['edad_max'],
+        histograma=histograma,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oficina', '0004_oficina_nombre_busqueda'),
+        ('persona', '0009_email_sin_mayusculas'),
+    ]
+
+    operations = [
+        migrations.RunPython(unificar_sin_oficina, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='estadisticaoficina',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('oficina', models.Value(0), output_field=models.BigIntegerField()), condition=models.Q(('oficina__isnull', True)), name='estadistica_sin_oficina_unica'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('persona', '0010_estadistica_sin_oficina_unica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajoimportacion',
+            name='latido',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Último latido del worker'),
+        ),
+        migrations.AddField(
+            model_name='trabajoimportacion',
+            name='reintentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
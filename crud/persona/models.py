@@ -1,12 +1,21 @@
+from django.conf import settings
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
 from django.db import models
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce, Lower
 from oficina.models import Oficina
+from comun.campos import CampoNormalizado, EmailNormalizado
 
 
 class Persona(models.Model):
     
     edad = models.IntegerField(verbose_name="Edad")
-    email = models.EmailField(verbose_name="correo Electronico", max_length=254, unique=True)
+    # Único sin distinguir mayúsculas (restricción sobre Lower('email')). Se guarda normalizado, así
+    # que email= usa el índice común y email__lower= el de la restricción
+    email = EmailNormalizado(verbose_name="correo Electronico", max_length=254, db_index=True)
     nombre = models.CharField(verbose_name="Nombre y apellido", max_length=50)
+    # nombre normalizado para las búsquedas, lo completa el propio campo al guardar
+    nombre_busqueda = CampoNormalizado(origen="nombre", max_length=100, default="")
     oficina = models.ForeignKey(
         Oficina,
         verbose_name="oficina asignada",
@@ -15,12 +24,228 @@ class Persona(models.Model):
         null=True,
         blank=True,
     )
+    # Última modificación; la usa `archivar_personas` para detectar registros inactivos
+    actualizado = models.DateTimeField(verbose_name="Última modificación", auto_now=True, db_index=True)
     class Meta:
         verbose_name = ("persona")
         verbose_name_plural = ("personas")
+        constraints = [
+            models.UniqueConstraint(
+                Lower('email'),
+                name='persona_email_unico_sin_mayusculas',
+                violation_error_code='email_duplicado',
+                violation_error_message="Ya existe una persona con este email.",
+            ),
+        ]
     def __str__(self):
         return f'{self.nombre} - {self.email}'
 
+    def validate_constraints(self, exclude=None):
+        try:
+            super().validate_constraints(exclude=exclude)
+        except ValidationError as error:
+            # La restricción es sobre una expresión: Django la informa sin campo, se pasa a email
+            errores = error.update_error_dict({})
+            generales = errores.pop(NON_FIELD_ERRORS, [])
+            errores.setdefault('email', []).extend(e for e in generales if e.code == 'email_duplicado')
+            otros = [e for e in generales if e.code != 'email_duplicado']
+            if otros:
+                errores[NON_FIELD_ERRORS] = otros
+            raise ValidationError(errores)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores tal como se leyeron, para que las señales calculen los deltas de estadisticas
+        instance._estado_original = (instance.__dict__.get('edad'), instance.__dict__.get('oficina_id'))
+        return instance
+
     def get_absolute_url(self):
         return reverse("persona_detail", kwargs={"pk": self.pk})
 
+
+class PersonaArchivada(models.Model):
+    """Persona movida fuera de la tabla principal por `manage.py archivar_personas`.
+
+    Conserva el id original para que los enlaces a la persona sigan funcionando con
+    `?incluir_archivo=1`.
+    """
+    SIN_OFICINA = "sin_oficina"
+    INACTIVA = "inactiva"
+    MOTIVOS = [
+        (SIN_OFICINA, "Sin oficina"),
+        (INACTIVA, "Sin cambios recientes"),
+    ]
+
+    id = models.BigIntegerField(verbose_name="ID original", primary_key=True)
+    edad = models.IntegerField(verbose_name="Edad")
+    email = EmailNormalizado(verbose_name="correo Electronico", max_length=254, db_index=True)
+    nombre = models.CharField(verbose_name="Nombre y apellido", max_length=50)
+    nombre_busqueda = CampoNormalizado(origen="nombre", max_length=100, default="")
+    oficina = models.ForeignKey(
+        Oficina,
+        verbose_name="oficina asignada",
+        on_delete=models.SET_NULL,
+        related_name="personas_archivadas",
+        null=True,
+        blank=True,
+    )
+    actualizado = models.DateTimeField(verbose_name="Última modificación")
+    archivado = models.DateTimeField(verbose_name="Archivada el", auto_now_add=True)
+    motivo = models.CharField(max_length=20, choices=MOTIVOS)
+
+    class Meta:
+        verbose_name = "persona archivada"
+        verbose_name_plural = "personas archivadas"
+
+    def __str__(self):
+        return f'{self.nombre} - {self.email}'
+
+    @classmethod
+    def desde_persona(cls, persona, motivo):
+        return cls(
+            id=persona.id,
+            edad=persona.edad,
+            email=persona.email,
+            nombre=persona.nombre,
+            oficina_id=persona.oficina_id,
+            actualizado=persona.actualizado,
+            motivo=motivo,
+        )
+
+
+class ParDuplicado(models.Model):
+    """Par de personas candidatas a duplicado, generado por el comando find_duplicates."""
+    persona_a = models.ForeignKey(Persona, on_delete=models.CASCADE, related_name="+")
+    persona_b = models.ForeignKey(Persona, on_delete=models.CASCADE, related_name="+")
+    puntaje = models.FloatField(verbose_name="Puntaje", db_index=True)
+    bloque = models.CharField(verbose_name="Clave de bloque", max_length=120)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "posible duplicado"
+        verbose_name_plural = "posibles duplicados"
+        ordering = ["-puntaje"]
+        constraints = [
+            models.UniqueConstraint(fields=["persona_a", "persona_b"], name="par_duplicado_unico"),
+        ]
+
+    def __str__(self):
+        return f'{self.persona_a_id} ~ {self.persona_b_id} ({self.puntaje:.2f})'
+
+
+class EstadisticaOficina(models.Model):
+    """Resumen materializado de edades por oficina (oficina nula = personas sin oficina).
+
+    Lo mantienen incrementalmente las señales de Persona y las cargas masivas; se reconstruye
+    por completo con `manage.py recalcular_estadisticas`.
+    """
+    oficina = models.OneToOneField(
+        Oficina,
+        verbose_name="oficina",
+        on_delete=models.CASCADE,
+        related_name="estadistica",
+        null=True,
+        blank=True,
+    )
+    cantidad = models.PositiveIntegerField(verbose_name="Cantidad de personas", default=0)
+    suma_edad = models.BigIntegerField(default=0)
+    edad_min = models.IntegerField(verbose_name="Edad mínima", null=True, blank=True)
+    edad_max = models.IntegerField(verbose_name="Edad máxima", null=True, blank=True)
+    histograma = models.JSONField(verbose_name="Histograma de edades", default=dict)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "estadística de oficina"
+        verbose_name_plural = "estadísticas de oficinas"
+        constraints = [
+            # El OneToOne no impide varias filas con oficina nula (NULL no se compara en un índice único)
+            models.UniqueConstraint(
+                Coalesce('oficina', Value(0), output_field=models.BigIntegerField()),
+                condition=Q(oficina__isnull=True),
+                name='estadistica_sin_oficina_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.oficina or "Sin oficina"}: {self.cantidad} personas'
+
+    @property
+    def edad_promedio(self):
+        if not self.cantidad:
+            return None
+        return self.suma_edad / self.cantidad
+
+
+class TrabajoImportacion(models.Model):
+    """Importación de personas subida desde la web y ejecutada por `manage.py procesar_importaciones`."""
+    PENDIENTE = "pendiente"
+    EN_CURSO = "en_curso"
+    TERMINADO = "terminado"
+    FALLIDO = "fallido"
+    ESTADOS = [
+        (PENDIENTE, "Pendiente"),
+        (EN_CURSO, "En curso"),
+        (TERMINADO, "Terminado"),
+        (FALLIDO, "Fallido"),
+    ]
+
+    archivo = models.CharField(verbose_name="Ruta del archivo", max_length=500)
+    nombre_original = models.CharField(verbose_name="Archivo subido", max_length=255)
+    actualizar = models.BooleanField(verbose_name="Actualizar existentes", default=False)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE, db_index=True)
+    creado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    # Lo renueva el worker con cada aviso de progreso; si se queda viejo, el worker se cayó
+    latido = models.DateTimeField(verbose_name="Último latido del worker", null=True, blank=True)
+    reintentos = models.PositiveSmallIntegerField(default=0)
+    terminado = models.DateTimeField(null=True, blank=True)
+    filas_procesadas = models.PositiveIntegerField(default=0)
+    bytes_procesados = models.BigIntegerField(default=0)
+    bytes_totales = models.BigIntegerField(null=True, blank=True)
+    creadas = models.PositiveIntegerField(default=0)
+    actualizadas = models.PositiveIntegerField(default=0)
+    omitidas = models.PositiveIntegerField(default=0)
+    errores = models.JSONField(default=list, blank=True)
+    mensaje = models.TextField(blank=True)
+    reporte = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "importación"
+        verbose_name_plural = "importaciones"
+        ordering = ["-creado"]
+
+    def __str__(self):
+        return f'{self.nombre_original} ({self.get_estado_display()})'
+
+    @property
+    def porcentaje(self):
+        if self.estado == self.TERMINADO:
+            return 100.0
+        if not self.bytes_totales:
+            return None
+        return round(min(self.bytes_procesados * 100 / self.bytes_totales, 100.0), 1)
+
+    def como_dict(self):
+        return {
+            'id': self.pk,
+            'archivo': self.nombre_original,
+            'estado': self.estado,
+            'porcentaje': self.porcentaje,
+            'filas_procesadas': self.filas_procesadas,
+            'creadas': self.creadas,
+            'actualizadas': self.actualizadas,
+            'omitidas': self.omitidas,
+            'errores': self.errores,
+            'mensaje': self.mensaje,
+            'creado': self.creado,
+            'iniciado': self.iniciado,
+            'terminado': self.terminado,
+        }
@@ -2,19 +2,23 @@ import csv
 import sys
 from django.db import transaction
 from django.core.exceptions import ValidationError
+from crud.archivos import EntradaCSV
 from persona.models import Persona
+from persona import estadisticas
+from comun import versiones
+from oficina.resolver import resolver
 
 def run(*args):
     if not args:
         print("Error: proporcionar ruta del archivo")
         print("uso:./manage.py runscript importar_personas --script-args <ruta del archivo>")
+        print("la ruta puede ser un .csv, .csv.gz, .csv.bz2, .csv.xz o - para leer de stdin")
         sys.exit(1)
         
     csv_file = args[0]
     
-    oficinas_map ={oficina.nombre_corto: oficina for oficina in Oficina.objects.all()}
     try:
-        with open(csv_file,'r', encoding = 'utf8') as f:
+        with EntradaCSV(csv_file, encoding='utf8') as f:
             reader = csv.DictReader(f)
             personas_a_crear =[]
             
@@ -22,7 +26,7 @@ def run(*args):
                 nombre = row.get('nombre')
                 edad=row.get('edad')
                 email=row.get('email')
-                oficina=row.get('oficina_nombre_corto')
+                oficina_nombre_corto=row.get('oficina_nombre_corto')
                 
                 if not nombre or not edad:
                     print(f"error en fila {row}, falta el nombre o la edad")
@@ -34,23 +38,26 @@ def run(*args):
                     print(f"error en fila {row}, la edad no es un numero valido")
                     continue
                 
-                oficina_obj = None
+                oficina_id = None
                 if oficina_nombre_corto:
-                    oficina_obj=oficinas_map.get(oficina_nombre_corto)
-                    if not oficina_obj:
+                    oficina_id=resolver.resolver(oficina_nombre_corto)
+                    if not oficina_id:
                         print(f"Cuidado: No existe la oficina mencionada")
                         print(f"se creara el registro sin oficina")
                 
                 try:
-                    persona = Persona(nombre=nombre,edad=edad,email=email,oficina=oficina_obj)
-                    persona.full_clean()
+                    persona = Persona(nombre=nombre,edad=edad_int,email=email,oficina_id=oficina_id)
+                    # La oficina ya viene resuelta por el resolver, no hace falta revalidarla en la base
+                    persona.full_clean(exclude=['oficina'])
                     personas_a_crear.append(persona)
                 except ValidationError as e:
                     print(f"Error de validacion en fila {row}.detalle:{e}")
                 except Exception as e:
                     print(f"error inesperado en fila {row}. detalle:{e}")
         with transaction.atomic():
-            Persona.objects.bulk.create(personas_a_crear)
+            Persona.objects.bulk_create(personas_a_crear)
+            estadisticas.registrar_altas(personas_a_crear)
+            versiones.incrementar('persona')
             print(f"se importaron {len(personas_a_crear)} registros") 
     
     except FileNotFoundError:
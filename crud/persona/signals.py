@@ -0,0 +1,40 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from comun import versiones
+from oficina.models import Oficina
+from . import estadisticas
+from .models import Persona
+
+
+@receiver(post_save, sender=Persona)
+def actualizar_estadisticas_al_guardar(sender, instance, created, raw=False, **kwargs):
+    versiones.incrementar('persona')
+    if raw:
+        return
+    nuevo = (instance.edad, instance.oficina_id)
+    original = getattr(instance, '_estado_original', None)
+    if created:
+        estadisticas.aplicar_deltas([(instance.oficina_id, instance.edad, 1)])
+    elif original is None:
+        # Instancia que no se leyó de la base: no se conoce el estado previo
+        estadisticas.recalcular_oficina(instance.oficina_id)
+    elif original != nuevo:
+        edad_original, oficina_original = original
+        estadisticas.aplicar_deltas([
+            (oficina_original, edad_original, -1),
+            (instance.oficina_id, instance.edad, 1),
+        ])
+    instance._estado_original = nuevo
+
+
+@receiver(post_delete, sender=Persona)
+def actualizar_estadisticas_al_borrar(sender, instance, **kwargs):
+    versiones.incrementar('persona')
+    edad, oficina_id = getattr(instance, '_estado_original', (instance.edad, instance.oficina_id))
+    estadisticas.aplicar_deltas([(oficina_id, edad, -1)])
+
+
+@receiver(post_delete, sender=Oficina)
+def mover_estadisticas_a_sin_oficina(sender, instance, **kwargs):
+    # El SET_NULL de las personas no dispara señales: se recalcula el grupo "sin oficina"
+    estadisticas.recalcular_oficina(None)
@@ -1,3 +1,664 @@
-from django.test import TestCase
+import bz2
+import gzip
+import importlib
+import json
+import lzma
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from crud.archivos import EntradaCSV
+from oficina.models import Oficina
+from oficina.resolver import resolver
+from . import acciones, archivo, estadisticas, lote, trabajos
+from .duplicados import agrupar_en_bloques, buscar_duplicados, clave_fonetica
+from .models import EstadisticaOficina, ParDuplicado, Persona, PersonaArchivada, TrabajoImportacion
+from .views import PersonaSearchView
 
-# Create your tests here.
+
+# Las páginas se renderizan sin el manifest de collectstatic
+SIN_MANIFEST = override_settings(STORAGES={
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+
+
+def crear_personas(cantidad, oficina=None, prefijo='p'):
+    return [
+        Persona.objects.create(nombre=f'Persona {prefijo}{i}', edad=18 + i * 7, email=f'{prefijo}{i}@prueba.com',
+                               oficina=oficina)
+        for i in range(cantidad)
+    ]
+
+
+class CargaMasivaTestCase(TestCase):
+    """Escribe CSVs de prueba en un directorio temporal."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, nombre)
+
+    def escribir_csv(self, nombre, filas, abrir=open):
+        ruta = self.ruta(nombre)
+        with abrir(ruta, 'wt', encoding='utf-8', newline='') as f:
+            f.write('nombre,edad,email\n')
+            for fila in filas:
+                f.write(','.join(str(valor) for valor in fila) + '\n')
+        return ruta
+
+    def cargar(self, ruta, **opciones):
+        salida = StringIO()
+        call_command('load_personas', file=ruta, no_progress=True, stdout=salida, stderr=StringIO(), **opciones)
+        return salida.getvalue()
+
+
+class ReporteCargaTests(CargaMasivaTestCase):
+
+    def test_reporte_json_con_etapas_y_contadores(self):
+        ruta = self.escribir_csv('personas.csv', [
+            ('Ana', 30, 'ana@prueba.com'),
+            ('Juan', 40, 'juan@prueba.com'),
+            ('Sin Edad', '', 'sin@prueba.com'),
+        ])
+        reporte = self.ruta('reporte.json')
+        salida = self.cargar(ruta, report=reporte, batch_size=1)
+
+        with open(reporte, encoding='utf-8') as f:
+            datos = json.load(f)
+        self.assertEqual(datos['contadores']['filas_leidas'], 3)
+        self.assertEqual(datos['contadores']['creadas'], 2)
+        self.assertEqual(datos['contadores']['omitidas'], 1)
+        self.assertEqual(datos['contadores']['lotes'], 2)
+        self.assertIn('parseo_csv', datos['etapas'])
+        self.assertIn('bulk_create', datos['etapas'])
+        self.assertEqual(datos['batch_size'], 1)
+        self.assertIsNone(datos['compresion'])
+        self.assertIn('bulk_create:', salida)
+        self.assertEqual(Persona.objects.count(), 2)
+
+    def test_progreso_va_a_stderr(self):
+        ruta = self.escribir_csv('personas.csv', [('Ana', 30, 'ana@prueba.com')])
+        salida, errores = StringIO(), StringIO()
+        call_command('load_personas', file=ruta, stdout=salida, stderr=errores)
+        self.assertIn('filas=1', errores.getvalue())
+        self.assertIn('100.0%', errores.getvalue())
+        self.assertNotIn('filas=1', salida.getvalue())
+
+
+class EntradaComprimidaTests(CargaMasivaTestCase):
+    """La compresión se detecta por la firma, no por la extensión."""
+    FILAS = [('Ana', 30, 'ana@prueba.com'), ('Juan', 40, 'juan@prueba.com')]
+
+    def leer(self, ruta):
+        entrada = EntradaCSV(ruta)
+        with entrada as texto:
+            return entrada.compresion, texto.read()
+
+    def test_detecta_por_firma(self):
+        plano = self.leer(self.escribir_csv('plano.csv', self.FILAS))
+        self.assertIsNone(plano[0])
+        for nombre, abrir in (('gzip', gzip.open), ('bz2', bz2.open), ('xz', lzma.open)):
+            # Sin extensión que delate el formato
+            ruta = self.escribir_csv(f'personas-{nombre}.dat', self.FILAS, abrir=abrir)
+            self.assertEqual(self.leer(ruta), (nombre, plano[1]))
+
+    def test_carga_xz_y_lo_informa_en_el_reporte(self):
+        ruta = self.escribir_csv('personas.csv.xz', self.FILAS, abrir=lzma.open)
+        reporte = self.ruta('reporte.json')
+        self.cargar(ruta, report=reporte)
+        with open(reporte, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['compresion'], 'xz')
+        self.assertEqual(Persona.objects.count(), 2)
+
+    def test_gzip_por_stdin(self):
+        ruta = self.escribir_csv('personas.csv.gz', self.FILAS, abrir=gzip.open)
+        with open(ruta, 'rb') as stdin, mock.patch('sys.stdin', stdin):
+            entrada = EntradaCSV('-')
+            self.assertIsNone(entrada.total_bytes)
+            with entrada as texto:
+                self.assertIn('juan@prueba.com', texto.read())
+            self.assertEqual(entrada.compresion, 'gzip')
+            # Cerrar la entrada no cierra el stdin del proceso
+            self.assertFalse(stdin.closed)
+
+
+class DuplicadosTests(TestCase):
+
+    def setUp(self):
+        self.ventas = Oficina.objects.create(nombre='Ventas', nombre_corto='VEN')
+        self.juan = Persona.objects.create(nombre='Juan Pérez', edad=40, email='juan.perez@prueba.com',
+                                           oficina=self.ventas)
+        self.juan_typo = Persona.objects.create(nombre='Juan Peres', edad=41, email='juanperez@prueba.com')
+        self.invertido = Persona.objects.create(nombre='Pérez Juan', edad=40, email='jperez@otro.com',
+                                                oficina=self.ventas)
+        self.otra = Persona.objects.create(nombre='Ana Gómez', edad=25, email='ana@prueba.com')
+
+    def buscar(self, *args, **opciones):
+        salida = StringIO()
+        call_command('find_duplicates', *args, workers=1, stdout=salida, **opciones)
+        return salida.getvalue()
+
+    def pares(self):
+        return set(ParDuplicado.objects.values_list('persona_a_id', 'persona_b_id'))
+
+    def test_clave_fonetica(self):
+        self.assertEqual(clave_fonetica('juan perez'), clave_fonetica('juan peres'))
+        self.assertEqual(clave_fonetica('valle'), clave_fonetica('baye'))
+
+    def test_encuentra_pares_solo_dentro_de_los_bloques(self):
+        self.buscar('--threshold', '0.6')
+        self.assertEqual(self.pares(), {
+            (self.juan.pk, self.juan_typo.pk),
+            (self.juan.pk, self.invertido.pk),
+        })
+        # Una corrida nueva reemplaza la tabla en lugar de acumular
+        self.buscar('--threshold', '0.99')
+        self.assertEqual(self.pares(), set())
+
+    def test_por_oficina(self):
+        self.buscar('--threshold', '0.6', '--by-oficina')
+        self.assertEqual(self.pares(), {(self.juan.pk, self.invertido.pk)})
+
+    def test_omite_bloques_demasiado_grandes(self):
+        Persona.objects.bulk_create(
+            [Persona(nombre='María Gómez', edad=30, email=f'maria{i}@prueba.com') for i in range(5)]
+        )
+        salida = self.buscar('--threshold', '0.6', '--max-block-size', '4')
+        self.assertIn('Bloque omitido por tamaño (5 personas): n:maria gomez', salida)
+        self.assertFalse(ParDuplicado.objects.filter(bloque__contains='maria').exists())
+        # El bloque de Juan Pérez sigue dentro del límite
+        self.assertIn((self.juan.pk, self.juan_typo.pk), self.pares())
+
+    def test_agrupar_descarta_bloques_de_uno(self):
+        filas = [(1, 'Ana', 30, 'a@x.com', None), (2, 'Ana', 31, 'b@x.com', None), (3, 'Luis', 30, 'c@x.com', None)]
+        bloques, omitidos = agrupar_en_bloques(filas)
+        self.assertEqual({clave for clave, _ in bloques}, {'n:ana', 'f:an', 'p:ana'})
+        self.assertEqual(omitidos, [])
+        pares, _ = buscar_duplicados(filas, umbral=0.5, workers=1)
+        self.assertEqual(set(pares), {(1, 2)})
+
+
+class EstadisticasIncrementalesTests(TestCase):
+    """La tabla materializada tiene que coincidir siempre con el agregado en vivo."""
+
+    def setUp(self):
+        resolver.invalidar()
+        self.ventas = Oficina.objects.create(nombre='Ventas', nombre_corto='VEN')
+        self.compras = Oficina.objects.create(nombre='Compras', nombre_corto='COM')
+
+    def assertEstadisticasAlDia(self):
+        self.assertEqual(estadisticas.verificar(), [])
+
+    def test_alta_modificacion_y_baja(self):
+        personas = crear_personas(5, self.ventas)
+        self.assertEstadisticasAlDia()
+
+        personas[0].edad = 90
+        personas[0].save()
+        personas[1].oficina = self.compras
+        personas[1].save()
+        personas[2].oficina = None
+        personas[2].save()
+        self.assertEstadisticasAlDia()
+
+        # Se borra la de menor y la de mayor edad: se recalculan los extremos
+        personas[3].delete()
+        personas[0].delete()
+        Persona.objects.filter(oficina=self.compras).delete()
+        self.assertEstadisticasAlDia()
+
+    def test_una_sola_fila_sin_oficina(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            EstadisticaOficina.objects.create(oficina=None)
+            EstadisticaOficina.objects.create(oficina=None)
+        resumen = estadisticas._obtener_bloqueado(EstadisticaOficina, None)
+        self.assertEqual(estadisticas._obtener_bloqueado(EstadisticaOficina, None), resumen)
+
+    def test_la_migracion_rellena_igual_que_el_agregado_en_vivo(self):
+        crear_personas(4, self.ventas)
+        crear_personas(3, prefijo='s')
+        Persona.objects.create(nombre='Mayor', edad=104, email='mayor@prueba.com', oficina=self.compras)
+        migracion = importlib.import_module('persona.migrations.0005_estadisticaoficina')
+
+        datos = migracion.resumenes(apps.get_model('persona', 'Persona'), [self.ventas.pk, self.compras.pk, None])
+        self.assertEqual(datos, estadisticas.agregado_en_vivo())
+
+
+@SIN_MANIFEST
+class GetCondicionalTests(TestCase):
+
+    def setUp(self):
+        self.persona = Persona.objects.create(nombre='Ana', edad=30, email='ana@prueba.com')
+        self.url = reverse('persona:lista')
+
+    def login(self, *permisos):
+        usuario = User.objects.create_user('ana', password='clave-de-prueba')
+        usuario.user_permissions.add(*Permission.objects.filter(codename__in=permisos))
+        self.client.force_login(usuario)
+        return usuario
+
+    def test_sin_cambios_responde_304(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, headers={'if-none-match': etag}).status_code, 304)
+        detalle = reverse('persona:detalle', args=[self.persona.pk])
+        etag = self.client.get(detalle)['ETag']
+        self.assertEqual(self.client.get(detalle, headers={'if-none-match': etag}).status_code, 304)
+
+    def test_una_escritura_cambia_el_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.persona.edad = 31
+        self.persona.save()
+        respuesta = self.client.get(self.url, headers={'if-none-match': etag})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_el_fragmento_tiene_su_propio_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        respuesta = self.client.get(self.url, headers={'if-none-match': etag, 'hx-request': 'true'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_un_nuevo_login_cambia_el_etag(self):
+        usuario = self.login()
+        etag = self.client.get(self.url)['ETag']
+        self.client.logout()
+        self.client.force_login(usuario)
+        self.assertEqual(self.client.get(self.url, headers={'if-none-match': etag}).status_code, 200)
+
+    def test_anonimo_sin_formulario_es_publico_y_sin_cookie_csrf(self):
+        respuesta = self.client.get(self.url)
+        self.assertIn('public', respuesta['Cache-Control'])
+        self.assertNotIn(settings.CSRF_COOKIE_NAME, respuesta.cookies)
+        self.assertNotContains(respuesta, 'csrfmiddlewaretoken')
+
+    def test_con_formulario_el_token_entra_en_el_etag(self):
+        self.login('change_persona')
+        respuesta = self.client.get(self.url)
+        self.assertIn('private', respuesta['Cache-Control'])
+        self.assertNotIn('public', respuesta['Cache-Control'])
+        self.assertContains(respuesta, 'csrfmiddlewaretoken')
+        etag = respuesta['ETag']
+        self.assertEqual(self.client.get(self.url, headers={'if-none-match': etag}).status_code, 304)
+
+        # Un token CSRF nuevo deja sin validez el formulario que tiene el cliente
+        self.client.cookies.pop(settings.CSRF_COOKIE_NAME)
+        self.assertEqual(self.client.get(self.url, headers={'if-none-match': etag}).status_code, 200)
+
+    def test_el_fragmento_no_genera_token(self):
+        self.login('change_persona')
+        respuesta = self.client.get(self.url, headers={'hx-request': 'true'})
+        self.assertNotIn(settings.CSRF_COOKIE_NAME, respuesta.cookies)
+        self.assertIn('private', respuesta['Cache-Control'])
+
+
+@SIN_MANIFEST
+class ImportacionEnSegundoPlanoTests(CargaMasivaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        configuracion = override_settings(IMPORTACIONES_DIR=self.ruta('importaciones'))
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+        self.client.force_login(User.objects.create_user('admin', password='clave-de-prueba', is_staff=True))
+
+    def test_la_subida_encola_y_el_worker_importa(self):
+        contenido = gzip.compress(b'nombre,edad,email\nAna,30,ana@prueba.com\nJuan,x,juan@prueba.com\n')
+        archivo = SimpleUploadedFile('personas.csv.gz', contenido)
+        respuesta = self.client.post(reverse('persona:importacion_crear'), {'archivo': archivo})
+        trabajo = TrabajoImportacion.objects.get()
+        self.assertRedirects(respuesta, reverse('persona:importacion_detalle', args=[trabajo.pk]))
+        # La vista solo encola: no importa nada en el request
+        self.assertEqual(trabajo.estado, TrabajoImportacion.PENDIENTE)
+        self.assertEqual(Persona.objects.count(), 0)
+
+        call_command('procesar_importaciones', '--once', stdout=StringIO(), stderr=StringIO())
+        datos = self.client.get(reverse('persona:importacion_json', args=[trabajo.pk])).json()
+        self.assertEqual(datos['estado'], TrabajoImportacion.TERMINADO)
+        self.assertEqual((datos['creadas'], datos['omitidas']), (1, 1))
+        self.assertEqual(datos['errores'][0]['campo'], 'edad')
+        self.assertFalse(os.path.exists(trabajo.archivo))
+        self.assertEqual(Persona.objects.get().email, 'ana@prueba.com')
+
+
+class TrabajosAbandonadosTests(TestCase):
+
+    def setUp(self):
+        self.trabajo = TrabajoImportacion.objects.create(archivo='/no/existe.csv', nombre_original='personas.csv')
+
+    def abandonar(self, trabajo):
+        TrabajoImportacion.objects.filter(pk=trabajo.pk).update(latido=timezone.now() - timedelta(hours=1))
+
+    def test_sin_latido_vuelve_a_la_cola_y_despues_falla(self):
+        for _ in range(trabajos.MAX_REINTENTOS):
+            tomado = trabajos.tomar_siguiente(sin_latido=60)
+            self.assertEqual(tomado.pk, self.trabajo.pk)
+            self.abandonar(tomado)
+        self.assertEqual(trabajos.recuperar_abandonados(sin_latido=60), (1, 0))
+        self.abandonar(trabajos.tomar_siguiente(sin_latido=60))
+
+        self.assertIsNone(trabajos.tomar_siguiente(sin_latido=60))
+        self.trabajo.refresh_from_db()
+        self.assertEqual(self.trabajo.estado, TrabajoImportacion.FALLIDO)
+
+    def test_con_latido_reciente_sigue_en_curso(self):
+        trabajos.tomar_siguiente(sin_latido=60)
+        self.assertEqual(trabajos.recuperar_abandonados(sin_latido=60), (0, 0))
+        self.trabajo.refresh_from_db()
+        self.assertEqual(self.trabajo.estado, TrabajoImportacion.EN_CURSO)
+
+    def test_el_worker_que_perdio_el_trabajo_no_pisa_el_resultado(self):
+        tomado = trabajos.tomar_siguiente()
+        # Otro worker lo dio por abandonado y lo volvió a encolar
+        TrabajoImportacion.objects.filter(pk=tomado.pk).update(estado=TrabajoImportacion.PENDIENTE)
+        trabajos.ejecutar(tomado)
+        self.trabajo.refresh_from_db()
+        self.assertEqual(self.trabajo.estado, TrabajoImportacion.PENDIENTE)
+
+    def test_devolver_no_cuenta_como_reintento(self):
+        tomado = trabajos.tomar_siguiente()
+        self.assertEqual(trabajos.devolver(tomado), 1)
+        self.trabajo.refresh_from_db()
+        self.assertEqual((self.trabajo.estado, self.trabajo.reintentos), (TrabajoImportacion.PENDIENTE, 0))
+
+
+@SIN_MANIFEST
+class BusquedaPersonasTests(TestCase):
+
+    def setUp(self):
+        PersonaSearchView.cache_busqueda._vaciar(None)
+        resolver.invalidar()
+        self.ventas = Oficina.objects.create(nombre='Ventas', nombre_corto='VEN')
+        Persona.objects.create(nombre='Ana Pérez', edad=30, email='ana@prueba.com', oficina=self.ventas)
+        Persona.objects.create(nombre='Juan Ventas', edad=40, email='juan@prueba.com')
+
+    def test_busca_solo_por_nombre(self):
+        url = reverse('persona:buscar')
+        self.assertContains(self.client.get(url, {'q': 'PEREZ'}), 'Ana Pérez')
+        # El código o el nombre de una oficina no trae a su gente, solo coincidencias de nombre
+        respuesta = self.client.get(url, {'q': 'ventas'})
+        self.assertContains(respuesta, 'Juan Ventas')
+        self.assertNotContains(respuesta, 'Ana Pérez')
+        self.assertNotContains(self.client.get(url, {'q': 'VEN'}), 'Ana Pérez')
+
+
+@SIN_MANIFEST
+class ArchivoTests(TestCase):
+
+    def setUp(self):
+        PersonaSearchView.cache_busqueda._vaciar(None)
+        resolver.invalidar()
+        self.ventas = Oficina.objects.create(nombre='Ventas', nombre_corto='VEN')
+
+    def archivar(self):
+        crear_personas(4, self.ventas)
+        crear_personas(3, prefijo='s')
+        Persona.objects.filter(oficina=self.ventas, edad__lt=30).update(
+            actualizado=timezone.now() - timedelta(days=400)
+        )
+        filtro = archivo.filtro_politica(sin_oficina=True, inactivas_desde=timezone.now() - timedelta(days=365))
+        while archivo.archivar_lote(filtro, batch_size=2):
+            self.assertEqual(estadisticas.verificar(), [])
+
+    def test_archivar_mantiene_las_estadisticas(self):
+        self.archivar()
+        self.assertEqual(PersonaArchivada.objects.count(), 5)
+        self.assertEqual(Persona.objects.count(), 2)
+        self.assertEqual(estadisticas.verificar(), [])
+
+    def test_la_busqueda_incluye_el_archivo_solo_si_se_pide(self):
+        self.archivar()
+        url = reverse('persona:buscar')
+        self.assertEqual(self.client.get(url, {'q': 'persona'}).context['paginator'].count, 2)
+        respuesta = self.client.get(url, {'q': 'persona', 'incluir_archivo': '1'})
+        self.assertEqual(respuesta.context['paginator'].count, 7)
+        self.assertContains(respuesta, 'Persona s2')
+        archivada = PersonaArchivada.objects.first()
+        detalle = reverse('persona:detalle', args=[archivada.pk])
+        self.assertEqual(self.client.get(detalle).status_code, 404)
+        self.assertContains(self.client.get(detalle, {'incluir_archivo': '1'}), archivada.nombre)
+
+
+@SIN_MANIFEST
+@override_settings(API_LOTE_TOKENS=['token-de-prueba'])
+class LoteTests(TestCase):
+
+    def setUp(self):
+        resolver.invalidar()
+        self.ventas = Oficina.objects.create(nombre='Ventas', nombre_corto='VEN')
+        self.compras = Oficina.objects.create(nombre='Compras', nombre_corto='COM')
+        self.url = reverse('persona:api_lote')
+        self.items = json.dumps([{'nombre': 'Ana', 'edad': 30, 'email': 'ana@prueba.com', 'oficina': 'VEN'}])
+
+    def test_altas_y_actualizaciones_por_item(self):
+        crear_personas(2, self.ventas)
+        resultados = lote.procesar([
+            {'nombre': 'Nueva', 'edad': 33, 'email': 'nueva@prueba.com', 'oficina': 'COM'},
+            {'nombre': 'Persona p0', 'edad': 70, 'email': 'p0@prueba.com', 'oficina': ''},
+            {'nombre': 'Persona p1', 'edad': 25, 'email': 'p1@prueba.com', 'oficina': 'VEN'},
+            {'nombre': 'Sin Oficina', 'edad': 25, 'email': 'x@prueba.com', 'oficina': 'XXX'},
+        ], batch_size=1)
+        self.assertEqual([r['estado'] for r in resultados], ['creada', 'actualizada', 'sin_cambios', 'error'])
+        self.assertIn('oficina', resultados[3]['errores'])
+        self.assertEqual(estadisticas.verificar(), [])
+
+    def test_un_alta_concurrente_se_reintenta_como_actualizacion(self):
+        existentes = lote._existentes
+        llamadas = []
+
+        def sin_ver_la_concurrente(emails):
+            # La primera consulta no ve el alta que otro request confirmó justo después
+            llamadas.append(emails)
+            return {} if len(llamadas) == 1 else existentes(emails)
+
+        Persona.objects.create(nombre='Ana Vieja', edad=20, email='ana@prueba.com')
+        with mock.patch.object(lote, '_existentes', sin_ver_la_concurrente):
+            resultados = lote.procesar(json.loads(self.items))
+        self.assertEqual(len(llamadas), 2)
+        self.assertEqual(resultados[0]['estado'], 'actualizada')
+        self.assertEqual(Persona.objects.get().nombre, 'Ana')
+
+    def test_si_el_conflicto_persiste_informa_cada_item(self):
+        with mock.patch.object(lote, '_existentes', return_value={}):
+            Persona.objects.create(nombre='Ana Vieja', edad=20, email='ana@prueba.com')
+            resultados = lote.procesar(json.loads(self.items) + [
+                {'nombre': 'Juan', 'edad': 40, 'email': 'juan@prueba.com'},
+            ])
+        self.assertEqual([r['estado'] for r in resultados], ['error', 'error'])
+        self.assertIn('Conflicto', resultados[1]['errores']['__all__'][0])
+        self.assertFalse(Persona.objects.filter(email='juan@prueba.com').exists())
+
+    def test_token_de_integrador_sin_sesion_ni_csrf(self):
+        cliente = Client(enforce_csrf_checks=True)
+        respuesta = cliente.post(self.url, self.items, content_type='application/json',
+                                 headers={'authorization': 'Bearer token-de-prueba'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['totales']['creada'], 1)
+
+        respuesta = cliente.post(self.url, self.items, content_type='application/json',
+                                 headers={'authorization': 'Bearer otro-token'})
+        self.assertEqual(respuesta.status_code, 403)
+
+    def test_sesion_de_staff_pide_csrf(self):
+        cliente = Client(enforce_csrf_checks=True)
+        cliente.force_login(User.objects.create_user('admin', password='clave-de-prueba', is_staff=True))
+        respuesta = cliente.post(self.url, self.items, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 403)
+        self.assertFalse(Persona.objects.exists())
+
+        cliente.get(reverse('persona:importacion_crear'))
+        token = cliente.cookies[settings.CSRF_COOKIE_NAME].value
+        respuesta = cliente.post(self.url, self.items, content_type='application/json',
+                                 headers={'x-csrftoken': token})
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_sin_staff_ni_token(self):
+        self.client.force_login(User.objects.create_user('ana', password='clave-de-prueba'))
+        self.assertEqual(self.client.post(self.url, self.items, content_type='application/json').status_code, 403)
+
+
+@SIN_MANIFEST
+class AccionesMasivasTests(TestCase):
+
+    def setUp(self):
+        resolver.invalidar()
+        self.ventas = Oficina.objects.create(nombre='Ventas', nombre_corto='VEN')
+        self.compras = Oficina.objects.create(nombre='Compras', nombre_corto='COM')
+        self.usuario = User.objects.create_user('ana', password='clave-de-prueba')
+        self.client.force_login(self.usuario)
+        self.url = reverse('persona:acciones')
+        self.borrar_todas = {'accion': 'eliminar', 'todos': 'on', 'confirmado': 'on'}
+
+    def dar_permiso(self, codename):
+        self.usuario.user_permissions.add(Permission.objects.get(codename=codename))
+
+    def test_por_tandas_con_estadisticas_al_dia(self):
+        crear_personas(7, self.ventas)
+        crear_personas(3, prefijo='s')
+
+        acciones.reasignar(Persona.objects.filter(oficina=self.ventas), self.compras.pk, tamano=2)
+        self.assertEqual(estadisticas.verificar(), [])
+        acciones.reasignar(Persona.objects.filter(edad__gt=40), None, tamano=3)
+        self.assertEqual(estadisticas.verificar(), [])
+        acciones.eliminar(acciones.filtrar('persona p'), tamano=2)
+        self.assertEqual(estadisticas.verificar(), [])
+        self.assertEqual(Persona.objects.count(), 3)
+
+    def test_sin_permisos_no_borra_ni_mueve(self):
+        crear_personas(3)
+        self.assertEqual(self.client.post(self.url, self.borrar_todas).status_code, 403)
+        self.assertEqual(self.client.post(self.url, {'accion': 'reasignar', 'todos': 'on'}).status_code, 403)
+        self.assertEqual(Persona.objects.count(), 3)
+
+    def test_modificar_no_alcanza_para_borrar(self):
+        crear_personas(3)
+        self.dar_permiso('change_persona')
+        self.assertEqual(self.client.post(self.url, self.borrar_todas).status_code, 403)
+        self.assertEqual(self.client.post(self.url, {'accion': 'reasignar', 'todos': 'on'}).status_code, 200)
+
+    def test_con_permiso_de_borrar(self):
+        crear_personas(3)
+        self.dar_permiso('delete_persona')
+        self.assertRedirects(self.client.post(self.url, self.borrar_todas), reverse('persona:lista'))
+        self.assertEqual(Persona.objects.count(), 0)
+        self.assertEqual(estadisticas.verificar(), [])
+
+    def test_mensajes_pendientes_no_responden_304(self):
+        self.dar_permiso('change_persona')
+        lista = reverse('persona:lista')
+        etag = self.client.get(lista)['ETag']
+
+        # Sin personas seleccionadas: vuelve a la lista con un mensaje de error
+        self.client.post(self.url, {'accion': 'reasignar'})
+        respuesta = self.client.get(lista, headers={'if-none-match': etag})
+        self.assertContains(respuesta, 'No se seleccionó ninguna persona.')
+        self.assertEqual(self.client.get(lista, headers={'if-none-match': etag}).status_code, 304)
+
+
+class FilaCacheadaTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.oficina = Oficina.objects.create(nombre='Ventas', nombre_corto='VEN')
+        self.persona = Persona.objects.create(nombre='Ana', edad=30, email='ana@prueba.com', oficina=self.oficina)
+
+    def lista(self):
+        return self.client.get(reverse('persona:lista'), headers={'HX-Request': 'true'})
+
+    def clave(self):
+        persona = Persona.objects.select_related('oficina').get(pk=self.persona.pk)
+        return make_template_fragment_key(
+            'fila_persona', [persona.pk, persona.actualizado, persona.oficina.nombre_corto],
+        )
+
+    def test_editar_la_persona_cambia_la_clave(self):
+        self.assertContains(self.lista(), '<td>30</td>', html=True)
+        anterior = self.clave()
+        self.assertIsNotNone(cache.get(anterior))
+
+        self.persona.edad = 31
+        self.persona.save()
+        self.assertNotEqual(self.clave(), anterior)
+        self.assertContains(self.lista(), '<td>31</td>', html=True)
+
+    def test_renombrar_la_oficina_cambia_la_clave(self):
+        self.assertContains(self.lista(), '<td>VEN</td>', html=True)
+        anterior = self.clave()
+
+        # La persona no se modifica: la fila se invalida por el código de la oficina
+        self.oficina.nombre_corto = 'VTA'
+        self.oficina.save()
+        self.assertNotEqual(self.clave(), anterior)
+        respuesta = self.lista()
+        self.assertContains(respuesta, '<td>VTA</td>', html=True)
+        self.assertNotContains(respuesta, '<td>VEN</td>', html=True)
+
+
+class EmailSinMayusculasTests(TestCase):
+
+    def test_se_guarda_normalizado(self):
+        persona = Persona.objects.create(nombre='Ana', edad=30, email=' Ana@Prueba.COM ')
+        persona.refresh_from_db()
+        self.assertEqual(persona.email, 'ana@prueba.com')
+        # Los filtros también normalizan, así que usan el índice común
+        self.assertEqual(Persona.objects.get(email='ANA@prueba.com'), persona)
+        self.assertEqual(Persona.objects.get(email__lower='ana@prueba.com'), persona)
+
+    def test_unico_sin_distinguir_mayusculas(self):
+        Persona.objects.create(nombre='Ana', edad=30, email='ana@prueba.com')
+        with self.assertRaises(ValidationError) as error:
+            Persona(nombre='Otra Ana', edad=40, email='ANA@prueba.com').full_clean()
+        self.assertEqual(list(error.exception.message_dict), ['email'])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Persona.objects.bulk_create([Persona(nombre='Otra Ana', edad=40, email='Ana@Prueba.com')])
+
+    def test_lote_actualiza_sin_distinguir_mayusculas(self):
+        Persona.objects.create(nombre='Ana', edad=30, email='ana@prueba.com')
+        resultados = lote.procesar([{'nombre': 'Ana', 'edad': 31, 'email': 'ANA@Prueba.com', 'oficina': ''}])
+        self.assertEqual(resultados[0]['estado'], 'actualizada')
+        self.assertEqual(Persona.objects.get().edad, 31)
+
+    def escribir_email(self, modelo, pk, email):
+        # Como quedaron los datos de antes de la migración: sin pasar por EmailNormalizado
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {modelo._meta.db_table} SET email = %s WHERE id = %s', [email, pk])
+
+    def test_la_migracion_normaliza_en_python(self):
+        migracion = importlib.import_module('persona.migrations.0009_email_sin_mayusculas')
+        beto = Persona.objects.create(nombre='Beto', edad=30, email='beto@prueba.com')
+        archivada = PersonaArchivada.objects.create(
+            id=99, nombre='Carla', edad=50, email='carla@prueba.com', actualizado=timezone.now(),
+            motivo=PersonaArchivada.INACTIVA,
+        )
+        self.escribir_email(Persona, beto.pk, ' Beto@Prueba.COM ')
+        self.escribir_email(PersonaArchivada, archivada.pk, 'CARLA@prueba.com')
+
+        migracion.normalizar_emails(apps, None)
+        self.assertEqual(Persona.objects.get().email, 'beto@prueba.com')
+        self.assertEqual(PersonaArchivada.objects.get().email, 'carla@prueba.com')
+
+    def test_la_migracion_ve_colisiones_fuera_de_ascii(self):
+        migracion = importlib.import_module('persona.migrations.0009_email_sin_mayusculas')
+        jose = Persona.objects.create(nombre='José', edad=30, email='josé@prueba.com')
+        otro = Persona.objects.create(nombre='Otro José', edad=40, email='otro@prueba.com')
+        # Para el LOWER de SQLite son distintos; normalizados, no
+        self.escribir_email(Persona, otro.pk, 'JOSÉ@prueba.com')
+
+        with self.assertRaisesMessage(RuntimeError, f"#{jose.pk} 'josé@prueba.com', #{otro.pk} 'JOSÉ@prueba.com'"):
+            migracion.normalizar_emails(apps, None)
@@ -0,0 +1,159 @@
+import os
+import traceback
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .importacion import ImportadorPersonas, ErrorImportacion
+from .models import TrabajoImportacion
+
+MAX_ERRORES_GUARDADOS = 100
+# Veces que un trabajo abandonado vuelve a la cola antes de darlo por fallido
+MAX_REINTENTOS = 2
+TAMANIO_CHUNK = 1024 * 1024
+
+
+def encolar(archivo_subido, usuario=None, actualizar=False):
+    """Guarda el archivo subido en disco por chunks y crea el trabajo pendiente.
+
+    La vista solo hace esto: la importación la corre el worker, nunca el proceso web.
+    """
+    directorio = Path(settings.IMPORTACIONES_DIR)
+    directorio.mkdir(parents=True, exist_ok=True)
+    # Se conserva la extensión (.gz, .xz...) solo como referencia; la compresión se detecta por contenido
+    sufijo = ''.join(Path(archivo_subido.name).suffixes[-2:])[:20]
+    destino = directorio / f'{uuid.uuid4().hex}{sufijo}'
+    with open(destino, 'wb') as f:
+        for chunk in archivo_subido.chunks(TAMANIO_CHUNK):
+            f.write(chunk)
+    return TrabajoImportacion.objects.create(
+        archivo=str(destino),
+        nombre_original=archivo_subido.name[:255],
+        actualizar=actualizar,
+        creado_por=usuario if usuario and usuario.is_authenticated else None,
+        bytes_totales=os.path.getsize(destino),
+    )
+
+
+class TrabajoReasignado(Exception):
+    """El trabajo se dio por abandonado y se devolvió a la cola mientras este worker lo corría."""
+
+
+def recuperar_abandonados(sin_latido=None):
+    """Devuelve a la cola los trabajos en curso cuyo worker dejó de dar latidos.
+
+    Un worker que muere (OOM, kill -9, reinicio de la máquina) no llega a devolver su trabajo:
+    si el último latido tiene más de `sin_latido` segundos se vuelve a encolar, y después de
+    MAX_REINTENTOS se marca fallido, para que un archivo que tumba al worker no se reintente
+    para siempre. Devuelve (reencolados, fallidos).
+    """
+    if sin_latido is None:
+        sin_latido = settings.IMPORTACIONES_SIN_LATIDO
+    limite = timezone.now() - timedelta(seconds=sin_latido)
+    abandonados = TrabajoImportacion.objects.filter(estado=TrabajoImportacion.EN_CURSO).filter(
+        Q(latido__lt=limite) | Q(latido__isnull=True, iniciado__lt=limite)
+    )
+    fallidos = abandonados.filter(reintentos__gte=MAX_REINTENTOS).update(
+        estado=TrabajoImportacion.FALLIDO,
+        mensaje=f"El worker dejó de responder {MAX_REINTENTOS + 1} veces con este archivo.",
+        terminado=timezone.now(),
+    )
+    reencolados = abandonados.filter(reintentos__lt=MAX_REINTENTOS).update(
+        estado=TrabajoImportacion.PENDIENTE,
+        reintentos=F('reintentos') + 1,
+    )
+    return reencolados, fallidos
+
+
+def tomar_siguiente(sin_latido=None):
+    """Reclama el trabajo pendiente más viejo; el UPDATE condicional evita que dos workers tomen el mismo.
+
+    Antes devuelve a la cola los trabajos abandonados por un worker caído (recuperar_abandonados).
+    `iniciado` identifica cada reclamo: si el trabajo se reencola y lo toma otro worker, el
+    anterior lo nota en el próximo latido.
+    """
+    recuperar_abandonados(sin_latido)
+    pendientes = TrabajoImportacion.objects.filter(estado=TrabajoImportacion.PENDIENTE).order_by('creado')
+    for trabajo_id in pendientes.values_list('id', flat=True)[:10]:
+        ahora = timezone.now()
+        tomado = TrabajoImportacion.objects.filter(id=trabajo_id, estado=TrabajoImportacion.PENDIENTE).update(
+            estado=TrabajoImportacion.EN_CURSO,
+            iniciado=ahora,
+            latido=ahora,
+        )
+        if tomado:
+            return TrabajoImportacion.objects.get(id=trabajo_id)
+    return None
+
+
+def devolver(trabajo):
+    """Devuelve a la cola un trabajo interrumpido a propósito (Ctrl+C, SIGTERM); no cuenta como reintento."""
+    return _propio(trabajo).update(estado=TrabajoImportacion.PENDIENTE, latido=None)
+
+
+def _propio(trabajo):
+    """El trabajo, solo mientras siga siendo de este worker (mismo reclamo y todavía en curso)."""
+    return TrabajoImportacion.objects.filter(
+        id=trabajo.id, estado=TrabajoImportacion.EN_CURSO, iniciado=trabajo.iniciado,
+    )
+
+
+def ejecutar(trabajo, batch_size=500, intervalo_progreso=1.0, conservar_archivo=False):
+    """Corre el motor de importación sobre un trabajo ya reclamado y guarda progreso y resultado.
+
+    Cada aviso de progreso renueva el latido. Si el trabajo se reencoló mientras tanto (este
+    worker tardó más que IMPORTACIONES_SIN_LATIDO), se corta sin guardar el resultado.
+    """
+    def progreso(metricas, offset, final=False):
+        renovado = _propio(trabajo).update(
+            filas_procesadas=metricas.contadores['filas_leidas'],
+            bytes_procesados=offset or 0,
+            latido=timezone.now(),
+        )
+        if not renovado:
+            raise TrabajoReasignado(f"El trabajo #{trabajo.pk} se devolvió a la cola.")
+
+    importador = ImportadorPersonas(
+        actualizar=trabajo.actualizar,
+        batch_size=batch_size,
+        progreso=progreso,
+        intervalo_progreso=intervalo_progreso,
+    )
+    try:
+        importador.ejecutar(trabajo.archivo)
+    except TrabajoReasignado:
+        trabajo.refresh_from_db()
+        return trabajo
+    except ErrorImportacion as e:
+        trabajo.estado = TrabajoImportacion.FALLIDO
+        trabajo.mensaje = str(e)
+    except Exception:
+        trabajo.estado = TrabajoImportacion.FALLIDO
+        trabajo.mensaje = traceback.format_exc()
+    else:
+        trabajo.estado = TrabajoImportacion.TERMINADO
+        trabajo.reporte = importador.metricas.como_dict()
+        trabajo.filas_procesadas = importador.metricas.contadores['filas_leidas']
+        trabajo.bytes_procesados = trabajo.bytes_totales or 0
+        if not conservar_archivo:
+            try:
+                os.remove(trabajo.archivo)
+            except OSError:
+                pass
+    trabajo.creadas = importador.creadas
+    trabajo.actualizadas = importador.actualizadas
+    trabajo.omitidas = importador.omitidas
+    trabajo.errores = [
+        {**error, 'valor': str(error['valor'])} for error in importador.errores[:MAX_ERRORES_GUARDADOS]
+    ]
+    trabajo.terminado = timezone.now()
+    campos = [
+        'estado', 'mensaje', 'reporte', 'filas_procesadas', 'bytes_procesados',
+        'creadas', 'actualizadas', 'omitidas', 'errores', 'terminado',
+    ]
+    # Un worker que perdió el trabajo no pisa el resultado del que lo tomó después
+    if not _propio(trabajo).update(**{campo: getattr(trabajo, campo) for campo in campos}):
+        trabajo.refresh_from_db()
+    return trabajo
@@ -28,9 +28,44 @@ urlpatterns = [
         DeletePersonaView.as_view(),
         name='eliminar',
     ),
+    path(
+        'acciones/',
+        AccionMasivaView.as_view(),
+        name='acciones',
+    ),
     path(
         'buscar/',
         PersonaSearchView.as_view(),
         name='buscar',
     ),
+    path(
+        'estadisticas/',
+        EstadisticasView.as_view(),
+        name='estadisticas',
+    ),
+    path(
+        'estadisticas/json/',
+        EstadisticasJsonView.as_view(),
+        name='estadisticas_json',
+    ),
+    path(
+        'importaciones/',
+        ImportacionCreateView.as_view(),
+        name='importacion_crear',
+    ),
+    path(
+        'importaciones/<int:pk>/',
+        ImportacionDetailView.as_view(),
+        name='importacion_detalle',
+    ),
+    path(
+        'importaciones/<int:pk>/json/',
+        ImportacionJsonView.as_view(),
+        name='importacion_json',
+    ),
+    path(
+        'api/lote/',
+        PersonaLoteView.as_view(),
+        name='api_lote',
+    ),
 ]
\ No newline at end of file
@@ -1,32 +1,95 @@
-from django.shortcuts import render
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+import hmac
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse
+from django.views import View
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView
+from django.contrib import messages
+from django.core.exceptions import PermissionDenied
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
 from django.urls import reverse_lazy
-from .models import Persona
+from .models import Persona, PersonaArchivada, EstadisticaOficina, TrabajoImportacion
+from .estadisticas import rangos
+from .forms import AccionMasivaForm, ImportacionForm, PersonaForm
+from . import acciones, lote, trabajos
 #import login mixin
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin
+from django.conf import settings
+from comun.cache_busqueda import CacheBusqueda
+from comun.paginacion import Concatenados
+from comun.mixins import (
+    BusquedaCacheadaMixin, EscrituraAgrupadaMixin, LecturaReplicaMixin, ListaParcialMixin, VersionCondicionalMixin,
+)
+from crud.texto import normalizar
+from oficina.resolver import resolver
 
 
-class PersonaListView(ListView):
+def incluir_archivo(request):
+    """Las personas archivadas solo se consultan si se pide con ?incluir_archivo=1."""
+    return request.GET.get('incluir_archivo') == '1'
+
+
+class PersonaListView(LecturaReplicaMixin, ListaParcialMixin, VersionCondicionalMixin, ListView):
     model = Persona
     template_name = "persona/lista.html"
+    template_parcial = "persona/lista_resultados.html"
+    urls_fila = {'detalle': 'persona:detalle', 'editar': 'persona:editar', 'eliminar': 'persona:eliminar'}
     context_object_name = "personas"
+    versiones_tablas = ('persona', 'oficina')
     paginate_by = 10
+
+    def get_queryset(self):
+        # Mismo filtro que usan las acciones masivas con "todos los del filtro"
+        oficina = self.request.GET.get('oficina', '')
+        return acciones.filtrar(
+            self.request.GET.get('q'),
+            oficina_id=int(oficina) if oficina.isdigit() else None,
+            sin_oficina=oficina == 'ninguna',
+        ).select_related('oficina').order_by('id')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        context['oficina_filtro'] = self.request.GET.get('oficina', '')
+        if not self.parcial:
+            context['oficinas'] = resolver.opciones()
+            context['accion_form'] = AccionMasivaForm()
+        parametros = self.request.GET.copy()
+        parametros.pop('page', None)
+        context['parametros_busqueda'] = parametros.urlencode() + '&' if parametros else ''
+        return context
+
+    def usa_formulario(self, request):
+        # El formulario de acciones masivas va en la página completa y solo para quien puede usarlo
+        return not self.parcial and (
+            request.user.has_perm('persona.change_persona') or request.user.has_perm('persona.delete_persona')
+        )
     
-class PersonaDetailView(DetailView):
+class PersonaDetailView(LecturaReplicaMixin, VersionCondicionalMixin, DetailView):
     model = Persona
     template_name = "persona/detalle.html"
     context_object_name = "persona"
+    versiones_tablas = ('persona', 'oficina')
+
+    def get_object(self, queryset=None):
+        try:
+            return super().get_object(queryset)
+        except Http404:
+            if not incluir_archivo(self.request):
+                raise
+            return get_object_or_404(PersonaArchivada, pk=self.kwargs['pk'])
     
-class PersonaCreateView(LoginRequiredMixin, CreateView):
+class PersonaCreateView(LoginRequiredMixin, EscrituraAgrupadaMixin, CreateView):
     model = Persona
     template_name = "persona/crear.html"
-    fields = ['nombre', 'edad', 'email', 'oficina']
+    form_class = PersonaForm
     success_url = reverse_lazy('persona:lista')
     
-class PersonaUpdateView(LoginRequiredMixin, UpdateView):
+class PersonaUpdateView(LoginRequiredMixin, EscrituraAgrupadaMixin, UpdateView):
     model = Persona
     template_name = "persona/editar.html"
-    fields = ['nombre', 'edad', 'email', 'oficina']
+    form_class = PersonaForm
     success_url = reverse_lazy('persona:lista')
     
 class DeletePersonaView(LoginRequiredMixin, DeleteView):
@@ -40,19 +103,189 @@ class DeletePersonaView(LoginRequiredMixin, DeleteView):
         context['action'] = 'Eliminar Persona'
         return context
 
-class PersonaSearchView(ListView):
+class PersonaSearchView(LecturaReplicaMixin, ListaParcialMixin, VersionCondicionalMixin, BusquedaCacheadaMixin, ListView):
     model = Persona
     template_name = "persona/buscar.html"
+    template_parcial = "persona/buscar_resultados.html"
     context_object_name = "personas"
-    
+    versiones_tablas = ('persona', 'oficina')
+    cache_busqueda = CacheBusqueda('persona', settings.BUSQUEDA_CACHE_ENTRADAS, settings.BUSQUEDA_CACHE_IDS)
+    campo_busqueda = 'nombre_busqueda'
+    orden_busqueda = ('id',)
+    paginate_by = 10
+
     def get_queryset(self):
-        query = self.request.GET.get('q')
-        if query:
-            return Persona.objects.filter(nombre__icontains=query)
-        else:
-            return Persona.objects.none()
+        clave = normalizar(self.request.GET.get('q'))
+        if clave and incluir_archivo(self.request):
+            # El archivo es opt-in y poco frecuente: no pasa por la cache. Se pagina sobre las dos
+            # tablas seguidas, trayendo solo las filas de la página
+            filtro = self.filtro_busqueda(clave)
+            return Concatenados(
+                Persona.objects.filter(filtro).order_by('id'),
+                PersonaArchivada.objects.filter(filtro).order_by('id'),
+            )
+        return super().get_queryset()
         
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['query'] = self.request.GET.get('q', '')
-        return context
\ No newline at end of file
+        context['incluir_archivo'] = incluir_archivo(self.request)
+        return context
+
+
+class AccionMasivaView(PermissionRequiredMixin, FormView):
+    """Mover o borrar muchas personas a la vez desde la lista.
+
+    El primer POST muestra cuántas personas alcanza la acción (un COUNT, sin cargarlas); el
+    segundo, con `confirmado`, la ejecuta con UPDATE/DELETE por tandas. Pide los mismos
+    permisos que las acciones del admin: borrar para eliminar, modificar para mover.
+    """
+    form_class = AccionMasivaForm
+    template_name = "persona/accion_masiva.html"
+    http_method_names = ['post']
+
+    def get_permission_required(self):
+        if self.request.POST.get('accion') == AccionMasivaForm.ELIMINAR:
+            return ('persona.delete_persona',)
+        return ('persona.change_persona',)
+
+    def form_valid(self, form):
+        queryset = form.queryset()
+        accion = form.cleaned_data['accion']
+        destino = form.cleaned_data['destino']
+        if not form.cleaned_data['confirmado']:
+            return self.render_to_response(self.get_context_data(
+                form=form,
+                cantidad=queryset.count(),
+                accion=accion,
+                destino=destino,
+            ))
+        if accion == AccionMasivaForm.ELIMINAR:
+            cantidad = acciones.eliminar(queryset)
+            messages.success(self.request, f"Se eliminaron {cantidad} personas.")
+        else:
+            cantidad = acciones.reasignar(queryset, destino.pk if destino else None)
+            messages.success(self.request, f"Se movieron {cantidad} personas a {destino or 'sin oficina'}.")
+        return redirect('persona:lista')
+
+    def form_invalid(self, form):
+        for error in form.non_field_errors():
+            messages.error(self.request, error)
+        for campo, errores in form.errors.items():
+            if campo != '__all__':
+                messages.error(self.request, f"{campo}: {' '.join(errores)}")
+        return redirect('persona:lista')
+
+
+class EstadisticasView(LecturaReplicaMixin, ListView):
+    """Edades y cantidad de personas por oficina, leídas solo de la tabla materializada."""
+    model = EstadisticaOficina
+    template_name = "persona/estadisticas.html"
+    context_object_name = "estadisticas"
+
+    def get_queryset(self):
+        return EstadisticaOficina.objects.select_related('oficina').order_by('oficina__nombre')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['rangos'] = rangos()
+        for estadistica in context['estadisticas']:
+            estadistica.columnas = [estadistica.histograma.get(rango, 0) for rango in context['rangos']]
+        return context
+
+
+class EstadisticasJsonView(LecturaReplicaMixin, View):
+    def get(self, request, *args, **kwargs):
+        datos = []
+        for estadistica in EstadisticaOficina.objects.select_related('oficina').order_by('oficina__nombre'):
+            datos.append({
+                'oficina': estadistica.oficina.nombre_corto if estadistica.oficina else None,
+                'cantidad': estadistica.cantidad,
+                'edad_promedio': estadistica.edad_promedio,
+                'edad_min': estadistica.edad_min,
+                'edad_max': estadistica.edad_max,
+                'histograma': {rango: estadistica.histograma.get(rango, 0) for rango in rangos()},
+                'actualizado': estadistica.actualizado,
+            })
+        return JsonResponse({'oficinas': datos})
+
+
+def token_api_valido(request):
+    """El request trae `Authorization: Bearer <token>` con uno de los tokens de API_LOTE_TOKENS."""
+    tipo, _, token = request.headers.get('Authorization', '').partition(' ')
+    if tipo.lower() != 'bearer' or not token:
+        return False
+    return any(hmac.compare_digest(token.encode(), valido.encode()) for valido in settings.API_LOTE_TOKENS)
+
+
+class StaffRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
+    def test_func(self):
+        return self.request.user.is_staff
+
+
+class ImportacionCreateView(StaffRequiredMixin, FormView):
+    """Recibe el CSV y lo deja en cola; el worker `procesar_importaciones` hace la importación."""
+    template_name = "persona/importacion_crear.html"
+    form_class = ImportacionForm
+
+    def form_valid(self, form):
+        trabajo = trabajos.encolar(
+            form.cleaned_data['archivo'],
+            usuario=self.request.user,
+            actualizar=form.cleaned_data['actualizar'],
+        )
+        return redirect('persona:importacion_detalle', pk=trabajo.pk)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['trabajos'] = TrabajoImportacion.objects.defer('errores', 'reporte', 'mensaje')[:20]
+        return context
+
+
+class ImportacionDetailView(StaffRequiredMixin, DetailView):
+    model = TrabajoImportacion
+    template_name = "persona/importacion_detalle.html"
+    context_object_name = "trabajo"
+
+
+class ImportacionJsonView(StaffRequiredMixin, View):
+    def get(self, request, pk, *args, **kwargs):
+        trabajo = get_object_or_404(TrabajoImportacion, pk=pk)
+        return JsonResponse(trabajo.como_dict())
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class PersonaLoteView(View):
+    """Alta/actualización de muchas personas en un request (JSON array o NDJSON).
+
+    ?actualizar=0 informa como error los emails que ya existen; ?dry_run=1 solo valida.
+    Responde un resultado por item, en el orden recibido.
+
+    Los integradores se autentican con `Authorization: Bearer <token>`, con uno de los tokens
+    de API_LOTE_TOKENS, sin sesión ni CSRF. Sin token se acepta una sesión de staff, y entonces
+    el POST lleva el token CSRF como cualquier formulario del sitio.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not token_api_valido(request):
+            if not (request.user.is_authenticated and request.user.is_staff):
+                raise PermissionDenied
+            rechazo = CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {})
+            if rechazo is not None:
+                return rechazo
+        return super().dispatch(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            items = lote.leer_items(request)
+        except lote.ErrorLote as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        resultados = lote.procesar(
+            items,
+            actualizar=request.GET.get('actualizar', '1') != '0',
+            dry_run=request.GET.get('dry_run') == '1',
+        )
+        totales = {estado: 0 for estado in ('creada', 'actualizada', 'sin_cambios', 'error')}
+        for resultado in resultados:
+            totales[resultado['estado']] += 1
+        return JsonResponse({'totales': totales, 'resultados': resultados})
\ No newline at end of file
@@ -0,0 +1,43 @@
+// Listas con un contenedor [data-parcial]: el paginador y los filtros piden solo el fragmento
+// de resultados (jQuery manda X-Requested-With y la vista responde sin base.html ni navbar).
+(function ($) {
+    var espera = null;
+
+    function cargar($destino, url, historial) {
+        $.get(url).done(function (html) {
+            $destino.html(html);
+            if (historial) {
+                window.history.pushState({parcial: true}, '', url);
+            }
+        }).fail(function () {
+            window.location.href = url;
+        });
+    }
+
+    $(document).on('click', '[data-parcial] a.page-link', function (evento) {
+        evento.preventDefault();
+        cargar($(this).closest('[data-parcial]'), this.href, true);
+    });
+
+    $(document).on('submit', 'form[data-parcial]', function (evento) {
+        evento.preventDefault();
+        var url = (this.getAttribute('action') || window.location.pathname) + '?' + $(this).serialize();
+        cargar($($(this).data('parcial')), url, true);
+    });
+
+    // Búsqueda mientras se escribe, una vez que se deja de tipear
+    $(document).on('input', 'form[data-parcial] input[name=q]', function () {
+        var $form = $(this.form);
+        clearTimeout(espera);
+        espera = setTimeout(function () { $form.trigger('submit'); }, 300);
+    });
+
+    $(window).on('popstate', function (evento) {
+        var $destino = $('[data-parcial]').not('form').first();
+        if (evento.originalEvent.state && evento.originalEvent.state.parcial && $destino.length) {
+            cargar($destino, window.location.href, false);
+        } else {
+            window.location.reload();
+        }
+    });
+})(jQuery);